@@ -0,0 +1,243 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from config.constants import (
+    USER_TIME_HORIZON, USER_DESIRED_GROWTH, USER_FLUCTUATION,
+    USER_WORST_CASE, USER_MINIMUM_ETF_AGE, USER_RISK_PREFERENCE,
+    TESTING_PERIOD, RECOMMENDATION_COUNT, SYNTHETIC_SEED
+)
+from core.data_processing.data_providers import (
+    SyntheticDataProvider, generate_synthetic_prices, set_data_provider
+)
+from core.data_processing.price_panel import PricePanel
+from core.data_processing.risk_free_rates import fetch_risk_free_boc
+from core.data_processing.Etf_Data import get_etf_data, get_etf_metrics_batch
+from core.analysis.max_drawdown import calculate_max_drawdown, compute_drawdown_table
+from core.analysis.window_stats import window_stats
+from core.analysis.rate_index import rate_index
+from core.scoring.sharpe_recommendation import sharpe_score
+from core.scoring.utility_score import utility_score
+from core.scoring.custom_score import utility_score as custom_utility_score
+from core.scoring.etf_recommendation_evaluation import top_recommend
+from core.scoring.scoring_engine import rank_etfs
+from core.scoring.recommendation_table import build_recommendation_table
+from testing.recommendation_test import recommendation_test
+from testing.compare_custom_Sharpe_test_results import quantitative_etf_basket_comparison
+
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_YEARS = [5, 20]
+BENCH_PROFILE = [8, 10, 15, 35, 3, [1, 3]]
+
+# Caches that would otherwise serve every repetition after the first
+SNAPSHOT_CACHES = [compute_drawdown_table, get_etf_metrics_batch, get_etf_data, window_stats, rate_index]
+
+
+def synthetic_universe(n_tickers, years, seed=SYNTHETIC_SEED):
+    """
+    Generates a synthetic price panel for benchmarking.
+
+    Prices follow `generate_synthetic_prices`: geometric Brownian motions with
+    random inception dates, market holidays missing from the index and
+    sporadic missing bars per ticker, like `yf.download` returns.
+
+    Args:
+        n_tickers (int): The number of tickers.
+        years (int): The length of the history, ending today.
+        seed (int, optional): Seed of the random generator.
+
+    Returns:
+        tuple: A tuple containing:
+            - tickers (list): The ticker symbols.
+            - panel (PricePanel): Their prices.
+    """
+    end = pd.Timestamp.today().normalize()
+    start = end - pd.DateOffset(years=years)
+    tickers = [f'SYN{i:05d}' for i in range(n_tickers)]
+    data = generate_synthetic_prices(tickers, start, end, seed, max_inception_years=years * 0.8)
+    return tickers, PricePanel.from_frame(data)
+
+
+def _cold(panel=None):
+    for cache in SNAPSHOT_CACHES:
+        cache.cache_clear()
+    if panel is not None:
+        panel._returns = None
+
+
+def _time(func, panel, repeat, cold):
+    timings = []
+    for _ in range(repeat):
+        if cold:
+            _cold(panel)
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def pipeline_stages(tickers, panel, risk_free_data, user=BENCH_PROFILE):
+    """
+    Lists the public pipeline stages to time, with their inputs prepared.
+
+    Each stage's inputs are computed once from the previous stages, so a
+    stage's timing covers that stage only.
+
+    Args:
+        tickers (list): The tickers of the universe.
+        panel (PricePanel): Their prices.
+        risk_free_data (pd.DataFrame): The daily risk-free rates.
+        user (list, optional): The profile, indexed by the USER_* constants.
+
+    Returns:
+        list: (stage name, function without arguments) pairs.
+    """
+    end_date = pd.Timestamp(datetime.now())
+    horizon = user[USER_TIME_HORIZON]
+    candidates = calculate_max_drawdown(user[USER_WORST_CASE], user[USER_MINIMUM_ETF_AGE], tickers, panel, end_date)
+    etf_metrics = get_etf_data(candidates, horizon, panel, end_date)
+    scores = sharpe_score(etf_metrics, horizon, risk_free_data)
+    custom, sharpe = recommendation_test(
+        horizon, user[USER_DESIRED_GROWTH], user[USER_FLUCTUATION], user[USER_WORST_CASE],
+        user[USER_MINIMUM_ETF_AGE], user[USER_RISK_PREFERENCE], tickers, panel, TESTING_PERIOD)
+    test_start = end_date - pd.DateOffset(years=TESTING_PERIOD)
+
+    return [
+        ('calculate_max_drawdown', lambda: calculate_max_drawdown(
+            user[USER_WORST_CASE], user[USER_MINIMUM_ETF_AGE], tickers, panel, end_date)),
+        ('get_etf_data', lambda: get_etf_data(candidates, horizon, panel, end_date)),
+        ('sharpe_score', lambda: sharpe_score(etf_metrics, horizon, risk_free_data)),
+        ('utility_score', lambda: utility_score(
+            etf_metrics, horizon, risk_free_data, user[USER_RISK_PREFERENCE])),
+        ('custom_score.utility_score', lambda: custom_utility_score(
+            etf_metrics, horizon, risk_free_data, user[USER_RISK_PREFERENCE])),
+        ('top_recommend', lambda: top_recommend(scores, 'Sharpe', RECOMMENDATION_COUNT)),
+        ('rank_etfs', lambda: rank_etfs(
+            etf_metrics, horizon, risk_free_data, RECOMMENDATION_COUNT, user[USER_RISK_PREFERENCE])),
+        ('build_recommendation_table', lambda: build_recommendation_table(
+            tickers, panel, risk_free_data, end_date)),
+        ('quantitative_etf_basket_comparison', lambda: quantitative_etf_basket_comparison(
+            panel, custom, sharpe, user[USER_DESIRED_GROWTH], user[USER_FLUCTUATION],
+            test_start, end_date, 0.02)),
+        ('recommendation_test', lambda: recommendation_test(
+            horizon, user[USER_DESIRED_GROWTH], user[USER_FLUCTUATION], user[USER_WORST_CASE],
+            user[USER_MINIMUM_ETF_AGE], user[USER_RISK_PREFERENCE], tickers, panel, TESTING_PERIOD)),
+    ]
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, years=DEFAULT_YEARS, repeat=5, stages=None, seed=SYNTHETIC_SEED):
+    """
+    Times every pipeline stage across universe sizes and history lengths.
+
+    Every stage is timed cold (the snapshot caches and the panel's returns
+    cleared before each repetition, like the first request on a new
+    snapshot) and warm (caches kept, like later requests).
+
+    Args:
+        sizes (list, optional): Numbers of tickers.
+        years (list, optional): History lengths, in years.
+        repeat (int, optional): Repetitions per stage and mode.
+        stages (list, optional): Names of the stages to run. Defaults to all.
+        seed (int, optional): Seed of the synthetic data.
+
+    Returns:
+        list: One dict per (stage, size, years, mode) with 'stage', 'tickers',
+              'years', 'rows', 'mode', 'repeat', 'best', 'median' and 'mean'
+              (seconds).
+    """
+    set_data_provider(SyntheticDataProvider(seed=seed))
+    risk_free_data = fetch_risk_free_boc("1995-01-01")
+    results = []
+    for n_years in years:
+        for n_tickers in sizes:
+            tickers, panel = synthetic_universe(n_tickers, n_years, seed)
+            for name, func in pipeline_stages(tickers, panel, risk_free_data):
+                if stages and name not in stages:
+                    continue
+                for mode in ('cold', 'warm'):
+                    timings = _time(func, panel, repeat, cold=mode == 'cold')
+                    results.append({
+                        'stage': name, 'tickers': n_tickers, 'years': n_years, 'rows': len(panel),
+                        'mode': mode, 'repeat': repeat, 'best': min(timings),
+                        'median': statistics.median(timings), 'mean': statistics.fmean(timings),
+                    })
+                    print(f"{name:36s} {n_tickers:6d} tickers {n_years:3d}y {mode:4s} "
+                          f"median {results[-1]['median'] * 1e3:10.2f} ms", file=sys.stderr)
+            # Let the universe go before generating the next one
+            _cold()
+    return results
+
+
+def environment():
+    """
+    Describes the machine and code version the benchmarks ran on.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare_results(baseline, current):
+    """
+    Compares two benchmark runs stage by stage.
+
+    Args:
+        baseline (dict): A saved run, as written by this script.
+        current (dict): Another saved run.
+
+    Returns:
+        pd.DataFrame: The median timings of both runs for every (stage,
+                      tickers, years, mode) they share, and their ratio
+                      (current / baseline, below 1 is faster).
+    """
+    keys = ['stage', 'tickers', 'years', 'mode']
+    before = pd.DataFrame(baseline['results']).set_index(keys)['median']
+    after = pd.DataFrame(current['results']).set_index(keys)['median']
+    table = pd.concat({'baseline': before, 'current': after}, axis=1, join='inner')
+    table['ratio'] = table['current'] / table['baseline']
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation pipeline on synthetic universes.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="numbers of tickers")
+    parser.add_argument('--years', type=int, nargs='+', default=DEFAULT_YEARS, help="history lengths in years")
+    parser.add_argument('--repeat', type=int, default=5, help="repetitions per stage and mode")
+    parser.add_argument('--stages', nargs='+', help="only run these stages")
+    parser.add_argument('--seed', type=int, default=SYNTHETIC_SEED)
+    parser.add_argument('--output', default='bench_results.json', help="where to save the results")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help="compare two saved runs instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        print(compare_results(baseline, current).to_string(float_format=lambda x: f'{x:.4f}'))
+    else:
+        results = run_benchmarks(args.sizes, args.years, args.repeat, args.stages, args.seed)
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=1)
+        print(f"Saved {len(results)} timings to {args.output}")
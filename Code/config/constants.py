@@ -1,4 +1,5 @@
 """Configuration constants for the ETF recommendation system."""
+import os
 
 # User profile indices
 USER_TIME_HORIZON = 0
@@ -16,6 +17,44 @@ WORSE_CASE_OPTIONS = [15, 25, 35, 45, 100]
 MINIMUM_ETF_AGE_OPTIONS = [10, 5, 3, 1, 0]
 RISK_PREFERENCE_OPTIONS = [[3, 1], [2, 1], [1, 1], [1, 2], [1, 3]]
 
+# Every horizon, in years, the what-if explorer keeps metrics for and a profile may ask for
+WHAT_IF_HORIZONS = list(range(1, 26))
+
 TESTING_PERIOD = 3
 RECOMMENDATION_COUNT = 5
 TOP_RANGE_RECOMMENDATIONS = 15
+# (days x baskets x ETFs) cells the simulator holds at once to price daily rebalancing costs
+TURNOVER_BLOCK_CELLS = 1 << 18
+
+# Local data storage
+DATA_DIR = os.environ.get(
+    'ETF_DATA_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+PRICE_STORE_DIR = os.path.join(DATA_DIR, 'price_store')
+# Calendar days re-fetched before a ticker's last stored bar, to detect back-adjusted history
+PRICE_STORE_OVERLAP_DAYS = 10
+# Relative change of the settled overlap bars taken as a dividend or split back-adjustment
+PRICE_ADJUSTMENT_TOLERANCE = 1e-4
+RATE_STORE_DIR = os.path.join(DATA_DIR, 'rate_store')
+RECOMMENDATION_TABLE_PATH = os.path.join(DATA_DIR, 'recommendation_table.npz')
+SNAPSHOT_DIR = os.path.join(DATA_DIR, 'snapshots')
+
+# Data provider: 'live' (Yahoo Finance / Bank of Canada), 'replay' (recorded fixture) or 'synthetic'
+DATA_PROVIDER = os.environ.get('ETF_DATA_PROVIDER', 'live')
+FIXTURE_DIR = os.environ.get('ETF_FIXTURE_DIR', os.path.join(DATA_DIR, 'fixture'))
+SYNTHETIC_SEED = int(os.environ.get('ETF_SYNTHETIC_SEED', '42'))
+
+# Stage tracing of the web app: file to write each recommendation's trace to, off if unset
+TRACE_FILE = os.environ.get('ETF_TRACE_FILE')
+
+# Local recommendation service: the front-ends use it when ETF_SERVICE_URL is set, e.g.
+# http://127.0.0.1:8765, and run the pipeline in-process otherwise
+SERVICE_URL = os.environ.get('ETF_SERVICE_URL')
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+SERVICE_TIMEOUT = 60
+# The requests queued while a batch is ranked form the next batch, up to a batch size; a
+# positive window also holds each batch open that many seconds for more requests to join
+SERVICE_BATCH_WINDOW = 0.0
+SERVICE_BATCH_SIZE = 1024
+# Back-test requests a batch client keeps in flight at once
+SERVICE_CLIENT_WORKERS = 4
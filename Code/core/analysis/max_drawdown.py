@@ -2,11 +2,109 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(
     os.path.dirname(os.path.abspath(__file__)))))
-from core.data_processing.ishares_ETF_list import download_valid_data
+from core.data_processing.price_panel import as_price_panel
+from core.cache import snapshot_cache
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
 
+def _column_max_drawdown(prices):
+    # NaN-aware running maximum: fmax skips missing bars, like cummax on the dropna'd series
+    running_max = np.fmax.accumulate(prices, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drawdown = (prices - running_max) / running_max
+    # fmin ignores NaNs and yields NaN for columns without any price
+    return np.fmin.reduce(drawdown, axis=0, initial=np.nan) * 100
+
+
+def build_drawdown_table(data, end_date):
+    """
+    Computes the maximum drawdown of every ETF in one vectorized pass.
+
+    The full-history and trailing 10-year drawdowns are computed for all
+    tickers at once over the 2D price matrix. The combined drawdown weights
+    the full history at 30% and the last 10 years at 70%, falling back to
+    whichever of the two is available. This is the uncached computation, for
+    one-off dates such as backtest cut-offs; the app and the pipeline use the
+    cached `compute_drawdown_table`.
+
+    Args:
+        data (PricePanel or pd.DataFrame): The historical 'Adj Close' price
+                             data for all ETFs.
+        end_date (pd.Timestamp): The final date for the analysis period.
+
+    Returns:
+        pd.DataFrame: A DataFrame indexed by 'Ticker' with the columns
+                      'Max_Drawdown_Full', 'Max_Drawdown_10Y' and
+                      'Max_Drawdown' (all in percent, negative) and
+                      'Inception_Date' (date of the first price).
+    """
+    panel = as_price_panel(data)
+    _, origin_stop = panel.row_range(end=end_date)
+    ten_year_start, _ = panel.row_range(start=end_date - pd.DateOffset(years=10))
+    prices_origin = panel.values[:origin_stop]
+
+    max_drawdown_origin = _column_max_drawdown(prices_origin)
+    max_drawdown_10yr = _column_max_drawdown(prices_origin[min(ten_year_start, origin_stop):])
+
+    max_drawdown = np.where(
+        np.isnan(max_drawdown_10yr), max_drawdown_origin,
+        np.where(np.isnan(max_drawdown_origin), max_drawdown_10yr,
+                 0.3 * max_drawdown_origin + 0.7 * max_drawdown_10yr))
+
+    inception = pd.DatetimeIndex(np.where(
+        panel.first_valid >= 0, panel.dates.values[np.maximum(panel.first_valid, 0)],
+        np.datetime64('NaT')))
+
+    return pd.DataFrame({
+        'Max_Drawdown_Full': max_drawdown_origin,
+        'Max_Drawdown_10Y': max_drawdown_10yr,
+        'Max_Drawdown': max_drawdown,
+        'Inception_Date': inception,
+    }, index=pd.Index(panel.tickers, name='Ticker'))
+
+
+@snapshot_cache(data_args=('data',), date_args=('end_date',))
+def compute_drawdown_table(data, end_date):
+    """
+    Returns the drawdown table of `build_drawdown_table`, cached per data
+    snapshot and trading day (see `snapshot_cache`).
+
+    Args:
+        data (PricePanel or pd.DataFrame): The historical 'Adj Close' price
+                             data for all ETFs.
+        end_date (pd.Timestamp): The final date for the analysis period.
+
+    Returns:
+        pd.DataFrame: The drawdown table, see `build_drawdown_table`.
+    """
+    return build_drawdown_table(data, end_date)
+
+
+def filter_drawdown_table(drawdown_table, user_max_drawdown, user_minimum_efs_age, valid_tickers=None):
+    """
+    Selects the ETFs of a drawdown table that fit the user's tolerances.
+
+    Args:
+        drawdown_table (pd.DataFrame): The table returned by `compute_drawdown_table`.
+        user_max_drawdown (float): The maximum percentage drawdown the user can tolerate.
+        user_minimum_efs_age (int): The minimum age in years an ETF must be to be considered.
+        valid_tickers (list, optional): The tickers to consider, in the order
+                                        they should be returned. Defaults to
+                                        every ticker of the table.
+
+    Returns:
+        list: The tickers that meet both the maximum drawdown and minimum age criteria.
+    """
+    if valid_tickers is not None:
+        drawdown_table = drawdown_table.reindex(valid_tickers)
+    minimum_age_etf = datetime.now() - pd.DateOffset(years=user_minimum_efs_age)
+    mask = ((drawdown_table['Max_Drawdown'] >= -user_max_drawdown) &
+            (drawdown_table['Inception_Date'] < minimum_age_etf))
+    return drawdown_table.index[mask.to_numpy()].tolist()
+
+
 def calculate_max_drawdown(user_max_drawdown, user_minimum_efs_age, valid_tickers, data, end_date):
     """
     Filters a list of ETF tickers based on the user's maximum drawdown tolerance
@@ -15,59 +113,22 @@ def calculate_max_drawdown(user_max_drawdown, user_minimum_efs_age, valid_ticker
     The maximum drawdown is calculated as a weighted average of the ETF's full
     history (30%) and the last 10 years of data (70%) to prioritize recent performance.
     ETFs that are younger than the user's specified minimum age are also excluded.
+    The drawdowns of all ETFs are computed at once by `compute_drawdown_table`;
+    callers that filter for several users can compute the table once and use
+    `filter_drawdown_table` directly.
 
     Args:
         user_max_drawdown (float): The maximum percentage drawdown the user can tolerate.
         user_minimum_efs_age (int): The minimum age in years an ETF must be to be considered.
         valid_tickers (list): A list of valid ETF ticker symbols.
-        data (pd.DataFrame): A DataFrame containing the historical 'Adj Close'
-                             price data for all valid ETFs.
+        data (PricePanel or pd.DataFrame): The historical 'Adj Close' price
+                             data for all valid ETFs.
         end_date (pd.Timestamp): The final date for the analysis period.
 
     Returns:
         list: A filtered list of ticker symbols for ETFs that meet both the
               maximum drawdown and minimum age criteria.
     """
-    
-    tickers_within_user_drawdown_tolerance = []
-
-    for ticker in valid_tickers:
-        if 'Adj Close' not in data[ticker]:
-            continue
-
-        prices = data[ticker]['Adj Close'].dropna()
-        past_10_year_date = end_date - pd.DateOffset(years=10)
-
-        prices_origin = prices[prices.index <= end_date]
-        prices_10_year = prices[(prices.index >= past_10_year_date) & (
-            prices.index <= end_date)]
-
-        if not prices_origin.empty:
-            running_max = prices_origin.cummax()
-            drawdown = (prices_origin - running_max) / running_max
-            max_drawdown_origin = drawdown.min() * 100
-        else:
-            max_drawdown_origin = None
-
-        if not prices_10_year.empty:
-            running_max_10yr = prices_10_year.cummax()
-            drawdown_10yr = (prices_10_year -
-                             running_max_10yr) / running_max_10yr
-            max_drawdown_10yr = drawdown_10yr.min() * 100
-        else:
-            max_drawdown_10yr = None
-
-        if max_drawdown_origin is not None and max_drawdown_10yr is not None:
-            max_drawdown = 0.3 * max_drawdown_origin + 0.7 * max_drawdown_10yr
-        elif max_drawdown_origin is not None:
-            max_drawdown = max_drawdown_origin
-        elif max_drawdown_10yr is not None:
-            max_drawdown = max_drawdown_10yr
-        else:
-            continue
-
-        minimum_age_etf = datetime.now() - pd.DateOffset(years=user_minimum_efs_age)
-        if max_drawdown >= -user_max_drawdown and prices.index.min() < minimum_age_etf:
-            tickers_within_user_drawdown_tolerance.append(ticker)
-
-    return tickers_within_user_drawdown_tolerance
+
+    drawdown_table = compute_drawdown_table(data, end_date)
+    return filter_drawdown_table(drawdown_table, user_max_drawdown, user_minimum_efs_age, valid_tickers)
@@ -0,0 +1,253 @@
+import numpy as np
+import pandas as pd
+from core.data_processing.price_panel import as_price_panel
+from config.constants import TURNOVER_BLOCK_CELLS
+
+REBALANCE_SCHEDULES = ('daily', 'monthly', 'quarterly', 'buy_and_hold')
+
+
+def basket_weights(data, baskets):
+    """
+    Builds an equal-weight matrix from lists of tickers.
+
+    Args:
+        data (PricePanel or pd.DataFrame): The price data the weights refer to.
+        baskets (dict or list): Ticker lists, keyed by basket label if a dict.
+                                A ticker listed twice gets twice the weight;
+                                tickers missing from the data are ignored.
+
+    Returns:
+        pd.DataFrame: One row per basket and one column per ticker of the data,
+                      each row summing to 1 (or 0 for a basket without any
+                      known ticker).
+    """
+    panel = as_price_panel(data)
+    if not isinstance(baskets, dict):
+        baskets = dict(enumerate(baskets))
+    weights = np.zeros((len(baskets), len(panel.tickers)))
+    for row, tickers in enumerate(baskets.values()):
+        for ticker in tickers:
+            if ticker in panel:
+                weights[row, panel.columns[ticker]] += 1
+    totals = weights.sum(axis=1, keepdims=True)
+    weights = np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0)
+    return pd.DataFrame(weights, index=list(baskets), columns=panel.tickers)
+
+
+def _forward_filled(values):
+    valid = ~np.isnan(values)
+    rows = np.arange(len(values))[:, None]
+    last_seen = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+    filled = np.take_along_axis(values, np.maximum(last_seen, 0), axis=0)
+    return np.where(last_seen >= 0, filled, np.nan)
+
+
+def _rebalance_anchors(dates, rebalance):
+    """
+    Returns the rows at whose close the baskets are (re)built.
+    """
+    if rebalance == 'buy_and_hold' or len(dates) == 0:
+        return np.array([0])
+    period = dates.to_period('M' if rebalance == 'monthly' else 'Q').asi8
+    # Rebalance at the close of the last trading day of every period
+    last_of_period = np.flatnonzero(period[1:] != period[:-1])
+    return np.concatenate([[0], last_of_period[last_of_period > 0]])
+
+
+def _daily_returns(returns, weights, transaction_cost):
+    has_return = ~np.isnan(returns)
+    # Each day the weights are spread over the ETFs that traded, like averaging the Series
+    filled_returns = np.where(has_return, returns, 0.0)
+    traded_weight = has_return.astype('float64') @ weights.T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        portfolio = (filled_returns @ weights.T) / traded_weight
+    portfolio[traded_weight <= 0] = np.nan
+    if not transaction_cost:
+        return portfolio
+
+    # Bringing the drifted weights back to target trades sum(w * |r - r_p|) / (1 + r_p),
+    # computed over blocks of days to bound the (days, baskets, ETFs) deviations
+    turnover = np.empty_like(portfolio)
+    block = max(1, TURNOVER_BLOCK_CELLS // max(1, weights.size))
+    for start in range(0, len(returns), block):
+        rows = slice(start, start + block)
+        deviation = filled_returns[rows, None, :] - portfolio[rows, :, None]
+        np.abs(deviation, out=deviation)
+        deviation *= has_return[rows, None, :]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            turnover[rows] = np.einsum('dbe,be->db', deviation, weights) / traded_weight[rows]
+    # Baskets without a return that day have nothing to trade
+    turnover[np.isnan(portfolio)] = 0.0
+    turnover /= 1 + portfolio
+    # The first return also pays for buying the basket
+    first = np.argmax(~np.isnan(portfolio), axis=0)
+    turnover[first, np.arange(portfolio.shape[1])] += 1
+    return (1 + portfolio) * (1 - transaction_cost * turnover) - 1
+
+
+def _segment_returns(prices, weights, anchors, transaction_cost):
+    n_rows, n_baskets = len(prices), len(weights)
+    prices = _forward_filled(prices)
+    values = np.full((n_rows, n_baskets), np.nan)
+    bases = np.full((n_rows, n_baskets), np.nan)
+    values[0] = 1.0
+    drifted = np.zeros_like(weights)
+    bounds = list(anchors) + [n_rows - 1]
+
+    for anchor, stop in zip(bounds[:-1], bounds[1:]):
+        # Only ETFs with a price at the anchor can be bought, the others' weight is spread
+        available = ~np.isnan(prices[anchor])
+        target = weights * available
+        totals = target.sum(axis=1, keepdims=True)
+        target = np.divide(target, totals, out=np.zeros_like(target), where=totals > 0)
+
+        # Baskets that could not be bought yet start investing at this anchor
+        value = np.where(np.isnan(values[anchor]), 1.0, values[anchor])
+        value[totals[:, 0] <= 0] = np.nan
+        bases[anchor] = value
+        # The trading cost comes out of the first return after the anchor
+        turnover = np.abs(target - drifted).sum(axis=1)
+        start_value = value * (1 - transaction_cost * turnover)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            growth = np.nan_to_num(prices[anchor + 1:stop + 1] / prices[anchor])
+        relative = growth @ target.T
+        values[anchor + 1:stop + 1] = start_value * relative
+        bases[anchor + 1:stop + 1] = values[anchor + 1:stop + 1]
+        if stop > anchor:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                drifted = np.nan_to_num(target * growth[-1] / relative[-1][:, None])
+
+    returns = np.full((n_rows, n_baskets), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[1:] = values[1:] / bases[:-1] - 1
+    return returns
+
+
+def simulate_portfolios(data, weights, start=None, end=None, rebalance='daily', transaction_cost=0.0):
+    """
+    Simulates the daily returns of many weighted ETF baskets at once.
+
+    Every basket is a row of `weights`, and all baskets are simulated together
+    with matrix products against the returns (or price growth) matrix of the
+    window, so thousands of baskets cost about as much as a handful.
+
+    Rebalancing schedules:
+        - 'daily': the target weights are restored every day, spread over the
+          ETFs that traded that day. With equal weights this is the average of
+          the ETFs' daily returns, as `quantitative_etf_basket_comparison` does.
+        - 'monthly', 'quarterly': the baskets are bought at the first close
+          and rebalanced at the last close of every month or quarter.
+        - 'buy_and_hold': the baskets are bought at the first close and left
+          to drift.
+    ETFs without a price when a basket is (re)built are left out until the
+    next rebalance and their weight is spread over the others.
+
+    Args:
+        data (PricePanel or pd.DataFrame): The historical price data for all ETFs.
+        weights (pd.DataFrame or np.ndarray): Target weights, one row per basket.
+                                              DataFrame columns are tickers; array
+                                              columns follow the panel's tickers.
+        start (pd.Timestamp, optional): First date of the simulation, inclusive.
+        end (pd.Timestamp, optional): Last date of the simulation, inclusive.
+        rebalance (str, optional): One of REBALANCE_SCHEDULES. Defaults to 'daily'.
+        transaction_cost (float, optional): Cost per unit of traded value, e.g.
+                                            0.001 for 10 basis points. Charged on
+                                            the initial purchase and on every
+                                            rebalance. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: Daily returns, one row per date of the window and one
+                      column per basket. Days without a return are NaN.
+
+    Raises:
+        ValueError: If `rebalance` is not a known schedule.
+    """
+    if rebalance not in REBALANCE_SCHEDULES:
+        raise ValueError(f"Unknown rebalance schedule '{rebalance}', expected one of {REBALANCE_SCHEDULES}.")
+    panel = as_price_panel(data).window(start, end)
+    if isinstance(weights, pd.DataFrame):
+        labels = list(weights.index)
+        weights = weights.reindex(columns=panel.tickers, fill_value=0.0).to_numpy(dtype='float64')
+    else:
+        weights = np.atleast_2d(np.asarray(weights, dtype='float64'))
+        labels = list(range(len(weights)))
+
+    if len(panel) == 0:
+        returns = np.empty((0, len(weights)))
+    elif rebalance == 'daily':
+        returns = _daily_returns(panel.returns(), weights, transaction_cost)
+    else:
+        returns = _segment_returns(panel.values, weights, _rebalance_anchors(panel.dates, rebalance),
+                                   transaction_cost)
+    return pd.DataFrame(returns, index=panel.dates, columns=labels)
+
+
+def portfolio_metrics(returns, risk_free_rate=0.02, user_growth=None, user_std=None):
+    """
+    Calculates the performance metrics of many return paths at once.
+
+    The definitions follow `quantitative_etf_basket_comparison`, computed
+    column-wise over the days each basket has a return.
+
+    Args:
+        returns (pd.DataFrame): Daily returns, one column per basket, as
+                                returned by `simulate_portfolios`.
+        risk_free_rate (float or array-like, optional): The annual risk-free
+                                rate, for all baskets or one per basket.
+                                Defaults to 0.02 (2%).
+        user_growth (float, optional): The user's desired annual growth rate,
+                                       for the Reward to Shortfall metric.
+        user_std (float, optional): The user's acceptable annual standard
+                                    deviation, for the Reward to Shortfall metric.
+
+    Returns:
+        pd.DataFrame: One row per basket with the columns 'Annual Return (%)',
+                      'Volatility (%)', 'Sharpe', 'Sortino', 'Max Drawdown (%)'
+                      and 'Reward to Shortfall'. Metrics that cannot be
+                      calculated are NaN.
+    """
+    values = returns.to_numpy(dtype='float64')
+    has_return = ~np.isnan(values)
+    counts = has_return.sum(axis=0)
+    risk_free_rate = np.broadcast_to(np.asarray(risk_free_rate, dtype='float64'), counts.shape)
+
+    def column_std(x, mask):
+        n = mask.sum(axis=0)
+        mean = np.where(mask, x, 0.0).sum(axis=0) / np.where(n > 0, n, np.nan)
+        squares = np.where(mask, (x - mean) ** 2, 0.0).sum(axis=0)
+        return np.sqrt(squares / np.where(n >= 2, n - 1, np.nan))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(has_return, values, 0.0).sum(axis=0) / np.where(counts > 0, counts, np.nan)
+        ann_return = (1 + mean) ** 252 - 1
+        ann_std = column_std(values, has_return) * np.sqrt(252)
+        sharpe = np.where(ann_std != 0, (ann_return - risk_free_rate) / ann_std, np.nan)
+
+        downside = has_return & (values < 0)
+        sortino = (ann_return - risk_free_rate) / (column_std(values, downside) * np.sqrt(252))
+
+        cumulative = np.cumprod(np.where(has_return, 1 + values, 1.0), axis=0)
+        # The peak runs over the days with a return only, so the starting capital is not a peak
+        peak = np.maximum.accumulate(np.where(has_return, cumulative, -np.inf), axis=0)
+        drawdown = cumulative / peak - 1
+        max_dd = np.where(has_return, drawdown, np.inf).min(axis=0, initial=np.inf)
+        max_dd[counts == 0] = np.nan
+
+        if user_growth is not None and user_std is not None:
+            threshold = (user_growth - user_std) / 100 / 252
+            shortfalls = np.where(has_return & (values < threshold), threshold - values, 0.0)
+            mean_shortfall = shortfalls.sum(axis=0) / np.where(counts > 0, counts, np.nan)
+            reward_to_shortfall = ann_return * 100 - mean_shortfall * 100
+        else:
+            reward_to_shortfall = np.full(counts.shape, np.nan)
+
+    metrics = pd.DataFrame({
+        'Annual Return (%)': ann_return * 100,
+        'Volatility (%)': ann_std * 100,
+        'Sharpe': sharpe,
+        'Sortino': sortino,
+        'Max Drawdown (%)': max_dd * 100,
+        'Reward to Shortfall': reward_to_shortfall,
+    }, index=returns.columns)
+    return metrics
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from core.cache import snapshot_cache
+
+
+class RateIndex:
+    """
+    Prefix sums over a risk-free rate series for constant-time window averages.
+
+    The cumulative sum and count of the valid rates are built once per
+    series. The average rate over any date window is then two binary searches
+    on the rate dates and a difference of sums, and equals
+    `risk_free_df.loc[start:end, 'yield_pct'].mean()`. Use `rate_index` to
+    share one index per series.
+
+    Attributes:
+        dates (np.ndarray): The sorted observation dates, as datetime64.
+    """
+
+    def __init__(self, risk_free_df):
+        rates = risk_free_df.sort_index()
+        self.dates = rates.index.values
+        values = rates['yield_pct'].to_numpy(dtype='float64')
+        valid = ~np.isnan(values)
+        # Centering on the mean keeps the difference of sums accurate over long histories
+        self._shift = values[valid].mean() if valid.any() else 0.0
+        self._sum = np.concatenate([[0.0], np.cumsum(np.where(valid, values - self._shift, 0.0))])
+        self._count = np.concatenate([[0], np.cumsum(valid)])
+
+    @property
+    def last_date(self):
+        """
+        pd.Timestamp or None: The last observation date, None for an empty series.
+        """
+        return pd.Timestamp(self.dates[-1]) if len(self.dates) else None
+
+    def average(self, start=None, end=None):
+        """
+        Returns the average rate over a date window.
+
+        Args:
+            start (pd.Timestamp, optional): First date of the window, inclusive.
+            end (pd.Timestamp, optional): Last date of the window, inclusive.
+
+        Returns:
+            float: The average 'yield_pct' of the observations in the window,
+                   NaN if there are none.
+        """
+        first = 0 if start is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start)), 'left')
+        stop = len(self.dates) if end is None else np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end)), 'right')
+        count = self._count[stop] - self._count[first] if stop > first else 0
+        if count == 0:
+            return np.nan
+        return float((self._sum[stop] - self._sum[first]) / count + self._shift)
+
+    def horizon_average(self, time_horizon, end=None):
+        """
+        Returns the average rate over the `time_horizon` years ending at `end`.
+
+        Args:
+            time_horizon (int): The length of the window in years.
+            end (pd.Timestamp, optional): The last date of the window. Defaults
+                                          to the last observation, as the scorers use.
+
+        Returns:
+            float: The average 'yield_pct' over the window, NaN if it is empty.
+        """
+        end = self.last_date if end is None else pd.Timestamp(end)
+        if end is None:
+            return np.nan
+        return self.average(end - pd.DateOffset(years=time_horizon), end)
+
+
+@snapshot_cache(data_args=('risk_free_df',), maxsize=16)
+def rate_index(risk_free_df):
+    """
+    Returns the shared `RateIndex` of a risk-free rate series.
+
+    The index is cached by the series' `data_version`, so the scorers, which
+    are called once per profile on the same series, build it once.
+
+    Args:
+        risk_free_df (pd.DataFrame): The daily rates, with a 'yield_pct' column.
+
+    Returns:
+        RateIndex: The prefix-sum index of the series.
+    """
+    return RateIndex(risk_free_df)
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+def rolling_slope(values, window):
+    """
+    Calculates the rolling least-squares slope of every column in one pass.
+
+    For a window of `w` points regressed on t = 0..w-1, the slope is
+    (w * sum(t * y) - sum(t) * sum(y)) / (w * sum(t^2) - sum(t)^2). The sums
+    of y and t * y over each window come from cumulative sums, so each column
+    costs O(n) regardless of the window length, and the result equals
+    `np.polyfit(range(w), y, 1)[0]` applied to every window.
+
+    Args:
+        values (np.ndarray or pd.Series or pd.DataFrame): The observations, one
+                 column per series, in row order.
+        window (int): The number of rows in each regression.
+
+    Returns:
+        np.ndarray or pd.Series or pd.DataFrame: The slope per row, of the same
+            type and shape as `values`, for the window ending on that row. Rows
+            without a full window of valid observations are NaN, like
+            `.rolling(window).apply(...)`.
+    """
+    if isinstance(values, (pd.Series, pd.DataFrame)):
+        slopes = rolling_slope(values.to_numpy(dtype='float64'), window)
+        if isinstance(values, pd.Series):
+            return pd.Series(slopes, index=values.index, name=values.name)
+        return pd.DataFrame(slopes, index=values.index, columns=values.columns)
+
+    y = np.asarray(values, dtype='float64')
+    squeeze = y.ndim == 1
+    if squeeze:
+        y = y[:, None]
+    n_rows = len(y)
+    slopes = np.full(y.shape, np.nan)
+    if window < 2 or n_rows < window:
+        return slopes[:, 0] if squeeze else slopes
+
+    valid = ~np.isnan(y)
+    # The slope does not change when a constant is subtracted, centering keeps the sums small
+    with np.errstate(invalid='ignore'):
+        offset = np.nan_to_num(np.nanmean(y, axis=0))
+    y = np.where(valid, y - offset, 0.0)
+    t = np.arange(n_rows, dtype='float64')[:, None]
+
+    def window_sums(x):
+        sums = np.concatenate([np.zeros((1, x.shape[1])), np.cumsum(x, axis=0)])
+        return sums[window:] - sums[:-window]
+
+    sum_y = window_sums(y)
+    # sum((i - start) * y_i) over the window, with i the absolute row number
+    start = t[:n_rows - window + 1]
+    sum_ty = window_sums(t * y) - start * sum_y
+    counts = window_sums(valid.astype('float64'))
+
+    sum_t = window * (window - 1) / 2
+    sum_tt = (window - 1) * window * (2 * window - 1) / 6
+    slope = (window * sum_ty - sum_t * sum_y) / (window * sum_tt - sum_t ** 2)
+    slopes[window - 1:] = np.where(counts == window, slope, np.nan)
+    return slopes[:, 0] if squeeze else slopes
+
+
+def rolling_growth_rate(prices, window=252, periods_per_year=252):
+    """
+    Calculates the rolling annual growth rate implied by a log-price regression.
+
+    Args:
+        prices (pd.Series or pd.DataFrame): Prices, one column per ETF.
+        window (int, optional): The number of rows in each regression. Defaults
+                                to 252, about one year of trading days.
+        periods_per_year (int, optional): Rows per year, used to annualize the
+                                          slope. Defaults to 252.
+
+    Returns:
+        pd.Series or pd.DataFrame: The growth rate in percent,
+            (exp(slope * periods_per_year) - 1) * 100, for the window ending on
+            each row.
+    """
+    return (np.exp(rolling_slope(np.log(prices), window) * periods_per_year) - 1) * 100
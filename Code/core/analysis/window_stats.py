@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+from core.cache import snapshot_cache
+from core.data_processing.price_panel import as_price_panel
+
+class WindowStats:
+    """
+    Prefix sums over a PricePanel for constant-time window metrics.
+
+    Cumulative sums of the daily log returns, simple returns, squared returns
+    and return counts are built once per panel, together with the next and
+    previous valid row of every ticker. The CAGR, mean return, variance and
+    observation count of any date window then come from a handful of lookups
+    per ticker instead of a scan of the window, so any number of windows
+    (horizons, backtest cut-offs, chart ranges) can be evaluated on one snapshot.
+    Use `window_stats` to share one index per snapshot.
+
+    Attributes:
+        panel (PricePanel): The price panel the statistics were built from.
+    """
+
+    # The prefix sums and valid-row lookups the index is made of, see `arrays`
+    ARRAYS = ('shift', 'sum', 'sum_sq', 'log_sum', 'count', 'prev_valid', 'next_valid')
+
+    def __init__(self, panel):
+        self.panel = panel
+        returns = panel.returns()
+        has_return = ~np.isnan(returns)
+        # Variance is shift invariant, centering the returns keeps the
+        # difference of sums accurate over long histories
+        counts = has_return.sum(axis=0)
+        shift = np.where(has_return, returns, 0.0).sum(axis=0) / np.maximum(counts, 1)
+        self._shift = shift
+        centered = np.where(has_return, returns - shift, 0.0)
+
+        n_rows, n_cols = panel.values.shape
+        self._sum = np.zeros((n_rows + 1, n_cols))
+        self._sum_sq = np.zeros((n_rows + 1, n_cols))
+        self._log_sum = np.zeros((n_rows + 1, n_cols))
+        self._count = np.zeros((n_rows + 1, n_cols), dtype='int32')
+        np.cumsum(centered, axis=0, out=self._sum[1:])
+        np.cumsum(centered ** 2, axis=0, out=self._sum_sq[1:])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            np.cumsum(np.where(has_return, np.log1p(returns), 0.0), axis=0, out=self._log_sum[1:])
+        np.cumsum(has_return, axis=0, out=self._count[1:])
+
+        valid = ~np.isnan(panel.values)
+        rows = np.arange(n_rows, dtype='int32')[:, None]
+        self._prev_valid = np.maximum.accumulate(np.where(valid, rows, -1).astype('int32'), axis=0)
+        self._next_valid = np.full((n_rows + 1, n_cols), n_rows, dtype='int32')
+        if n_rows:
+            self._next_valid[:-1] = np.minimum.accumulate(
+                np.where(valid, rows, n_rows).astype('int32')[::-1], axis=0)[::-1]
+
+    def arrays(self):
+        """
+        Returns the index's arrays, keyed by name, for `from_arrays`.
+        """
+        return {name: getattr(self, f'_{name}') for name in self.ARRAYS}
+
+    @classmethod
+    def from_arrays(cls, panel, arrays):
+        """
+        Rebuilds an index from its arrays without recomputing them, e.g. when
+        another process published them in shared memory or a snapshot file.
+
+        Args:
+            panel (PricePanel): The panel the arrays were built from.
+            arrays (dict): The arrays, as returned by `arrays`.
+
+        Returns:
+            WindowStats: The index, reading the given arrays.
+        """
+        stats = cls.__new__(cls)
+        stats.panel = panel
+        for name in cls.ARRAYS:
+            setattr(stats, f'_{name}', arrays[name])
+        return stats
+
+    def _window(self, start, end):
+        """
+        Finds the first and last price of every ticker inside a window and the
+        prefix-sum differences between them.
+        """
+        first_row, stop_row = self.panel.row_range(start, end)
+        if stop_row <= first_row:
+            return None
+        cols = np.arange(len(self.panel.tickers))
+        first = self._next_valid[first_row].astype('int64')
+        last = self._prev_valid[stop_row - 1].astype('int64')
+        has_prices = last > first
+        first = np.where(has_prices, first, 0)
+        last = np.where(has_prices, last, 0)
+
+        dates = self.panel.dates.values
+        years = ((dates[last] - dates[first]) // np.timedelta64(1, 'D')) / 365.25
+        # Returns on the rows after the first price, up to the last price
+        n = (self._count[last + 1, cols] - self._count[first + 1, cols]).astype('float64')
+        total = self._sum[last + 1, cols] - self._sum[first + 1, cols]
+        total_sq = self._sum_sq[last + 1, cols] - self._sum_sq[first + 1, cols]
+        log_return = self._log_sum[last + 1, cols] - self._log_sum[first + 1, cols]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, total / n + self._shift, np.nan)
+            variance = np.where(n >= 2, np.maximum(total_sq - total ** 2 / n, 0.0) / (n - 1), np.nan)
+        return {
+            'first': first, 'last': last, 'has_prices': has_prices, 'years': years,
+            'count': n, 'mean': mean, 'variance': variance, 'log_return': log_return,
+        }
+
+    def query(self, start=None, end=None, tickers=None):
+        """
+        Returns the return statistics of tickers over an arbitrary date range.
+
+        Args:
+            start (pd.Timestamp, optional): First date of the range, inclusive.
+            end (pd.Timestamp, optional): Last date of the range, inclusive.
+            tickers (list, optional): The tickers to return, in order. Defaults
+                                      to every ticker of the panel.
+
+        Returns:
+            pd.DataFrame: One row per ticker with the columns 'Ticker',
+                          'First_Date' and 'Last_Date' (first and last price in
+                          the range), 'Observations' (daily returns after the
+                          first price), 'Mean_Return' and 'Variance' (daily,
+                          sample variance), 'Log_Return' (total) and 'CAGR' (%).
+                          Tickers with fewer than two prices in the range are NaN.
+        """
+        n_cols = len(self.panel.tickers)
+        window = self._window(start, end)
+        result = pd.DataFrame({'Ticker': list(self.panel.tickers)})
+        if window is None:
+            window = {'has_prices': np.zeros(n_cols, dtype=bool), 'first': np.zeros(n_cols, dtype=int),
+                      'last': np.zeros(n_cols, dtype=int), 'years': np.zeros(n_cols)}
+            window.update({key: np.full(n_cols, np.nan) for key in ('count', 'mean', 'variance', 'log_return')})
+        has_prices = window['has_prices']
+        dates = self.panel.dates.values
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cagr = (np.exp(window['log_return'] / window['years']) - 1) * 100
+        result['First_Date'] = pd.DatetimeIndex(np.where(has_prices, dates[window['first']], np.datetime64('NaT')))
+        result['Last_Date'] = pd.DatetimeIndex(np.where(has_prices, dates[window['last']], np.datetime64('NaT')))
+        result['Observations'] = np.where(has_prices, window['count'], np.nan)
+        result['Mean_Return'] = np.where(has_prices, window['mean'], np.nan)
+        result['Variance'] = np.where(has_prices, window['variance'], np.nan)
+        result['Log_Return'] = np.where(has_prices, window['log_return'], np.nan)
+        result['CAGR'] = np.where(has_prices & (window['years'] > 0), cagr, np.nan)
+        if tickers is not None:
+            result = result.set_index('Ticker').reindex(list(tickers)).reset_index()
+        return result
+
+    def window_metrics(self, start=None, end=None):
+        """
+        Calculates the repo's CAGR and volatility of every ticker over a window.
+
+        The numbers match `get_etf_metrics_batch` for a window ending at `end`:
+        growth runs from the first to the last price inside the window, the
+        return on the first price is left out, and the standard deviation is
+        annualized and scaled down by the square root of the years covered.
+
+        Args:
+            start (pd.Timestamp, optional): First date of the window, inclusive.
+            end (pd.Timestamp, optional): Last date of the window, inclusive.
+
+        Returns:
+            tuple: Two float arrays with one entry per ticker of the panel:
+                   - annual growth in percent,
+                   - annualized standard deviation in percent, rounded to 2 decimals.
+                   Tickers with fewer than two prices in the window are NaN.
+        """
+        n_cols = len(self.panel.tickers)
+        growth = np.full(n_cols, np.nan)
+        std = np.full(n_cols, np.nan)
+        window = self._window(start, end)
+        if window is None:
+            return growth, std
+
+        first, last, years = window['first'], window['last'], window['years']
+        has_metrics = window['has_prices'] & (years > 0)
+        safe_years = np.where(has_metrics, years, 1.0)
+        cols = np.arange(n_cols)
+        values = self.panel.values
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cagr = ((values[last, cols] / values[first, cols]) ** (1 / safe_years) - 1) * 100
+            volatility = np.sqrt(window['variance']) * np.sqrt(252) * 100
+            volatility = np.round(volatility / np.sqrt(safe_years), 2)
+
+        growth[has_metrics] = cagr[has_metrics]
+        std[has_metrics] = volatility[has_metrics]
+        return growth, std
+
+
+@snapshot_cache(data_args=('data',), maxsize=8)
+def window_stats(data):
+    """
+    Returns the shared WindowStats index of a price snapshot.
+
+    The index is built on first use and cached per snapshot version, so every
+    caller working on the same snapshot queries the same prefix sums.
+
+    Args:
+        data (PricePanel or pd.DataFrame): The historical price data for all ETFs.
+
+    Returns:
+        WindowStats: The index of the snapshot.
+    """
+    return WindowStats(as_price_panel(data))
@@ -0,0 +1,261 @@
+import functools
+import hashlib
+import inspect
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from core.data_processing.price_panel import PricePanel
+
+
+def normalize_as_of(end_date):
+    """
+    Normalizes an as-of date to the trading day it belongs to.
+
+    The time of day is dropped and weekend dates roll back to the previous
+    Friday, so every request made during the same trading day (or over the
+    weekend after it) maps to the same date.
+
+    Args:
+        end_date (pd.Timestamp or datetime or str): The as-of date.
+
+    Returns:
+        pd.Timestamp: Midnight of the trading day.
+    """
+    return pd.offsets.BDay().rollback(pd.Timestamp(end_date).normalize())
+
+
+def data_version(data):
+    """
+    Returns a cheap fingerprint of a price data snapshot.
+
+    A PricePanel carries its version already. For a DataFrame, the shape,
+    column labels, first and last dates and the last row of prices are hashed,
+    which changes whenever a refresh adds or back-adjusts bars, without
+    hashing the whole history.
+
+    Args:
+        data (PricePanel or pd.DataFrame): The price data.
+
+    Returns:
+        str: The snapshot version id.
+    """
+    if isinstance(data, PricePanel):
+        return data.version
+    digest = hashlib.sha1()
+    digest.update(repr((data.shape, tuple(data.columns))).encode())
+    if len(data):
+        digest.update(repr((data.index[0], data.index[-1])).encode())
+        digest.update(np.ascontiguousarray(data.iloc[-1].to_numpy(dtype='float64')).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        frozen = tuple(value)
+        try:
+            hash(frozen)
+            return frozen
+        except TypeError:
+            return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def snapshot_cache(data_args=(), date_args=(), maxsize=256):
+    """
+    Caches a core computation by data snapshot and trading day.
+
+    The cache key is built from the call arguments, except that the price data
+    arguments in `data_args` are replaced by their `data_version` and the dates
+    in `date_args` are normalized with `normalize_as_of`. The wrapped function
+    is also called with the normalized dates, so a cached result is exactly what
+    a fresh call would return. Repeat calls within a trading day on the same
+    snapshot return from memory without hashing or scanning the price history.
+
+    Cached DataFrames are copied on the way out, so callers may modify them.
+
+    Args:
+        data_args (tuple, optional): Names of the price data arguments.
+        date_args (tuple, optional): Names of the as-of date arguments.
+        maxsize (int, optional): Number of results kept, least recently used
+                                 results are evicted first.
+
+    Returns:
+        function: The decorator. The decorated function gets `cache_clear()`
+                  and `cache_info()` methods, and a `cache_prime(result, *args,
+                  **kwargs)` method that stores a result computed elsewhere,
+                  e.g. loaded from a prebuilt snapshot.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        cache = OrderedDict()
+        lock = threading.Lock()
+        stats = {'hits': 0, 'misses': 0}
+
+        def make_key(args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            for name in date_args:
+                if bound.arguments[name] is not None:
+                    bound.arguments[name] = normalize_as_of(bound.arguments[name])
+
+            key = tuple(
+                (name, data_version(value) if name in data_args else _freeze(value))
+                for name, value in bound.arguments.items())
+            return bound, key
+
+        def store(key, result):
+            with lock:
+                cache[key] = result
+                cache.move_to_end(key)
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound, key = make_key(args, kwargs)
+
+            with lock:
+                if key in cache:
+                    cache.move_to_end(key)
+                    stats['hits'] += 1
+                    result = cache[key]
+                    return result.copy() if isinstance(result, pd.DataFrame) else result
+                stats['misses'] += 1
+
+            result = func(*bound.args, **bound.kwargs)
+            store(key, result)
+            return result.copy() if isinstance(result, pd.DataFrame) else result
+
+        def cache_prime(result, *args, **kwargs):
+            """
+            Stores a precomputed result for the given call arguments.
+            """
+            store(make_key(args, kwargs)[1], result)
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                stats['hits'] = stats['misses'] = 0
+
+        def cache_info():
+            with lock:
+                return {'hits': stats['hits'], 'misses': stats['misses'],
+                        'size': len(cache), 'maxsize': maxsize}
+
+        wrapper.cache_clear = cache_clear
+        wrapper.cache_prime = cache_prime
+        wrapper.cache_info = cache_info
+        return wrapper
+
+    return decorator
+
+
+def _copy_result(result):
+    if isinstance(result, pd.DataFrame):
+        return result.copy()
+    if isinstance(result, tuple):
+        return tuple(_copy_result(item) for item in result)
+    return result
+
+
+def memory_backend(func, ttl, resource):
+    """
+    The default `memoize` backend: an in-process cache with expiry.
+
+    Args:
+        func (function): The function to cache.
+        ttl (float or None): Seconds a result stays valid, None for no expiry.
+        resource (bool): Whether results are shared objects (returned as is)
+                         or data (DataFrames are copied on the way out).
+
+    Returns:
+        function: The cached function, with a `clear()` method.
+    """
+    cache = {}
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def cached(*args, **kwargs):
+        key = (_freeze(args), _freeze(kwargs))
+        now = time.monotonic()
+        with lock:
+            entry = cache.get(key)
+        if entry is None or (ttl is not None and now - entry[0] > ttl):
+            entry = (now, func(*args, **kwargs))
+            with lock:
+                cache[key] = entry
+        return entry[1] if resource else _copy_result(entry[1])
+
+    def clear():
+        with lock:
+            cache.clear()
+
+    cached.clear = clear
+    return cached
+
+
+_backend = {'factory': memory_backend}
+
+
+def set_cache_backend(factory):
+    """
+    Installs the backend of the `memoize` caches.
+
+    Core modules cache their loaders with `memoize` and never import a web
+    framework. An application installs its framework's cache here (the web
+    app installs `web_app.streamlit_cache.streamlit_backend`) before calling
+    any of them. Functions that were already called keep their backend.
+
+    Args:
+        factory (function): Called as `factory(func, ttl, resource)` and
+                            returning the cached function, which must have a
+                            `clear()` method. None restores `memory_backend`.
+    """
+    _backend['factory'] = factory or memory_backend
+
+
+def memoize(ttl=None, resource=False):
+    """
+    Caches a loader with the installed cache backend.
+
+    The backend is looked up on the first call, so the decorated modules can
+    be imported before the application has chosen one.
+
+    Args:
+        ttl (float, optional): Seconds a result stays valid. Defaults to no expiry.
+        resource (bool, optional): True for shared objects that are returned
+                                   by reference, False (the default) for data
+                                   that callers may modify.
+
+    Returns:
+        function: The decorator. The decorated function gets a `clear()` method.
+    """
+    def decorator(func):
+        state = {}
+        lock = threading.Lock()
+
+        def backend_function():
+            if 'cached' not in state:
+                with lock:
+                    if 'cached' not in state:
+                        state['cached'] = _backend['factory'](func, ttl, resource)
+            return state['cached']
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return backend_function()(*args, **kwargs)
+
+        def clear():
+            if 'cached' in state:
+                state['cached'].clear()
+
+        wrapper.clear = clear
+        return wrapper
+
+    return decorator
@@ -1,72 +1,85 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import streamlit as st
+from core.cache import snapshot_cache
+from core.data_processing.price_panel import as_price_panel
+from core.analysis.window_stats import window_stats
 
 
-@st.cache_data(ttl=86400, show_spinner=False)
+@snapshot_cache(data_args=('all_data',), date_args=('end_date',))
+def get_etf_metrics_batch(tickers, time_horizons, all_data, end_date):
+    """
+    Calculates CAGR and volatility for many ETFs and time horizons at once.
+
+    This is the batched form of `get_etf_data`: for every requested horizon,
+    the metrics of all tickers are looked up in the snapshot's prefix-sum
+    index (see `window_stats`) instead of scanning the price history, and the
+    results are returned as a single wide frame. The numbers match
+    `get_etf_data` for each horizon, so the scoring functions can use the
+    frame directly, and rows can be selected with `df[df['Ticker'].isin(...)]`
+    instead of recomputing per ticker list.
+    Results are cached per data snapshot and trading day (see `snapshot_cache`).
+
+    Args:
+        tickers (list): A list of ETF ticker symbols to analyze.
+        time_horizons (list): The horizons, in years, to calculate metrics for.
+        all_data (PricePanel or pd.DataFrame): The historical price data for all ETFs.
+        end_date (pd.Timestamp): The final date for the analysis period.
+
+    Returns:
+        pd.DataFrame: A DataFrame with one row per ticker, a 'Ticker' column and
+                      'Annual_Growth_{h}Y' and 'Standard_Deviation_{h}Y'
+                      columns for every horizon. Metrics that cannot be
+                      calculated are NaN.
+    """
+    panel = as_price_panel(all_data)
+    stats = window_stats(panel)
+    column_numbers = np.array([panel.columns.get(ticker, -1) for ticker in tickers], dtype=int)
+    known = column_numbers >= 0
+
+    results = pd.DataFrame({'Ticker': list(tickers)})
+    for time_horizon in dict.fromkeys(time_horizons):
+        start_date = end_date - pd.DateOffset(years=time_horizon)
+        growth, std = stats.window_metrics(start=start_date)
+
+        annual_growth = np.full(len(tickers), np.nan)
+        annual_std = np.full(len(tickers), np.nan)
+        annual_growth[known] = growth[column_numbers[known]]
+        annual_std[known] = std[column_numbers[known]]
+        results[f'Annual_Growth_{time_horizon}Y'] = annual_growth
+        results[f'Standard_Deviation_{time_horizon}Y'] = annual_std
+
+    return results
+
+
+@snapshot_cache(data_args=('all_data',), date_args=('end_date',))
 def get_etf_data(tickers, time_horizon, all_data, end_date):
     """
     Calculates key financial metrics for a list of ETFs over a specified time horizon.
 
-    This function iterates through a list of ETF tickers, calculating the
-    compound annual growth rate (CAGR) and the annualized standard deviation
-    for each one over the given `time_horizon`.
+    This function calculates the compound annual growth rate (CAGR) and the
+    annualized standard deviation of each ETF over the given `time_horizon`.
+    The rows are selected from `get_etf_metrics_batch` over every ticker of
+    the data for that horizon, so every candidate list shares one batch, and
+    a snapshot's precomputed metrics serve it (see `Snapshot.prime_caches`).
+    Results are cached per data snapshot and trading day, so `end_date` is
+    normalized to the trading day it falls on.
 
     Args:
         tickers (list): A list of ETF ticker symbols to analyze.
         time_horizon (int): The number of years to use for the metric calculation.
-        all_data (pd.DataFrame): A multi-level indexed DataFrame containing historical
-                                 price data for all ETFs, with tickers as the top level.
+        all_data (PricePanel or pd.DataFrame): The historical price data for all
+                                 ETFs, either as a price panel or as a multi-level
+                                 indexed DataFrame with tickers as the top level.
         end_date (pd.Timestamp): The final date for the analysis period.
 
     Returns:
         pd.DataFrame: A DataFrame where each row represents an ETF and includes
                       its ticker, calculated annual growth, and standard deviation.
     """
-
-    start_date = end_date - pd.DateOffset(years=time_horizon)
-    results = []
-
-    # Filter time period
-    period_data = all_data[all_data.index >= start_date]
-
-    for i, ticker in enumerate(tickers):
-        row = {'Ticker': ticker}
-        try:
-            # Check if ticker exists in the data
-            if ticker not in all_data.columns.get_level_values(0):
-                annual_growth, annual_std = None, None
-            else:
-                # Get data for this specific ticker
-                ticker_data = period_data[(ticker, 'Adj Close')].dropna()
-
-                if len(ticker_data) < 2:
-                    annual_growth, annual_std = None, None
-                else:
-                    # Find the start and end price to calculate compound annual growth rate
-                    start_price = ticker_data.iloc[0]
-                    end_price = ticker_data.iloc[-1]
-                    actual_days = (
-                        ticker_data.index[-1] - ticker_data.index[0]).days
-                    actual_years = actual_days / 365.25
-
-                    annual_growth = ((end_price / start_price)
-                                     ** (1 / actual_years) - 1) * 100
-
-                    # calculate annual standard deviation
-                    daily_returns = ticker_data.pct_change().dropna()
-                    annual_std_1y = daily_returns.std() * np.sqrt(252) * 100
-                    annual_std = annual_std_1y / np.sqrt(actual_years)
-                    annual_std = round(annual_std, 2)
-        except:
-            annual_growth, annual_std = None, None
-
-        row[f'Annual_Growth_{time_horizon}Y'] = annual_growth
-        row[f'Standard_Deviation_{time_horizon}Y'] = annual_std
-        results.append(row)
-
-    return pd.DataFrame(results)
+    panel = as_price_panel(all_data)
+    metrics = get_etf_metrics_batch(panel.tickers, [time_horizon], panel, end_date)
+    return pd.DataFrame({'Ticker': list(tickers)}).merge(metrics, on='Ticker', how='left')
 
 
 def filter_etf_data(data, user_return, user_risk, user_time_horizon):
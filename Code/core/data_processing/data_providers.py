@@ -0,0 +1,385 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+import zlib
+import numpy as np
+import pandas as pd
+from config.constants import (
+    DATA_PROVIDER, FIXTURE_DIR, SYNTHETIC_SEED, PRICE_STORE_DIR, RATE_STORE_DIR
+)
+from core.data_processing.price_store import (
+    refresh_price_store, load_price_store, append_ticker, read_ticker
+)
+from core.data_processing.rate_store import (
+    BOC_SERIES, parse_rate_observations, refresh_rate_store, read_rate_store
+)
+
+RISK_FREE_FILE = 'risk_free.csv'
+
+
+class DataProvider:
+    """
+    Source of ETF prices and risk-free rates.
+
+    Subclasses implement `fetch_prices` and `fetch_risk_free`. The pipeline
+    calls `load_prices` and `fetch_risk_free` and never talks to Yahoo Finance
+    or the Bank of Canada directly, so a recorded or synthetic provider can be
+    swapped in to run it without network access.
+    """
+
+    name = 'base'
+
+    def fetch_prices(self, tickers, start=None):
+        """
+        Fetches adjusted close prices.
+
+        Args:
+            tickers (list): The ticker symbols to fetch.
+            start (pd.Timestamp, optional): First date to fetch. Defaults to
+                                            the full available history.
+
+        Returns:
+            pd.DataFrame: A DataFrame with (ticker, 'Adj Close') MultiIndex
+                          columns, in the layout produced by `yf.download`.
+        """
+        raise NotImplementedError
+
+    def fetch_risk_free(self, start_date="1995-01-01"):
+        """
+        Fetches the daily 3-month Treasury Bill yield.
+
+        Args:
+            start_date (str, optional): First date to fetch, 'YYYY-MM-DD'.
+
+        Returns:
+            pd.DataFrame: A DataFrame indexed by date with a single
+                          'yield_pct' column.
+        """
+        raise NotImplementedError
+
+    def load_prices(self, tickers):
+        """
+        Loads the full price history of the given tickers.
+
+        Args:
+            tickers (list): The ticker symbols to load.
+
+        Returns:
+            tuple: A tuple containing:
+                - valid_tickers (list): The tickers with valid 'Adj Close' data.
+                - data (pd.DataFrame): The (ticker, 'Adj Close') prices of the
+                  valid tickers.
+        """
+        data = self.fetch_prices(tickers)
+        valid_tickers = [ticker for ticker in tickers
+                         if (ticker, 'Adj Close') in data.columns
+                         and not data[(ticker, 'Adj Close')].dropna().empty]
+        return valid_tickers, data.loc[:, [(ticker, 'Adj Close') for ticker in valid_tickers]]
+
+
+class LiveDataProvider(DataProvider):
+    """
+    Prices from Yahoo Finance, kept in the local price store, and rates from
+    the Bank of Canada Valet API, kept in the local rate store.
+    """
+
+    name = 'live'
+
+    def __init__(self, store_dir=PRICE_STORE_DIR, rate_store_dir=RATE_STORE_DIR):
+        self.store_dir = store_dir
+        self.rate_store_dir = rate_store_dir
+
+    def fetch_prices(self, tickers, start=None):
+        import yfinance as yf
+
+        if start is None:
+            return yf.download(tickers, period="max", group_by='ticker',
+                               auto_adjust=False, progress=False)
+        return yf.download(tickers, start=pd.Timestamp(start).strftime('%Y-%m-%d'),
+                           group_by='ticker', auto_adjust=False, progress=False)
+
+    def load_prices(self, tickers):
+        try:
+            refresh_price_store(tickers, self, self.store_dir)
+        except Exception as e:
+            # Serve the last stored prices rather than failing when offline
+            print(f"Price store refresh failed, using stored data: {e}")
+        return load_price_store(tickers, self.store_dir)
+
+    def fetch_rate_observations(self, start_date="1995-01-01"):
+        """
+        Downloads the Bank of Canada 3-month T-Bill yields from a start date.
+
+        Args:
+            start_date (str or pd.Timestamp, optional): The first date to download.
+
+        Returns:
+            pd.DataFrame: The observations indexed by 'date', with a 'yield_pct'
+                          column. Empty if the series has no observation on or
+                          after `start_date` yet.
+
+        Raises:
+            RuntimeError: If the request fails or the response is not valid JSON.
+        """
+        import requests
+
+        start_date = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+        url = f"https://www.bankofcanada.ca/valet/observations/{BOC_SERIES}/json?start_date={start_date}"
+        response = requests.get(url)
+        try:
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            # surface the HTTP error with context
+            raise RuntimeError(
+                f"Failed to fetch BoC data: {e}. Response text: {response.text[:500]}") from e
+
+        try:
+            payload = response.json()
+        except ValueError as e:
+            raise RuntimeError(
+                f"Response not valid JSON. Raw content starts with: {response.text[:500]}") from e
+
+        if "observations" not in payload:
+            raise RuntimeError(
+                f"No observations in API response. Full payload: {payload}")
+        return parse_rate_observations(payload["observations"])
+
+    def fetch_risk_free(self, start_date="1995-01-01"):
+        try:
+            refresh_rate_store(self, start_date, self.rate_store_dir)
+        except Exception as e:
+            # Serve the last stored rates rather than failing when offline
+            print(f"Rate store refresh failed, using stored data: {e}")
+        rates = read_rate_store(self.rate_store_dir)
+        rates = rates[rates.index >= pd.Timestamp(start_date)]
+        if rates.empty:
+            raise RuntimeError(f"No risk-free rates available from {start_date}.")
+        return rates
+
+
+class ReplayDataProvider(DataProvider):
+    """
+    Replays a fixture recorded with `record_fixture`.
+
+    The fixture directory holds a price store under 'prices/' and the
+    risk-free series in 'risk_free.csv'. Nothing is fetched from the network.
+    """
+
+    name = 'replay'
+
+    def __init__(self, fixture_dir=FIXTURE_DIR):
+        self.fixture_dir = fixture_dir
+        self.store_dir = os.path.join(fixture_dir, 'prices')
+
+    def fetch_prices(self, tickers, start=None):
+        _, data = load_price_store(tickers, self.store_dir)
+        if start is not None:
+            data = data[data.index >= pd.Timestamp(start)]
+        return data
+
+    def load_prices(self, tickers):
+        return load_price_store(tickers, self.store_dir)
+
+    def fetch_risk_free(self, start_date="1995-01-01"):
+        path = os.path.join(self.fixture_dir, RISK_FREE_FILE)
+        if not os.path.exists(path):
+            raise RuntimeError(f"No recorded risk-free rates in fixture: {path}")
+        df = pd.read_csv(path, index_col='date', parse_dates=['date']).sort_index()
+        return df[df.index >= pd.Timestamp(start_date)]
+
+
+class SyntheticDataProvider(DataProvider):
+    """
+    Deterministic synthetic prices and rates generated from a seed.
+
+    See `generate_synthetic_prices` and `generate_synthetic_risk_free`.
+    """
+
+    name = 'synthetic'
+
+    def __init__(self, seed=SYNTHETIC_SEED, start="1995-01-02", end=None):
+        self.seed = seed
+        self.start = start
+        self.end = end
+
+    def fetch_prices(self, tickers, start=None):
+        data = generate_synthetic_prices(tickers, self.start, self.end, self.seed)
+        if start is not None:
+            data = data[data.index >= pd.Timestamp(start)]
+        return data
+
+    def fetch_risk_free(self, start_date="1995-01-01"):
+        df = generate_synthetic_risk_free(self.start, self.end, self.seed)
+        return df[df.index >= pd.Timestamp(start_date)]
+
+
+def generate_synthetic_prices(
+    tickers, start="1995-01-02", end=None, seed=SYNTHETIC_SEED,
+    max_inception_years=25, gap_rate=0.002
+):
+    """
+    Generates a synthetic price history with the layout of `yf.download`.
+
+    Each ticker follows a geometric Brownian motion with its own drift and
+    volatility. About a third of the tickers exist from `start`; the others
+    have a random inception date, with NaNs before it. Market holidays are
+    missing from the index altogether and individual tickers have sporadic
+    missing bars, like the data Yahoo Finance returns.
+
+    Every ticker is seeded from `seed` and its own symbol, so its prices do not
+    depend on which other tickers are generated, and extending `end` keeps the
+    prices of the earlier dates unchanged.
+
+    Args:
+        tickers (list): The ticker symbols to generate.
+        start (str, optional): First business day of the history.
+        end (str, optional): Last business day of the history. Defaults to today.
+        seed (int, optional): Seed of the random generator.
+        max_inception_years (float, optional): Latest inception date, in years
+                                               after `start`.
+        gap_rate (float, optional): Probability of a missing bar per ticker and day.
+
+    Returns:
+        pd.DataFrame: A DataFrame with (ticker, 'Adj Close') MultiIndex columns.
+    """
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp.today().normalize()
+    all_dates = pd.bdate_range(start, end)
+    n_dates = len(all_dates)
+    rows = np.arange(n_dates)
+    prices = np.empty((n_dates, len(tickers)), order='F')
+
+    for j, ticker in enumerate(tickers):
+        # Seed every ticker on its own so its path does not depend on the rest of the universe
+        ticker_seed = np.random.SeedSequence([seed, zlib.crc32(ticker.encode())])
+        meta_rng, path_rng, gap_rng = [np.random.default_rng(s) for s in ticker_seed.spawn(3)]
+
+        drift = meta_rng.normal(0.06, 0.04)
+        volatility = meta_rng.uniform(0.03, 0.30)
+        start_price = meta_rng.uniform(10, 50)
+        if meta_rng.random() < 1 / 3:
+            inception = 0
+        else:
+            inception = meta_rng.integers(0, int(max_inception_years * 252) + 1)
+
+        log_returns = (drift - volatility ** 2 / 2) / 252 + \
+            volatility / np.sqrt(252) * path_rng.standard_normal(n_dates)
+        log_returns[:inception + 1] = 0.0
+        column = start_price * np.exp(np.cumsum(log_returns))
+        column[rows < inception] = np.nan
+        column[gap_rng.random(n_dates) < gap_rate] = np.nan
+        prices[:, j] = column
+
+    # Roughly nine exchange holidays a year
+    holiday_rng = np.random.default_rng(np.random.SeedSequence(seed).spawn(1)[0])
+    trading_days = holiday_rng.random(n_dates) >= 9 / 261
+    columns = pd.MultiIndex.from_tuples(
+        [(ticker, 'Adj Close') for ticker in tickers], names=['Ticker', 'Price'])
+    data = pd.DataFrame(np.ascontiguousarray(prices[trading_days]), index=all_dates[trading_days], columns=columns)
+    data.index.name = 'Date'
+    return data
+
+
+def generate_synthetic_risk_free(start="1995-01-02", end=None, seed=SYNTHETIC_SEED):
+    """
+    Generates a synthetic daily 3-month Treasury Bill yield.
+
+    The yield is a mean-reverting random walk around 2.5%, floored at 0.1%.
+
+    Args:
+        start (str, optional): First business day of the series.
+        end (str, optional): Last business day of the series. Defaults to today.
+        seed (int, optional): Seed of the random generator.
+
+    Returns:
+        pd.DataFrame: A DataFrame indexed by date with a 'yield_pct' column.
+    """
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp.today().normalize()
+    dates = pd.bdate_range(start, end, name='date')
+    rng = np.random.default_rng(np.random.SeedSequence(seed).spawn(2)[1])
+    shocks = rng.normal(0, 0.03, len(dates))
+
+    rates = np.empty(len(dates))
+    level = 2.5
+    for i, shock in enumerate(shocks):
+        level += 0.002 * (2.5 - level) + shock
+        level = max(level, 0.1)
+        rates[i] = level
+    return pd.DataFrame({'yield_pct': rates.round(2)}, index=dates)
+
+
+def record_fixture(fixture_dir, tickers, provider=None, start_date="1995-01-01"):
+    """
+    Records prices and risk-free rates from a provider for later replay.
+
+    Args:
+        fixture_dir (str): Directory to write the fixture to.
+        tickers (list): The ticker symbols to record.
+        provider (DataProvider, optional): The provider to record from.
+                                           Defaults to the live provider.
+        start_date (str, optional): First date of the recorded risk-free rates.
+
+    Returns:
+        list: The tickers that were recorded.
+    """
+    provider = provider or LiveDataProvider()
+    replay = ReplayDataProvider(fixture_dir)
+
+    valid_tickers, data = provider.load_prices(tickers)
+    for ticker in valid_tickers:
+        if read_ticker(ticker, replay.store_dir).empty:
+            append_ticker(ticker, data[(ticker, 'Adj Close')], replay.store_dir)
+
+    os.makedirs(fixture_dir, exist_ok=True)
+    provider.fetch_risk_free(start_date).to_csv(os.path.join(fixture_dir, RISK_FREE_FILE))
+    return valid_tickers
+
+
+_provider = None
+
+
+def get_data_provider():
+    """
+    Returns the data provider used by the pipeline.
+
+    Defaults to the provider named by the ETF_DATA_PROVIDER environment
+    variable ('live', 'replay' or 'synthetic'), unless one was installed
+    with `set_data_provider`.
+
+    Returns:
+        DataProvider: The active data provider.
+
+    Raises:
+        ValueError: If ETF_DATA_PROVIDER names an unknown provider.
+    """
+    global _provider
+    if _provider is None:
+        providers = {
+            'live': LiveDataProvider,
+            'replay': ReplayDataProvider,
+            'synthetic': SyntheticDataProvider,
+        }
+        if DATA_PROVIDER not in providers:
+            raise ValueError(
+                f"Unknown data provider '{DATA_PROVIDER}'. Expected one of {sorted(providers)}.")
+        _provider = providers[DATA_PROVIDER]()
+    return _provider
+
+
+def set_data_provider(provider):
+    """
+    Installs the data provider used by the pipeline.
+
+    Args:
+        provider (DataProvider or None): The provider to use, or None to go
+                                         back to the ETF_DATA_PROVIDER default.
+    """
+    global _provider
+    _provider = provider
+
+
+if __name__ == "__main__":
+    from core.data_processing.ishares_ETF_list import ETF_LIST
+
+    recorded = record_fixture(FIXTURE_DIR, ETF_LIST)
+    print(f"Recorded {len(recorded)} tickers to {FIXTURE_DIR}")
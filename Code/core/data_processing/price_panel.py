@@ -0,0 +1,198 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+
+class PricePanel:
+    """
+    Dense dates x tickers matrix of adjusted close prices.
+
+    The panel is built once per data snapshot and shared by the core modules
+    instead of the (ticker, 'Adj Close') MultiIndex DataFrame, so they can
+    work on contiguous NumPy columns rather than extracting and cleaning a
+    pandas Series per ticker on every call.
+
+    Attributes:
+        values (np.ndarray): C-contiguous float64 matrix of prices, one row per
+                             date and one column per ticker, NaN where a
+                             ticker has no bar.
+        dates (pd.DatetimeIndex): The sorted dates of the rows.
+        tickers (list): The ticker symbols of the columns.
+        columns (dict): Mapping from ticker symbol to column number.
+        first_valid (np.ndarray): Row of the first price of each ticker, or -1.
+        last_valid (np.ndarray): Row of the last price of each ticker, or -1.
+        version (str): Fingerprint of the underlying data snapshot.
+    """
+
+    def __init__(self, values, dates, tickers, version=None, returns=None):
+        self.values = np.ascontiguousarray(values, dtype='float64')
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = list(tickers)
+        self.columns = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+        valid = ~np.isnan(self.values)
+        has_data = valid.any(axis=0)
+        n_rows = len(self.dates)
+        self.first_valid = np.where(has_data, valid.argmax(axis=0), -1)
+        self.last_valid = np.where(has_data, n_rows - 1 - valid[::-1].argmax(axis=0), -1)
+        self.version = version if version is not None else self._fingerprint()
+        # A precomputed `returns()` matrix, e.g. one shared by another process
+        self._returns = returns
+
+    @classmethod
+    def from_frame(cls, data):
+        """
+        Builds a panel from a price DataFrame.
+
+        Args:
+            data (pd.DataFrame): Prices with (ticker, 'Adj Close') MultiIndex
+                                 columns, as returned by `download_valid_data`,
+                                 or with one plain column per ticker.
+
+        Returns:
+            PricePanel: The price panel.
+        """
+        if isinstance(data.columns, pd.MultiIndex):
+            data = data.loc[:, [col for col in data.columns if col[1] == 'Adj Close']]
+            tickers = [col[0] for col in data.columns]
+        else:
+            tickers = list(data.columns)
+        data = data.sort_index()
+        return cls(data.to_numpy(dtype='float64'), data.index, tickers)
+
+    def _fingerprint(self):
+        digest = hashlib.sha1()
+        digest.update('\x1f'.join(self.tickers).encode())
+        digest.update(np.asarray(self.dates.asi8).tobytes())
+        digest.update(self.first_valid.tobytes())
+        if len(self.dates):
+            digest.update(self.values[-1].tobytes())
+        return digest.hexdigest()[:16]
+
+    def __contains__(self, ticker):
+        return ticker in self.columns
+
+    def __len__(self):
+        return len(self.dates)
+
+    def row_range(self, start=None, end=None):
+        """
+        Finds the rows between two dates, both inclusive.
+
+        Args:
+            start (pd.Timestamp, optional): First date. Defaults to the first row.
+            end (pd.Timestamp, optional): Last date. Defaults to the last row.
+
+        Returns:
+            tuple: (first_row, stop_row) suitable for slicing `values`.
+        """
+        first_row = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side='left')
+        stop_row = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side='right')
+        return first_row, max(first_row, stop_row)
+
+    def window(self, start=None, end=None):
+        """
+        Restricts the panel to a date window without copying the prices.
+
+        Args:
+            start (pd.Timestamp, optional): First date, inclusive.
+            end (pd.Timestamp, optional): Last date, inclusive.
+
+        Returns:
+            PricePanel: A panel whose `values` is a view into this panel.
+        """
+        first_row, stop_row = self.row_range(start, end)
+        return PricePanel(self.values[first_row:stop_row], self.dates[first_row:stop_row],
+                          self.tickers, version=f'{self.version}:{first_row}:{stop_row}')
+
+    def returns(self):
+        """
+        Returns the daily simple returns of every ticker.
+
+        The return on a row is measured against the ticker's previous valid
+        price, skipping missing bars, which matches
+        `prices.dropna().pct_change()` per ticker. Rows without a price, and
+        the first price of each ticker in the panel, are NaN. The matrix is
+        computed once and cached on the panel.
+
+        Returns:
+            np.ndarray: A float64 matrix with the same shape as `values`.
+        """
+        if self._returns is None:
+            valid = ~np.isnan(self.values)
+            rows = np.arange(len(self.dates))[:, None]
+            last_seen = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+            previous_row = np.empty_like(last_seen)
+            previous_row[:1] = -1
+            previous_row[1:] = last_seen[:-1]
+            previous_price = np.take_along_axis(self.values, np.maximum(previous_row, 0), axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self._returns = np.where(valid & (previous_row >= 0),
+                                         self.values / previous_price - 1, np.nan)
+        return self._returns
+
+    def column(self, ticker):
+        """
+        Returns the full price column of a ticker, NaNs included, as a view.
+
+        Args:
+            ticker (str): The ticker symbol.
+
+        Returns:
+            np.ndarray: The prices of the ticker, one per row.
+        """
+        return self.values[:, self.columns[ticker]]
+
+    def series(self, ticker):
+        """
+        Returns the valid prices of a ticker as a Series.
+
+        Equivalent to `data[(ticker, 'Adj Close')].dropna()` on the original
+        DataFrame.
+
+        Args:
+            ticker (str): The ticker symbol.
+
+        Returns:
+            pd.Series: The prices of the ticker indexed by date, without NaNs.
+
+        Raises:
+            KeyError: If the ticker is not in the panel.
+        """
+        j = self.columns[ticker]
+        if self.first_valid[j] < 0:
+            return pd.Series(dtype='float64', name=ticker)
+        rows = slice(self.first_valid[j], self.last_valid[j] + 1)
+        prices = self.values[rows, j]
+        valid = ~np.isnan(prices)
+        return pd.Series(prices[valid], index=self.dates[rows][valid], name=ticker)
+
+    def to_frame(self):
+        """
+        Converts the panel back to the (ticker, 'Adj Close') DataFrame layout.
+
+        Returns:
+            pd.DataFrame: The prices with MultiIndex columns.
+        """
+        columns = pd.MultiIndex.from_tuples(
+            [(ticker, 'Adj Close') for ticker in self.tickers], names=['Ticker', 'Price'])
+        return pd.DataFrame(self.values, index=self.dates, columns=columns)
+
+
+def as_price_panel(data):
+    """
+    Returns `data` as a PricePanel, building one if a DataFrame is passed.
+
+    Core functions call this on their price argument so they accept both the
+    shared panel and the legacy MultiIndex DataFrame. Callers that make
+    several calls should build the panel once and pass it along.
+
+    Args:
+        data (PricePanel or pd.DataFrame): The price data.
+
+    Returns:
+        PricePanel: The price panel.
+    """
+    if isinstance(data, PricePanel):
+        return data
+    return PricePanel.from_frame(data)
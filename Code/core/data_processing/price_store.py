@@ -0,0 +1,251 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+import json
+import numpy as np
+import pandas as pd
+from config.constants import PRICE_STORE_DIR, PRICE_STORE_OVERLAP_DAYS, PRICE_ADJUSTMENT_TOLERANCE
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def _ticker_paths(ticker, store_dir):
+    return (os.path.join(store_dir, f'{ticker}.dates.npy'),
+            os.path.join(store_dir, f'{ticker}.close.npy'))
+
+
+def _save_array(path, array):
+    # Write to a temporary file first so readers never see a half-written array
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def read_manifest(store_dir=PRICE_STORE_DIR):
+    """
+    Reads the price store manifest.
+
+    The manifest records the last stored bar for every ticker and the date
+    of the last successful refresh, so a refresh knows where to resume.
+
+    Args:
+        store_dir (str, optional): Directory of the price store.
+
+    Returns:
+        dict: A dictionary with a 'tickers' mapping (ticker -> 'YYYY-MM-DD' of
+              the last stored bar) and a 'last_refresh' date string or None.
+    """
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'tickers': {}, 'last_refresh': None}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(manifest, store_dir=PRICE_STORE_DIR):
+    """
+    Atomically writes the price store manifest.
+
+    Args:
+        manifest (dict): The manifest as returned by `read_manifest`.
+        store_dir (str, optional): Directory of the price store.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def read_ticker(ticker, store_dir=PRICE_STORE_DIR):
+    """
+    Reads the stored 'Adj Close' history of a single ticker.
+
+    The arrays are memory-mapped, so only the pages that are actually used
+    get read from disk.
+
+    Args:
+        ticker (str): The ticker symbol.
+        store_dir (str, optional): Directory of the price store.
+
+    Returns:
+        pd.Series: The adjusted close prices indexed by date, or an empty
+                   Series if the ticker is not in the store.
+    """
+    dates_path, close_path = _ticker_paths(ticker, store_dir)
+    if not (os.path.exists(dates_path) and os.path.exists(close_path)):
+        return pd.Series(dtype='float64', name=ticker)
+    dates = np.load(dates_path, mmap_mode='r')
+    closes = np.load(close_path, mmap_mode='r')
+    return pd.Series(closes, index=pd.DatetimeIndex(dates), name=ticker)
+
+
+def _adjustment_ratio(stored, prices):
+    """
+    Detects a back-adjustment of the stored history from the overlap bars.
+
+    Only the overlap bars before the last stored one are compared, as the last
+    one may be a partial close from a refresh during market hours. The history
+    counts as back-adjusted when at least two of them moved, all by the same
+    ratio; otherwise the ratio is 1.
+    """
+    settled = stored.index[:-1].intersection(prices.index)
+    if len(settled) < 2:
+        return 1.0
+    ratios = prices.loc[settled].to_numpy(dtype='float64') / stored.loc[settled].to_numpy(dtype='float64')
+    ratios = ratios[np.isfinite(ratios) & (ratios > 0)]
+    if len(ratios) < 2:
+        return 1.0
+    ratio = float(np.median(ratios))
+    consistent = np.all(np.abs(ratios / ratio - 1) <= PRICE_ADJUSTMENT_TOLERANCE)
+    if consistent and abs(ratio - 1) > PRICE_ADJUSTMENT_TOLERANCE:
+        return ratio
+    return 1.0
+
+
+def append_ticker(ticker, prices, store_dir=PRICE_STORE_DIR):
+    """
+    Appends new bars for a ticker to the store.
+
+    The last stored bar is always replaced by the fetched one, since it may
+    have been stored from a partial trading day, and the bars after it are
+    appended. If the settled overlap bars before it all moved by the same
+    ratio (a dividend or split was paid since the last refresh, so the
+    provider back-adjusted history), the stored history is rescaled by that
+    ratio so the series stays consistent with a full download. `prices`
+    should start a few bars before the last stored date for the detection,
+    see `refresh_price_store`.
+
+    Args:
+        ticker (str): The ticker symbol.
+        prices (pd.Series): Adjusted close prices indexed by date.
+        store_dir (str, optional): Directory of the price store.
+
+    Returns:
+        pd.Timestamp or None: The last stored date after the append, or None
+                              if the ticker still has no data.
+    """
+    prices = prices.dropna().sort_index()
+    stored = read_ticker(ticker, store_dir)
+
+    if stored.empty:
+        combined = prices
+    else:
+        last_date = stored.index[-1]
+        history = pd.Series(stored.to_numpy(dtype='float64', copy=True), index=stored.index)
+        history *= _adjustment_ratio(history, prices)
+        if last_date in prices.index:
+            combined = pd.concat([history[history.index < last_date], prices[prices.index >= last_date]])
+        else:
+            combined = pd.concat([history, prices[prices.index > last_date]])
+
+    if combined.empty:
+        return None
+
+    os.makedirs(store_dir, exist_ok=True)
+    dates_path, close_path = _ticker_paths(ticker, store_dir)
+    _save_array(close_path, combined.to_numpy(dtype='float64'))
+    _save_array(dates_path, combined.index.values.astype('datetime64[ns]'))
+    return combined.index[-1]
+
+
+def _adj_close_column(data, ticker):
+    if isinstance(data.columns, pd.MultiIndex):
+        if (ticker, 'Adj Close') in data.columns:
+            return data[(ticker, 'Adj Close')]
+        return None
+    if 'Adj Close' in data.columns:
+        return data['Adj Close']
+    return None
+
+
+def refresh_price_store(tickers, provider, store_dir=PRICE_STORE_DIR, force=False):
+    """
+    Brings the price store up to date with a data provider.
+
+    Tickers that are not stored yet are downloaded with their full history.
+    Tickers that are already stored only fetch the bars from a few days
+    before their last stored date onwards, so a daily refresh downloads a few
+    rows per ticker instead of several decades. Tickers are fetched in groups
+    of the same last stored date, so a stale or delisted ticker does not make
+    the others re-download its gap. The refresh is skipped if it already ran
+    today.
+
+    Args:
+        tickers (list): The ticker symbols to keep in the store.
+        provider (DataProvider): The provider to fetch new bars from.
+        store_dir (str, optional): Directory of the price store.
+        force (bool, optional): Refresh even if the store was refreshed today.
+
+    Returns:
+        list: The tickers whose stored history changed.
+    """
+    manifest = read_manifest(store_dir)
+    today = pd.Timestamp.today().normalize()
+    if not force and manifest['last_refresh'] == today.strftime('%Y-%m-%d'):
+        return []
+
+    stored = manifest['tickers']
+    new_tickers = [t for t in tickers if t not in stored]
+    known_tickers = [t for t in tickers if t in stored]
+
+    downloads = []
+    if new_tickers:
+        downloads.append((new_tickers, provider.fetch_prices(new_tickers)))
+    groups = {}
+    for ticker in known_tickers:
+        groups.setdefault(stored[ticker], []).append(ticker)
+    for last_date, group in sorted(groups.items()):
+        # Re-fetch a few bars before the last stored one to detect back-adjustments
+        start = pd.Timestamp(last_date) - pd.Timedelta(days=PRICE_STORE_OVERLAP_DAYS)
+        downloads.append((group, provider.fetch_prices(group, start)))
+
+    updated = []
+    for batch, data in downloads:
+        for ticker in batch:
+            prices = _adj_close_column(data, ticker)
+            if prices is None or prices.dropna().empty:
+                continue
+            last_date = append_ticker(ticker, prices, store_dir)
+            if last_date is not None:
+                stored[ticker] = last_date.strftime('%Y-%m-%d')
+                updated.append(ticker)
+
+    # Providers return empty frames when the network is down; retry on the next call
+    if any(not data.empty for _, data in downloads):
+        manifest['last_refresh'] = today.strftime('%Y-%m-%d')
+    write_manifest(manifest, store_dir)
+    return updated
+
+
+def load_price_store(tickers, store_dir=PRICE_STORE_DIR):
+    """
+    Loads the stored price history in the layout produced by `yf.download`.
+
+    Args:
+        tickers (list): The ticker symbols to load, in the desired column order.
+        store_dir (str, optional): Directory of the price store.
+
+    Returns:
+        tuple: A tuple containing:
+            - valid_tickers (list): The tickers that have stored data.
+            - data (pd.DataFrame): A DataFrame with (ticker, 'Adj Close')
+              MultiIndex columns, indexed by date.
+    """
+    series = {}
+    for ticker in tickers:
+        prices = read_ticker(ticker, store_dir)
+        if not prices.empty:
+            series[(ticker, 'Adj Close')] = prices
+
+    valid_tickers = [ticker for ticker, _ in series]
+    if not series:
+        return valid_tickers, pd.DataFrame(columns=pd.MultiIndex.from_tuples([], names=['Ticker', 'Price']))
+
+    data = pd.concat(series, axis=1).sort_index()
+    data.columns = pd.MultiIndex.from_tuples(data.columns, names=['Ticker', 'Price'])
+    data.index.name = 'Date'
+    return valid_tickers, data
@@ -0,0 +1,169 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+import json
+import numpy as np
+import pandas as pd
+from config.constants import RATE_STORE_DIR
+from core.data_processing.price_store import write_manifest, _save_array
+
+BOC_SERIES = 'V39079'
+MANIFEST_FILE = 'manifest.json'
+
+
+def parse_rate_observations(observations, series_key=BOC_SERIES):
+    """
+    Parses Bank of Canada Valet observations into a rate series.
+
+    The whole payload is parsed at once: the dates and values are converted
+    column-wise instead of one observation at a time. Observations without a
+    date or with a missing or malformed value are dropped.
+
+    Args:
+        observations (list): The 'observations' of a Valet response, each a
+                             dict like {'d': 'YYYY-MM-DD', 'V39079': {'v': '4.5'}}.
+        series_key (str, optional): The expected series key. If the
+                                    observations do not carry it, the only
+                                    other key is used instead.
+
+    Returns:
+        pd.DataFrame: The rates indexed by 'date', with a 'yield_pct' column,
+                      sorted by date. Empty if nothing could be parsed.
+
+    Raises:
+        RuntimeError: If the observations carry no series key at all.
+    """
+    frame = pd.DataFrame(observations)
+    if frame.empty:
+        return pd.DataFrame({'yield_pct': pd.Series(dtype='float64')},
+                            index=pd.DatetimeIndex([], name='date'))
+
+    series_keys = [key for key in frame.columns if key != 'd']
+    if not series_keys:
+        raise RuntimeError(f"No series key found in observation: {observations[0]}")
+    # Pick the one that matches the requested series if present, else the first
+    series_key = series_key if series_key in series_keys else series_keys[0]
+
+    dates = pd.to_datetime(frame['d'], errors='coerce') if 'd' in frame else pd.NaT
+    yields = pd.to_numeric(frame[series_key].str.get('v'), errors='coerce')
+    rates = pd.DataFrame({'date': dates, 'yield_pct': yields.astype('float64')}).dropna()
+    return rates.set_index('date').sort_index()
+
+
+def _rate_paths(store_dir):
+    return (os.path.join(store_dir, 'dates.npy'),
+            os.path.join(store_dir, 'yield_pct.npy'))
+
+
+def read_rate_manifest(store_dir=RATE_STORE_DIR):
+    """
+    Reads the rate store manifest.
+
+    Args:
+        store_dir (str, optional): Directory of the rate store.
+
+    Returns:
+        dict: A dictionary with the 'first_date' the store covers, the
+              'last_date' stored and the date of the 'last_refresh', each a
+              'YYYY-MM-DD' string or None.
+    """
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'first_date': None, 'last_date': None, 'last_refresh': None}
+    with open(path) as f:
+        return json.load(f)
+
+
+def read_rate_store(store_dir=RATE_STORE_DIR):
+    """
+    Reads the stored risk-free rate series.
+
+    Args:
+        store_dir (str, optional): Directory of the rate store.
+
+    Returns:
+        pd.DataFrame: The stored rates indexed by 'date', with a 'yield_pct'
+                      column. Empty if nothing is stored yet.
+    """
+    dates_path, yield_path = _rate_paths(store_dir)
+    if not (os.path.exists(dates_path) and os.path.exists(yield_path)):
+        return parse_rate_observations([])
+    dates = pd.DatetimeIndex(np.load(dates_path), name='date')
+    return pd.DataFrame({'yield_pct': np.load(yield_path)}, index=dates)
+
+
+def append_rates(rates, store_dir=RATE_STORE_DIR):
+    """
+    Appends new observations to the rate store.
+
+    Only observations after the last stored date are appended, so a refresh
+    that overlaps the stored history does not duplicate it.
+
+    Args:
+        rates (pd.DataFrame): Rates indexed by date, with a 'yield_pct' column.
+        store_dir (str, optional): Directory of the rate store.
+
+    Returns:
+        pd.Timestamp or None: The last stored date after the append, or None
+                              if the store is still empty.
+    """
+    stored = read_rate_store(store_dir)
+    if not stored.empty:
+        rates = rates[rates.index > stored.index[-1]]
+    combined = pd.concat([stored, rates.sort_index()])
+    if combined.empty:
+        return None
+
+    os.makedirs(store_dir, exist_ok=True)
+    dates_path, yield_path = _rate_paths(store_dir)
+    _save_array(yield_path, combined['yield_pct'].to_numpy(dtype='float64'))
+    _save_array(dates_path, combined.index.values.astype('datetime64[ns]'))
+    return combined.index[-1]
+
+
+def refresh_rate_store(provider, start_date="1995-01-01", store_dir=RATE_STORE_DIR, force=False):
+    """
+    Brings the rate store up to date with a data provider.
+
+    An empty store (or one starting after `start_date`) downloads the series
+    from `start_date`. Otherwise only the observations after the last stored
+    date are requested, so a daily refresh downloads a handful of rows instead
+    of three decades. The refresh is skipped if it already ran today.
+
+    Args:
+        provider (LiveDataProvider): The provider to fetch observations from,
+                                     via its `fetch_rate_observations` method.
+        start_date (str, optional): The first date the store must cover.
+        store_dir (str, optional): Directory of the rate store.
+        force (bool, optional): Refresh even if the store was refreshed today.
+
+    Returns:
+        int: The number of observations added.
+    """
+    manifest = read_rate_manifest(store_dir)
+    today = pd.Timestamp.today().normalize()
+    covered = (manifest['last_date'] is not None
+               and pd.Timestamp(manifest['first_date']) <= pd.Timestamp(start_date))
+    if covered and not force and manifest['last_refresh'] == today.strftime('%Y-%m-%d'):
+        return 0
+
+    if covered:
+        new_rates = provider.fetch_rate_observations(
+            pd.Timestamp(manifest['last_date']) + pd.Timedelta(days=1))
+        new_rates = new_rates[new_rates.index > pd.Timestamp(manifest['last_date'])]
+    else:
+        # The stored series must be contiguous, start over from the requested date
+        new_rates = provider.fetch_rate_observations(start_date)
+        if new_rates.empty:
+            return 0
+        for path in _rate_paths(store_dir):
+            if os.path.exists(path):
+                os.remove(path)
+        manifest['first_date'] = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+
+    last_date = append_rates(new_rates, store_dir)
+    manifest['last_date'] = last_date.strftime('%Y-%m-%d') if last_date is not None else None
+    manifest['last_refresh'] = today.strftime('%Y-%m-%d')
+    write_manifest(manifest, store_dir)
+    return len(new_rates)
@@ -0,0 +1,184 @@
+import os
+import weakref
+from multiprocessing import shared_memory
+import numpy as np
+from core.data_processing.price_panel import PricePanel
+from core.analysis.window_stats import WindowStats, window_stats
+
+PRICES_FILE = 'prices.npy'
+HEADER_FILE = 'prices_header.npz'
+RETURNS_FILE = 'returns.npy'
+# One file per array of the panel's WindowStats index, e.g. 'window_stats_sum.npy'
+STATS_FILE = 'window_stats_{}.npy'
+
+
+def publish_price_panel(panel, directory):
+    """
+    Writes a panel as a memory-mappable price matrix and a small header.
+
+    The matrix is a plain '.npy' file, so any number of processes can map it
+    with `map_price_panel` and share the same physical pages. The header holds
+    the dates, tickers and version. The arrays derived from the prices, the
+    daily returns (`PricePanel.returns`) and the prefix sums of the
+    `window_stats` index, are written as '.npy' files too, so the processes
+    map them instead of each building its own copy.
+
+    Args:
+        panel (PricePanel): The panel to publish.
+        directory (str): The directory to write 'prices.npy',
+                         'prices_header.npz' and the derived arrays to.
+
+    Returns:
+        dict: The handle of the published panel, for `attach_price_panel`.
+    """
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, PRICES_FILE), panel.values)
+    np.savez(os.path.join(directory, HEADER_FILE),
+             dates=panel.dates.values.astype('datetime64[ns]'),
+             tickers=np.array(panel.tickers, dtype=str),
+             version=np.array(panel.version))
+    np.save(os.path.join(directory, RETURNS_FILE), panel.returns())
+    for name, array in window_stats(panel).arrays().items():
+        np.save(os.path.join(directory, STATS_FILE.format(name)), array)
+    return {'path': os.path.abspath(directory)}
+
+
+# Handles of the panels mapped from files, so they can be passed on to workers
+_mapped = weakref.WeakKeyDictionary()
+
+
+def map_price_panel(directory):
+    """
+    Maps a panel written by `publish_price_panel`.
+
+    The prices are memory-mapped read-only and never copied: the operating
+    system shares the pages between every process that maps the same file.
+    The published returns and `window_stats` prefix sums are mapped the same
+    way: the panel's `returns()` reads the mapped matrix and the
+    `window_stats` cache is primed with an index over the mapped arrays.
+    Panels published without them compute them on first use.
+
+    Args:
+        directory (str): The directory the panel was published to.
+
+    Returns:
+        PricePanel: A read-only panel backed by the files, with the published version.
+    """
+    with np.load(os.path.join(directory, HEADER_FILE), allow_pickle=False) as header:
+        dates, tickers, version = header['dates'], header['tickers'].tolist(), str(header['version'])
+    values = np.load(os.path.join(directory, PRICES_FILE), mmap_mode='r')
+    derived = os.path.exists(os.path.join(directory, RETURNS_FILE))
+    returns = np.load(os.path.join(directory, RETURNS_FILE), mmap_mode='r') if derived else None
+    panel = PricePanel(values, dates, tickers, version=version, returns=returns)
+    if derived:
+        stats = {name: np.load(os.path.join(directory, STATS_FILE.format(name)), mmap_mode='r')
+                 for name in WindowStats.ARRAYS}
+        window_stats.cache_prime(WindowStats.from_arrays(panel, stats), panel)
+    _mapped[panel] = {'path': os.path.abspath(directory), 'derived': derived}
+    return panel
+
+
+class SharedPricePanel:
+    """
+    Publishes a PricePanel and the arrays derived from it in shared memory.
+
+    The price matrix, its daily returns (`PricePanel.returns`) and the prefix
+    sums of its `window_stats` index are computed once in the owning process
+    and copied into one shared memory block. Worker processes attach to it by
+    name instead of receiving a pickled copy of the prices per task, and read
+    the returns and prefix sums from the block instead of each building their
+    own. A panel that is already mapped from a file (see `map_price_panel`)
+    is not copied; the workers map the same file, and only the derived
+    arrays go into the block if they were not published with it. Use it as a context manager in the owning process so
+    the block is released when the work is done.
+
+    Attributes:
+        handle (dict): Picklable description of the block, passed to
+                       `attach_price_panel` in the workers.
+    """
+
+    def __init__(self, panel):
+        if _mapped.get(panel, {}).get('derived'):
+            # The workers map the published prices and derived arrays themselves
+            self._shm = None
+            self.handle = {'path': _mapped[panel]['path']}
+            return
+        arrays = {'returns': panel.returns()}
+        arrays.update((f'stats.{name}', array) for name, array in window_stats(panel).arrays().items())
+        if panel in _mapped:
+            self.handle = {'path': _mapped[panel]['path']}
+        else:
+            arrays['prices'] = panel.values
+            self.handle = {
+                'dates': panel.dates.values.copy(),
+                'tickers': list(panel.tickers),
+                'version': panel.version,
+            }
+
+        layout, size = [], 0
+        for key, array in arrays.items():
+            layout.append((key, array.dtype.str, array.shape, size))
+            # Keep every array 8-byte aligned
+            size += -(-array.nbytes // 8) * 8
+        self._shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for key, dtype, shape, offset in layout:
+            np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=offset)[...] = arrays[key]
+        self.handle.update({'name': self._shm.name, 'arrays': layout})
+
+    def close(self):
+        """
+        Releases the shared memory block. Attached panels must not be used afterwards.
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_attached = {}
+
+
+def attach_price_panel(handle):
+    """
+    Attaches to a panel published by `SharedPricePanel` or `publish_price_panel`.
+
+    The returned panel reads the prices directly from the shared block or
+    mapped file, with the same version as the published panel so version-keyed
+    caches agree across processes. The panel's `returns()` and its
+    `window_stats` index read the shared or published arrays too.
+    Panels stay attached for the life of the process and repeat calls with
+    the same handle return the same panel.
+
+    Args:
+        handle (dict): The `handle` of the published panel.
+
+    Returns:
+        PricePanel: A read-only panel backed by shared memory.
+    """
+    if 'name' not in handle:
+        if handle['path'] not in _attached:
+            _attached[handle['path']] = (None, map_price_panel(handle['path']))
+        return _attached[handle['path']][1]
+    if handle['name'] not in _attached:
+        shm = shared_memory.SharedMemory(name=handle['name'])
+        arrays = {}
+        for key, dtype, shape, offset in handle['arrays']:
+            arrays[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            arrays[key].flags.writeable = False
+        if 'path' in handle:
+            mapped = map_price_panel(handle['path'])
+            panel = PricePanel(mapped.values, mapped.dates, mapped.tickers,
+                               version=mapped.version, returns=arrays['returns'])
+        else:
+            panel = PricePanel(arrays['prices'], handle['dates'], handle['tickers'],
+                               version=handle['version'], returns=arrays['returns'])
+        stats = {key[len('stats.'):]: array for key, array in arrays.items() if key.startswith('stats.')}
+        window_stats.cache_prime(WindowStats.from_arrays(panel, stats), panel)
+        _attached[handle['name']] = (shm, panel)
+    return _attached[handle['name']][1]
@@ -0,0 +1,359 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+import json
+import shutil
+import threading
+import time
+from datetime import datetime
+import pandas as pd
+from config.constants import (
+    SNAPSHOT_DIR, TIME_HORIZON_OPTIONS, WORSE_CASE_OPTIONS, MINIMUM_ETF_AGE_OPTIONS
+)
+from core.cache import normalize_as_of, data_version
+from core.data_processing.data_providers import get_data_provider
+from core.data_processing.ishares_ETF_list import ETF_LIST
+from core.data_processing.price_panel import PricePanel
+from core.data_processing.shared_panel import publish_price_panel, map_price_panel
+from core.data_processing.Etf_Data import get_etf_metrics_batch, get_etf_data
+from core.analysis.max_drawdown import compute_drawdown_table, calculate_max_drawdown
+from core.scoring.recommendation_table import (
+    build_recommendation_table, save_recommendation_table, load_recommendation_table
+)
+
+CURRENT_FILE = 'CURRENT'
+KEEP_SNAPSHOTS = 3
+
+
+class Snapshot:
+    """
+    An immutable, fully built set of data for serving recommendations.
+
+    A snapshot bundles the price panel, the risk-free rates and everything
+    derived from them for one as-of trading day: the metrics cube (growth and
+    standard deviation of every ETF over every questionnaire horizon), the
+    drawdown table and the precomputed recommendation table. Request handlers
+    take one snapshot reference and use it for the whole request, so a refresh
+    that lands mid-request cannot mix old and new data.
+
+    Attributes:
+        name (str): The snapshot's directory name, built from the as-of date
+                    and the versions of the prices and rates.
+        valid_tickers (list): The tickers with price data.
+        panel (PricePanel): The prices. Its values are read-only.
+        risk_free (pd.DataFrame): The daily rates, with a 'yield_pct' column.
+        metrics (pd.DataFrame): `get_etf_metrics_batch` over all tickers and
+                                TIME_HORIZON_OPTIONS at `as_of`.
+        drawdowns (pd.DataFrame): `compute_drawdown_table` at `as_of`.
+        recommendations (dict): `build_recommendation_table` at `as_of`.
+        as_of (pd.Timestamp): The normalized as-of date.
+        built_at (str): When the snapshot was built, ISO format.
+    """
+
+    def __init__(self, valid_tickers, panel, risk_free, metrics, drawdowns, recommendations,
+                 as_of, built_at):
+        self.valid_tickers = list(valid_tickers)
+        self.panel = panel
+        self.risk_free = risk_free
+        self.metrics = metrics
+        self.drawdowns = drawdowns
+        self.recommendations = recommendations
+        self.as_of = normalize_as_of(as_of)
+        self.built_at = built_at
+        self.name = f"{self.as_of.strftime('%Y-%m-%d')}-{panel.version}-{data_version(risk_free)[:8]}"
+
+    def prime_caches(self, end_date=None):
+        """
+        Seeds the in-process caches with the snapshot's precomputed tables, so
+        the first request on a new snapshot does not recompute them.
+
+        The tables are stored under the calls the app makes: the drawdown
+        table as `compute_drawdown_table(panel, end_date)` and each horizon's
+        metrics as the `get_etf_metrics_batch` call of `get_etf_data`. Nothing
+        is primed if `end_date` falls on another trading day than the
+        snapshot's, since the tables do not apply to it.
+
+        Args:
+            end_date (pd.Timestamp, optional): The as-of date the app will
+                                               ask for. Defaults to now.
+
+        Returns:
+            bool: Whether the caches were primed.
+        """
+        end_date = pd.Timestamp(datetime.now()) if end_date is None else end_date
+        if normalize_as_of(end_date) != self.as_of:
+            return False
+        compute_drawdown_table.cache_prime(self.drawdowns, self.panel, end_date)
+        metrics = self.metrics.set_index('Ticker').reindex(self.panel.tickers)
+        for time_horizon in TIME_HORIZON_OPTIONS:
+            columns = [f'Annual_Growth_{time_horizon}Y', f'Standard_Deviation_{time_horizon}Y']
+            get_etf_metrics_batch.cache_prime(
+                metrics[columns].rename_axis('Ticker').reset_index(),
+                self.panel.tickers, [time_horizon], self.panel, end_date)
+        return True
+
+def build_snapshot(provider=None, end_date=None):
+    """
+    Builds a new snapshot from a data provider.
+
+    Prices and rates are loaded straight from the provider (the live provider
+    refreshes its local stores incrementally), bypassing the Streamlit caches,
+    so this can run in a process of its own.
+
+    Args:
+        provider (DataProvider, optional): Where to load the data from.
+                                           Defaults to the active provider.
+        end_date (pd.Timestamp, optional): The as-of date. Defaults to now.
+
+    Returns:
+        Snapshot: The new snapshot.
+    """
+    provider = provider or get_data_provider()
+    as_of = normalize_as_of(end_date if end_date is not None else datetime.now())
+
+    valid_tickers, data = provider.load_prices(ETF_LIST)
+    panel = PricePanel.from_frame(data)
+    panel.values.flags.writeable = False
+    risk_free = provider.fetch_risk_free("1995-01-01")
+
+    metrics = get_etf_metrics_batch(valid_tickers, TIME_HORIZON_OPTIONS, panel, as_of)
+    drawdowns = compute_drawdown_table(panel, as_of)
+    recommendations = build_recommendation_table(valid_tickers, panel, risk_free, as_of)
+    return Snapshot(valid_tickers, panel, risk_free, metrics, drawdowns, recommendations,
+                    as_of, datetime.now().isoformat(timespec='seconds'))
+
+
+def save_snapshot(snapshot, snapshot_dir=SNAPSHOT_DIR, keep=KEEP_SNAPSHOTS):
+    """
+    Writes a snapshot and atomically makes it the current one.
+
+    The snapshot is written to a temporary directory, renamed into place, and
+    only then is the CURRENT pointer replaced, so readers see either the
+    previous snapshot or the complete new one, never a partial write. Older
+    snapshots beyond `keep` are removed, leaving time for readers still
+    loading them to finish.
+
+    Args:
+        snapshot (Snapshot): The snapshot to publish.
+        snapshot_dir (str, optional): Directory holding the snapshots.
+        keep (int, optional): Number of snapshots to keep on disk.
+
+    Returns:
+        str: The directory the snapshot was written to.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, snapshot.name)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    publish_price_panel(snapshot.panel, tmp_path)
+    snapshot.risk_free.to_pickle(os.path.join(tmp_path, 'risk_free.pkl'))
+    snapshot.metrics.to_pickle(os.path.join(tmp_path, 'metrics.pkl'))
+    snapshot.drawdowns.to_pickle(os.path.join(tmp_path, 'drawdowns.pkl'))
+    save_recommendation_table(snapshot.recommendations, os.path.join(tmp_path, 'recommendations.npz'))
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump({
+            'valid_tickers': snapshot.valid_tickers,
+            'as_of': snapshot.as_of.strftime('%Y-%m-%d'),
+            'built_at': snapshot.built_at,
+        }, f, indent=1)
+
+    if os.path.exists(path):
+        # Rebuilt from the same data on the same day, the published copy is identical
+        shutil.rmtree(tmp_path)
+    else:
+        os.rename(tmp_path, path)
+
+    pointer = os.path.join(snapshot_dir, CURRENT_FILE)
+    with open(pointer + '.tmp', 'w') as f:
+        f.write(snapshot.name)
+    os.replace(pointer + '.tmp', pointer)
+
+    published = sorted(
+        (entry for entry in os.listdir(snapshot_dir)
+         if entry != snapshot.name and os.path.isfile(os.path.join(snapshot_dir, entry, 'meta.json'))),
+        key=lambda entry: os.path.getmtime(os.path.join(snapshot_dir, entry)))
+    for entry in published[:max(len(published) - (keep - 1), 0)]:
+        shutil.rmtree(os.path.join(snapshot_dir, entry), ignore_errors=True)
+    return path
+
+
+def current_snapshot_name(snapshot_dir=SNAPSHOT_DIR):
+    """
+    Returns the name of the current snapshot, or None if none was published.
+    """
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_snapshot(name=None, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Loads a published snapshot.
+
+    The price matrix, its daily returns and its `window_stats` prefix sums
+    are memory-mapped read-only (see `map_price_panel`), so loading does not
+    copy them and every process serving the snapshot shares the same pages.
+    Sweeps run on the snapshot's panel hand the same files to their workers.
+
+    Args:
+        name (str, optional): The snapshot to load. Defaults to the current one.
+        snapshot_dir (str, optional): Directory holding the snapshots.
+
+    Returns:
+        Snapshot or None: The snapshot, or None if none was published.
+    """
+    name = name or current_snapshot_name(snapshot_dir)
+    if name is None:
+        return None
+    path = os.path.join(snapshot_dir, name)
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+
+    return Snapshot(
+        meta['valid_tickers'], map_price_panel(path),
+        pd.read_pickle(os.path.join(path, 'risk_free.pkl')),
+        pd.read_pickle(os.path.join(path, 'metrics.pkl')),
+        pd.read_pickle(os.path.join(path, 'drawdowns.pkl')),
+        load_recommendation_table(os.path.join(path, 'recommendations.npz')),
+        pd.Timestamp(meta['as_of']), meta['built_at'])
+
+
+_current = None
+_current_lock = threading.Lock()
+
+
+def current_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """
+    Returns the process's view of the current snapshot.
+
+    The CURRENT pointer is checked on every call, which is a single small
+    file read. When the refresh job has published a new snapshot, it is
+    loaded, its tables are primed into the caches, and only then is it swapped
+    in, in one assignment. Callers should take the snapshot once per request.
+
+    Args:
+        snapshot_dir (str, optional): Directory holding the snapshots.
+
+    Returns:
+        Snapshot or None: The current snapshot, or None if none was published.
+    """
+    global _current
+    name = current_snapshot_name(snapshot_dir)
+    if name is None:
+        return _current
+    if _current is not None and _current.name == name:
+        return _current
+    with _current_lock:
+        if _current is None or _current.name != name:
+            snapshot = load_snapshot(name, snapshot_dir)
+            snapshot.prime_caches()
+            _current = snapshot
+        return _current
+
+
+def check_primed_caches(snapshot, end_date=None):
+    """
+    Checks that a snapshot's primed tables serve the app's first requests.
+
+    The caches are cleared and primed, then the drawdown filter and the
+    metrics of every horizon are requested the way the app's live path
+    requests them. Any computation they trigger is a priming miss.
+
+    Args:
+        snapshot (Snapshot): The snapshot to check.
+        end_date (pd.Timestamp, optional): The as-of date. Defaults to now.
+
+    Returns:
+        dict: The number of cache 'hits' and 'misses' of the first requests.
+    """
+    end_date = pd.Timestamp(datetime.now()) if end_date is None else end_date
+    compute_drawdown_table.cache_clear()
+    get_etf_metrics_batch.cache_clear()
+    get_etf_data.cache_clear()
+    snapshot.prime_caches(end_date)
+
+    candidates = calculate_max_drawdown(
+        max(WORSE_CASE_OPTIONS), min(MINIMUM_ETF_AGE_OPTIONS), snapshot.valid_tickers, snapshot.panel, end_date)
+    for time_horizon in TIME_HORIZON_OPTIONS:
+        get_etf_data(candidates, time_horizon, snapshot.panel, end_date)
+    calls = [compute_drawdown_table.cache_info(), get_etf_metrics_batch.cache_info()]
+    return {'hits': sum(info['hits'] for info in calls), 'misses': sum(info['misses'] for info in calls)}
+
+
+def refresh_snapshot(provider=None, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Builds a snapshot of today's data and publishes it.
+
+    Args:
+        provider (DataProvider, optional): Where to load the data from.
+        snapshot_dir (str, optional): Directory holding the snapshots.
+
+    Returns:
+        Snapshot: The published snapshot.
+    """
+    snapshot = build_snapshot(provider)
+    save_snapshot(snapshot, snapshot_dir)
+    return snapshot
+
+
+def _seconds_until(hour, minute):
+    now = datetime.now()
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += pd.Timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def run_refresh_job(at="02:00", snapshot_dir=SNAPSHOT_DIR, retry_minutes=30):
+    """
+    Refreshes the snapshot now and then every night, until interrupted.
+
+    A failed refresh (e.g. the network is down) leaves the current snapshot
+    in place and is retried after `retry_minutes`.
+
+    Args:
+        at (str, optional): Local time of the nightly refresh, 'HH:MM'.
+        snapshot_dir (str, optional): Directory holding the snapshots.
+        retry_minutes (int, optional): Delay before retrying a failed refresh.
+    """
+    hour, minute = (int(part) for part in at.split(':'))
+    while True:
+        started = time.time()
+        try:
+            snapshot = refresh_snapshot(snapshot_dir=snapshot_dir)
+            print(f"Published snapshot {snapshot.name} in {time.time() - started:.1f}s")
+            delay = _seconds_until(hour, minute)
+        except Exception as e:
+            print(f"Snapshot refresh failed, keeping the current snapshot: {e}")
+            delay = retry_minutes * 60
+        time.sleep(delay)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build and publish data snapshots.")
+    parser.add_argument('--once', action='store_true', help="publish one snapshot and exit")
+    parser.add_argument('--at', default="02:00", help="local time of the nightly refresh, HH:MM")
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR)
+    parser.add_argument('--check', action='store_true',
+                        help="check that the current snapshot's primed tables serve the first requests")
+    args = parser.parse_args()
+
+    if args.check:
+        snapshot = load_snapshot(snapshot_dir=args.snapshot_dir)
+        if snapshot is None:
+            sys.exit(f"No snapshot published in {args.snapshot_dir}")
+        result = check_primed_caches(snapshot, snapshot.as_of)
+        print(f"Snapshot {snapshot.name}: {result['hits']} cache hits, {result['misses']} misses")
+        sys.exit(1 if result['misses'] else 0)
+    elif args.once:
+        snapshot = refresh_snapshot(snapshot_dir=args.snapshot_dir)
+        print(f"Published snapshot {snapshot.name} to {args.snapshot_dir}")
+    else:
+        run_refresh_job(args.at, args.snapshot_dir)
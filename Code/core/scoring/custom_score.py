@@ -1,4 +1,4 @@
-import pandas as pd
+from core.scoring.scoring_engine import score_etfs, max_scaled
 
 def utility_score(etf_df, time_horizon, risk_free_df, risk_pref):
     """
@@ -25,24 +25,12 @@ def utility_score(etf_df, time_horizon, risk_free_df, risk_pref):
                       sorted in descending order by the score.
     """
 
-    growth_col = f'Annual_Growth_{time_horizon}Y'
     std_col = f'Standard_Deviation_{time_horizon}Y'
-    risk_w, return_w = risk_pref
-    W_return = return_w / (return_w + risk_w)
-    W_risk = risk_w / (return_w + risk_w)
+    df = score_etfs(etf_df, time_horizon, risk_free_df, risk_pref, methods=['Custom_Utility_Score'])
+    df = df.rename(columns={'Custom_Utility_Score': 'Utility_Score'})
 
-    end = risk_free_df.index.max()
-    start = end - pd.DateOffset(years=time_horizon)
-    avg_rf = risk_free_df.loc[start:end, 'yield_pct'].mean()
-
-    df = etf_df.dropna(subset=[growth_col, std_col]).copy()
-    df['ExcessReturn'] = df[growth_col] - avg_rf  # in percent
-
-    # Instead of z-score, use raw scaled values
-    # Normalize excess return and std dev by their max (or mean)
-    df['norm_excess'] = df['ExcessReturn'] / df['ExcessReturn'].max()
-    df['norm_std'] = df[std_col] / df[std_col].max()
-
-    df['Utility_Score'] = W_return * df['norm_excess'] - W_risk * df['norm_std']
+    # Instead of z-score, excess return and std dev are scaled by their max
+    df.insert(len(df.columns) - 1, 'norm_excess', max_scaled(df['ExcessReturn'].to_numpy()))
+    df.insert(len(df.columns) - 1, 'norm_std', max_scaled(df[std_col].to_numpy(dtype='float64')))
 
     return df.sort_values('Utility_Score', ascending=False)
@@ -1,12 +1,15 @@
+from core.scoring.scoring_engine import top_k
+
+
 def top_recommend(df, column_title, amount):
     """
     Identifies and returns the top performing ETFs based on a specified metric.
 
     This function takes a DataFrame, a column title representing a metric
     (e.g., 'Sharpe_Ratio' or 'Utility_Score'), and an amount, and returns the
-    ETFs with the highest values for that metric. The function first handles
-    any missing values and then sorts the DataFrame in descending order before
-    returning the top entries.
+    ETFs with the highest values for that metric. Rows with a missing value
+    are skipped, and only the top entries are sorted (see `top_k`), so the
+    DataFrame does not need to be sorted beforehand.
 
     Args:
         df (pd.DataFrame): The DataFrame containing ETF data and metrics.
@@ -25,12 +28,4 @@ def top_recommend(df, column_title, amount):
     if column_title not in df.columns:
         raise ValueError(f"Column '{column_title}' not found in DataFrame.")
 
-    # Drop rows with NaN Sharpe ratios to avoid errors in sorting
-    df_clean = df.dropna(subset=[column_title])
-
-    # Sort descending by Sharpe ratio
-    df_sorted = df_clean.sort_values(by=column_title, ascending=False)
-
-    result = df_sorted.head(amount)
-
-    return result
+    return df.iloc[top_k(df[column_title].to_numpy(dtype='float64'), amount)]
@@ -0,0 +1,122 @@
+import threading
+from collections import OrderedDict
+
+
+def profile_key(user_profile):
+    """
+    Turns a questionnaire profile into a hashable cache key.
+
+    Args:
+        user_profile (list): The user's answers, indexed by the USER_* constants.
+
+    Returns:
+        tuple: The answers, with list answers (the risk preference) as tuples.
+    """
+    return tuple(tuple(answer) if isinstance(answer, list) else answer for answer in user_profile)
+
+
+class _Flight:
+    """
+    A computation in progress, shared by every request for the same key.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RecommendationCache:
+    """
+    Bounded LRU cache of recommendations with single-flight computation.
+
+    Results are keyed by the caller, typically (profile_key(profile),
+    snapshot version, as-of date). When several threads ask for a key that
+    is not cached yet, only the first one runs the computation; the others
+    wait for it and share its result (or its exception, which is not cached).
+    Cached results are shared between callers and must not be modified.
+
+    Attributes:
+        maxsize (int): Number of results kept, least recently used first out.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0}
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached result of a key, computing it at most once at a time.
+
+        Args:
+            key (hashable): The cache key.
+            compute (callable): Called without arguments to compute the result
+                                on a miss.
+
+        Returns:
+            object: The result of `compute` for this key.
+
+        Raises:
+            Exception: Whatever `compute` raised, in the computing thread and
+                       in every thread that waited for it.
+        """
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self._stats['hits'] += 1
+                return self._results[key]
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+                self._stats['misses'] += 1
+            else:
+                leader = False
+                self._stats['waits'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                self._results[key] = flight.result
+                self._results.move_to_end(key)
+                while len(self._results) > self.maxsize:
+                    self._results.popitem(last=False)
+            return flight.result
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def cache_clear(self):
+        """
+        Drops every cached result and resets the counters.
+        """
+        with self._lock:
+            self._results.clear()
+            self._stats.update(hits=0, misses=0, waits=0)
+
+    def cache_info(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: 'hits' (served from the cache), 'misses' (computed), 'waits'
+                  (joined a computation already in progress), 'size',
+                  'in_flight' and 'maxsize'.
+        """
+        with self._lock:
+            return dict(self._stats, size=len(self._results),
+                        in_flight=len(self._flights), maxsize=self.maxsize)
@@ -0,0 +1,170 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+import itertools
+import numpy as np
+import pandas as pd
+from config.constants import (
+    USER_TIME_HORIZON, USER_WORST_CASE, USER_MINIMUM_ETF_AGE, USER_RISK_PREFERENCE,
+    TIME_HORIZON_OPTIONS, WORSE_CASE_OPTIONS, MINIMUM_ETF_AGE_OPTIONS, RISK_PREFERENCE_OPTIONS,
+    RECOMMENDATION_COUNT, RECOMMENDATION_TABLE_PATH
+)
+from core.cache import normalize_as_of
+from core.data_processing.price_panel import as_price_panel
+from core.data_processing.Etf_Data import get_etf_metrics_batch
+from core.analysis.max_drawdown import compute_drawdown_table, filter_drawdown_table
+from core.scoring.scoring_engine import rank_profiles
+
+
+def build_recommendation_table(valid_tickers, data, risk_free_data, end_date, count=RECOMMENDATION_COUNT):
+    """
+    Precomputes the web app's recommendations for every questionnaire profile.
+
+    Only the time horizon, worst-case loss, minimum ETF age and risk preference
+    answers affect the recommendations, so the 5^6 possible profiles collapse
+    to 5^4 utility rankings and 5^3 Sharpe rankings. Each distinct drawdown and
+    age filter is applied once, the metrics of every horizon come from one
+    batched computation, and every profile of a horizon is scored and ranked
+    in one (profiles x ETFs) matrix by `rank_profiles`.
+
+    Args:
+        valid_tickers (list): A list of all available ETF tickers.
+        data (PricePanel or pd.DataFrame): The historical price data for all ETFs.
+        risk_free_data (pd.DataFrame): The daily risk-free rates.
+        end_date (pd.Timestamp): The as-of date of the recommendations.
+        count (int, optional): The number of ETFs recommended per method.
+
+    Returns:
+        dict: The table, with the following entries:
+            - 'tickers' (np.ndarray): The ticker symbols, indexed by the rankings.
+            - 'growth', 'std' (np.ndarray): Annual growth and standard deviation,
+              shaped (horizon, ticker).
+            - 'sharpe' (np.ndarray): Ranked ticker numbers, shaped
+              (horizon, drawdown, age, count), padded with -1.
+            - 'utility' (np.ndarray): Ranked ticker numbers, shaped
+              (horizon, drawdown, age, risk preference, count), padded with -1.
+            - 'version' (str): The version of the price snapshot.
+            - 'as_of' (str): The normalized as-of date.
+    """
+    panel = as_price_panel(data)
+    end_date = normalize_as_of(end_date)
+    ticker_numbers = {ticker: i for i, ticker in enumerate(valid_tickers)}
+    metrics = get_etf_metrics_batch(valid_tickers, TIME_HORIZON_OPTIONS, panel, end_date)
+    drawdown_table = compute_drawdown_table(panel, end_date)
+
+    # The ticker number of every metrics row, the padding position -1 maps to -1
+    metrics_rows = {ticker: row for row, ticker in enumerate(metrics['Ticker'])}
+    numbers = np.array([ticker_numbers[ticker] for ticker in metrics_rows] + [-1], dtype=np.int16)
+
+    # One candidate mask per (drawdown, age) filter, in the order of the table's axes
+    masks = np.zeros((len(WORSE_CASE_OPTIONS) * len(MINIMUM_ETF_AGE_OPTIONS), len(metrics)), dtype=bool)
+    for m, (max_drawdown, minimum_age) in enumerate(itertools.product(WORSE_CASE_OPTIONS, MINIMUM_ETF_AGE_OPTIONS)):
+        passed = filter_drawdown_table(drawdown_table, max_drawdown, minimum_age, valid_tickers)
+        masks[m, [metrics_rows[ticker] for ticker in passed if ticker in metrics_rows]] = True
+    risk_preferences = np.array(RISK_PREFERENCE_OPTIONS)
+
+    shape = (len(WORSE_CASE_OPTIONS), len(MINIMUM_ETF_AGE_OPTIONS))
+    sharpe, utility = [], []
+    for time_horizon in TIME_HORIZON_OPTIONS:
+        top = rank_profiles(metrics, time_horizon, risk_free_data, masks, count, method='Sharpe')
+        sharpe.append(numbers[top].reshape(shape + (count,)))
+        top = rank_profiles(
+            metrics, time_horizon, risk_free_data, np.repeat(masks, len(risk_preferences), axis=0), count,
+            np.tile(risk_preferences, (len(masks), 1)), method='Utility_Score')
+        utility.append(numbers[top].reshape(shape + (len(risk_preferences), count)))
+    sharpe, utility = np.stack(sharpe), np.stack(utility)
+
+    return {
+        'tickers': np.array(valid_tickers),
+        'growth': np.stack([metrics[f'Annual_Growth_{h}Y'].to_numpy() for h in TIME_HORIZON_OPTIONS]),
+        'std': np.stack([metrics[f'Standard_Deviation_{h}Y'].to_numpy() for h in TIME_HORIZON_OPTIONS]),
+        'sharpe': sharpe,
+        'utility': utility,
+        'version': panel.version,
+        'as_of': end_date.strftime('%Y-%m-%d'),
+    }
+
+
+def save_recommendation_table(table, path=RECOMMENDATION_TABLE_PATH):
+    """
+    Writes a recommendation table to a compressed NumPy archive.
+
+    The file is written under a temporary name and renamed, so readers never
+    see a partially written table.
+
+    Args:
+        table (dict): The table returned by `build_recommendation_table`.
+        path (str, optional): Where to write the table.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, **{key: np.asarray(value) for key, value in table.items()})
+    os.replace(tmp_path, path)
+
+
+def load_recommendation_table(path=RECOMMENDATION_TABLE_PATH):
+    """
+    Reads a recommendation table written by `save_recommendation_table`.
+
+    Args:
+        path (str, optional): Where the table was written.
+
+    Returns:
+        dict or None: The table, or None if no table has been built.
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as archive:
+        table = {key: archive[key] for key in archive.files}
+    table['version'] = str(table['version'])
+    table['as_of'] = str(table['as_of'])
+    return table
+
+
+def lookup_recommendations(table, user_profile):
+    """
+    Looks up the precomputed recommendations of a questionnaire profile.
+
+    Args:
+        table (dict): The table returned by `build_recommendation_table` or
+                      `load_recommendation_table`.
+        user_profile (list): The user's answers, indexed by the USER_* constants.
+
+    Returns:
+        tuple: A tuple containing two DataFrames, the Sharpe and the utility
+               recommendations, each with 'Ticker', 'Annual_Growth_{h}Y' and
+               'Standard_Deviation_{h}Y' columns in ranked order.
+
+    Raises:
+        ValueError: If an answer is not one of the questionnaire options.
+    """
+    time_horizon = user_profile[USER_TIME_HORIZON]
+    h = TIME_HORIZON_OPTIONS.index(time_horizon)
+    d = WORSE_CASE_OPTIONS.index(user_profile[USER_WORST_CASE])
+    a = MINIMUM_ETF_AGE_OPTIONS.index(user_profile[USER_MINIMUM_ETF_AGE])
+    r = RISK_PREFERENCE_OPTIONS.index(list(user_profile[USER_RISK_PREFERENCE]))
+
+    def as_frame(ranking):
+        ranking = ranking[ranking >= 0]
+        return pd.DataFrame({
+            'Ticker': table['tickers'][ranking],
+            f'Annual_Growth_{time_horizon}Y': table['growth'][h, ranking],
+            f'Standard_Deviation_{time_horizon}Y': table['std'][h, ranking],
+        })
+
+    return as_frame(table['sharpe'][h, d, a]), as_frame(table['utility'][h, d, a, r])
+
+
+if __name__ == "__main__":
+    from datetime import datetime
+    from core.data_processing.ishares_ETF_list import download_price_panel
+    from core.data_processing.risk_free_rates import fetch_risk_free_boc
+
+    valid_tickers, data = download_price_panel()
+    table = build_recommendation_table(
+        valid_tickers, data, fetch_risk_free_boc("1995-01-01"), pd.Timestamp(datetime.now()))
+    save_recommendation_table(table)
+    print(f"Saved recommendations for snapshot {table['version']} as of {table['as_of']} "
+          f"to {RECOMMENDATION_TABLE_PATH}")
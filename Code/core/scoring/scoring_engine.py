@@ -0,0 +1,376 @@
+import numpy as np
+from core.analysis.rate_index import rate_index
+
+
+class ScoringMethod:
+    """
+    A registered way of scoring ETFs from their excess return and risk.
+
+    Attributes:
+        column (str): The name of the score column, e.g. 'Sharpe'.
+        func (callable): Called as `func(excess, std, weights)` with the excess
+                         returns and standard deviations as float arrays (in
+                         percent) and the normalized (return_weight,
+                         risk_weight) pair, or None when the method does not
+                         use the risk preference. Returns the scores as an
+                         array, higher being better.
+        uses_risk_preference (bool): Whether the score depends on the user's
+                                     risk preference.
+    """
+    __slots__ = ('column', 'func', 'uses_risk_preference')
+
+    def __init__(self, column, func, uses_risk_preference=False):
+        self.column = column
+        self.func = func
+        self.uses_risk_preference = uses_risk_preference
+
+
+# Registered scoring methods, keyed by score column, in registration order
+SCORING_METHODS = {}
+
+
+def register_scoring_method(column, uses_risk_preference=False):
+    """
+    Registers a scoring function with the engine, for use as a decorator.
+
+    Args:
+        column (str): The name of the score column.
+        uses_risk_preference (bool, optional): Whether the function takes the
+                                               user's risk preference weights.
+
+    Returns:
+        callable: The decorator, which returns the function unchanged.
+
+    Raises:
+        ValueError: If a method already produces `column`.
+    """
+    def decorator(func):
+        if column in SCORING_METHODS:
+            raise ValueError(f"A scoring method already produces the column '{column}'.")
+        SCORING_METHODS[column] = ScoringMethod(column, func, uses_risk_preference)
+        return func
+    return decorator
+
+
+def zscore(values):
+    """
+    Standardizes values by their mean and sample standard deviation.
+
+    The sums are taken in the same order as pandas' `Series.mean` and
+    `Series.std`, so the result matches `(s - s.mean()) / s.std(ddof=1)`
+    bit for bit.
+
+    Args:
+        values (np.ndarray): The values, without NaNs.
+
+    Returns:
+        np.ndarray: The z-scores, all NaN with fewer than two values.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = values.sum(dtype='float64') / len(values)
+        std = np.sqrt(((mean - values) ** 2).sum(dtype='float64') / (len(values) - 1))
+        return (values - mean) / std
+
+
+def max_scaled(values):
+    """
+    Scales values by their maximum, like `s / s.max()`.
+
+    Args:
+        values (np.ndarray): The values, without NaNs.
+
+    Returns:
+        np.ndarray: The scaled values.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return values / (values.max() if len(values) else np.nan)
+
+
+@register_scoring_method('Sharpe')
+def _sharpe(excess, std, weights):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return excess / std
+
+
+@register_scoring_method('Utility_Score', uses_risk_preference=True)
+def _zscore_utility(excess, std, weights):
+    w_return, w_risk = weights
+    return w_return * zscore(excess) - w_risk * zscore(std)
+
+
+@register_scoring_method('Custom_Utility_Score', uses_risk_preference=True)
+def _max_scaled_utility(excess, std, weights):
+    w_return, w_risk = weights
+    return w_return * max_scaled(excess) - w_risk * max_scaled(std)
+
+
+def _methods(methods, risk_pref):
+    if methods is None:
+        return [method for method in SCORING_METHODS.values()
+                if risk_pref is not None or not method.uses_risk_preference]
+    unknown = [column for column in methods if column not in SCORING_METHODS]
+    if unknown:
+        raise ValueError(f"Unknown scoring methods {unknown}, expected some of {list(SCORING_METHODS)}.")
+    methods = [SCORING_METHODS[column] for column in methods]
+    if risk_pref is None and any(method.uses_risk_preference for method in methods):
+        raise ValueError("A risk preference is required by the requested scoring methods.")
+    return methods
+
+
+def score_etfs(etf_df, time_horizon, risk_free_df, risk_pref=None, methods=None):
+    """
+    Scores ETFs with several scoring methods in one pass.
+
+    ETFs without a growth or standard deviation over the horizon are dropped,
+    the excess return over the average risk-free rate of the horizon is
+    computed once, and every requested method adds its score column. The
+    registered methods are:
+        - 'Sharpe': the excess return divided by the standard deviation, as
+          `sharpe_score`.
+        - 'Utility_Score': the risk-preference weighted z-scores of the excess
+          return and standard deviation, as `utility_score.utility_score`.
+        - 'Custom_Utility_Score': the same weighting of the excess return and
+          standard deviation scaled by their maximum, as
+          `custom_score.utility_score`.
+    More can be added with `register_scoring_method`.
+
+    Args:
+        etf_df (pd.DataFrame): A DataFrame containing ETF metrics, including
+                               'Annual_Growth_{h}Y' and 'Standard_Deviation_{h}Y'.
+        time_horizon (int): The time period in years of the metrics.
+        risk_free_df (pd.DataFrame): The daily risk-free rates.
+        risk_pref (tuple, optional): A tuple (risk_weight, return_weight) that
+                                     defines the user's preference for risk
+                                     versus return.
+        methods (list, optional): The score columns to compute. Defaults to
+                                  every registered method, leaving out those
+                                  that need a risk preference when none is given.
+
+    Returns:
+        pd.DataFrame: The rows of `etf_df` with a growth and standard deviation,
+                      in their original order, with the added 'ExcessReturn'
+                      column and one column per method.
+
+    Raises:
+        ValueError: If a method is unknown, or needs a risk preference that
+                    was not given.
+    """
+    methods = _methods(methods, risk_pref)
+    growth_col = f'Annual_Growth_{time_horizon}Y'
+    std_col = f'Standard_Deviation_{time_horizon}Y'
+
+    growth = etf_df[growth_col].to_numpy(dtype='float64')
+    std = etf_df[std_col].to_numpy(dtype='float64')
+    valid = ~(np.isnan(growth) | np.isnan(std))
+    df = etf_df[valid].copy()
+    growth, std = growth[valid], std[valid]
+
+    # Average risk-free rate over the horizon ending at the last observation
+    avg_rf = rate_index(risk_free_df).horizon_average(time_horizon)
+    excess = growth - avg_rf  # in percent
+    df['ExcessReturn'] = excess
+
+    weights = None
+    if risk_pref is not None:
+        risk_w, return_w = risk_pref
+        weights = (return_w / (return_w + risk_w), risk_w / (return_w + risk_w))
+    for method in methods:
+        df[method.column] = method.func(excess, std, weights if method.uses_risk_preference else None)
+    return df
+
+
+def top_k(scores, amount):
+    """
+    Finds the positions of the highest scores without sorting all of them.
+
+    The candidates are chosen with a partial selection (`np.argpartition`),
+    and only they are sorted, so picking a handful of ETFs out of thousands
+    costs linear time. NaN scores are never picked, and ties keep their
+    original order.
+
+    Args:
+        scores (np.ndarray): The scores.
+        amount (int): The number of positions to return.
+
+    Returns:
+        np.ndarray: Up to `amount` positions into `scores`, best score first.
+    """
+    scores = np.asarray(scores, dtype='float64')
+    positions = np.flatnonzero(~np.isnan(scores))
+    if amount <= 0:
+        return positions[:0]
+    if amount < len(positions):
+        values = scores[positions]
+        kth = values[np.argpartition(-values, amount - 1)[amount - 1]]
+        # Every score tied with the last pick stays a candidate, so ties resolve by position
+        positions = positions[values >= kth]
+    order = np.lexsort((positions, -scores[positions]))
+    return positions[order[:amount]]
+
+
+def rank_etfs(etf_df, time_horizon, risk_free_df, count, risk_pref=None, methods=None):
+    """
+    Scores ETFs with several methods and returns each method's top picks.
+
+    Args:
+        etf_df (pd.DataFrame): A DataFrame containing ETF metrics, see `score_etfs`.
+        time_horizon (int): The time period in years of the metrics.
+        risk_free_df (pd.DataFrame): The daily risk-free rates.
+        count (int): The number of ETFs to pick per method.
+        risk_pref (tuple, optional): A tuple (risk_weight, return_weight).
+        methods (list, optional): The score columns to rank by, see `score_etfs`.
+
+    Returns:
+        dict: The top `count` ETFs of every method, keyed by score column. Each
+              DataFrame holds the columns of `etf_df`, 'ExcessReturn' and that
+              method's score, best first, like `top_recommend` of the
+              matching scorer's output.
+
+    Raises:
+        ValueError: If a method is unknown, or needs a risk preference that
+                    was not given.
+    """
+    scored = score_etfs(etf_df, time_horizon, risk_free_df, risk_pref, methods)
+    columns = [method.column for method in _methods(methods, risk_pref)]
+    shared = list(range(len(scored.columns) - len(columns)))
+    ranked = {}
+    for i, column in enumerate(columns):
+        top = top_k(scored[column].to_numpy(), count)
+        ranked[column] = scored.iloc[top, shared + [len(shared) + i]]
+    return ranked
+
+
+def top_k_rows(scores, amount):
+    """
+    Finds the positions of the highest scores of every row of a matrix.
+
+    All rows are partially selected at once with `np.argpartition`. Rows
+    where the selection is ambiguous (ties with the last pick, or fewer than
+    `amount` scores) are resolved with `top_k`, so every row matches `top_k`
+    exactly.
+
+    Args:
+        scores (np.ndarray): The scores, shaped (rows, positions).
+        amount (int): The number of positions to return per row.
+
+    Returns:
+        np.ndarray: The positions, shaped (rows, amount), best score first and
+                    padded with -1.
+    """
+    scores = np.asarray(scores, dtype='float64')
+    n_rows, n_columns = scores.shape
+    positions = np.full((n_rows, max(amount, 0)), -1, dtype=np.intp)
+    k = min(amount, n_columns)
+    if k <= 0:
+        return positions
+
+    filled = np.where(np.isnan(scores), -np.inf, scores)
+    picks = np.argpartition(-filled, k - 1, axis=1)[:, :k]
+    picked = np.take_along_axis(filled, picks, axis=1)
+    kth = picked.min(axis=1)
+    exact = np.isfinite(kth) & ((filled >= kth[:, None]).sum(axis=1) == k)
+
+    order = np.lexsort((picks, -picked), axis=-1)
+    positions[exact, :k] = np.take_along_axis(picks, order, axis=1)[exact]
+    for row in np.flatnonzero(~exact):
+        top = top_k(scores[row], amount)
+        positions[row, :len(top)] = top
+    return positions
+
+
+def score_profiles(etf_df, time_horizon, risk_free_df, candidates, risk_prefs=None, method='Utility_Score',
+                   avg_risk_free=None):
+    """
+    Scores ETFs for many user profiles at once, as a (profiles x ETFs) matrix.
+
+    Each profile is a candidate mask, e.g. from its drawdown and age filters,
+    and a risk preference. The excess return is computed once. The
+    normalization of the utility scores is fitted once per distinct mask,
+    and the scores of every profile sharing it are one broadcast product of
+    the weights. Each row equals the scores of `score_etfs` on the profile's
+    candidates.
+
+    Args:
+        etf_df (pd.DataFrame): A DataFrame containing ETF metrics, see `score_etfs`.
+        time_horizon (int): The time period in years of the metrics.
+        risk_free_df (pd.DataFrame): The daily risk-free rates.
+        candidates (np.ndarray): Boolean masks over the rows of `etf_df`,
+                                 shaped (profiles, ETFs), or a single mask
+                                 shared by every profile.
+        risk_prefs (array-like, optional): One (risk_weight, return_weight)
+                                           pair per profile, shaped (profiles, 2).
+                                           Required by the utility scores.
+        method (str, optional): The score column of the method to use.
+                                Defaults to 'Utility_Score'.
+        avg_risk_free (float, optional): The average risk-free rate of the
+                                         horizon, in percent. Defaults to the
+                                         average of `risk_free_df` over the
+                                         horizon ending at its last observation.
+
+    Returns:
+        np.ndarray: The scores, shaped (profiles, ETFs). ETFs that are not
+                    candidates, or lack a growth or standard deviation, are NaN.
+
+    Raises:
+        ValueError: If the method is unknown, or needs risk preferences that
+                    were not given.
+    """
+    method = _methods([method], risk_prefs)[0]
+    growth = etf_df[f'Annual_Growth_{time_horizon}Y'].to_numpy(dtype='float64')
+    std = etf_df[f'Standard_Deviation_{time_horizon}Y'].to_numpy(dtype='float64')
+    valid = ~(np.isnan(growth) | np.isnan(std))
+    if avg_risk_free is None:
+        avg_risk_free = rate_index(risk_free_df).horizon_average(time_horizon)
+    excess = growth - avg_risk_free
+
+    candidates = np.atleast_2d(np.asarray(candidates, dtype=bool))
+    n_profiles = len(candidates)
+    weights = None
+    if method.uses_risk_preference:
+        risk_prefs = np.asarray(risk_prefs, dtype='float64').reshape(-1, 2)
+        n_profiles = max(n_profiles, len(risk_prefs))
+        risk_w, return_w = np.broadcast_to(risk_prefs, (n_profiles, 2)).T
+        weights = ((return_w / (return_w + risk_w))[:, None], (risk_w / (return_w + risk_w))[:, None])
+    candidates = np.broadcast_to(candidates, (n_profiles, len(etf_df))) & valid
+
+    scores = np.full((n_profiles, len(etf_df)), np.nan)
+    groups = {}
+    for row, packed in enumerate(np.packbits(candidates, axis=1)):
+        groups.setdefault(packed.tobytes(), []).append(row)
+    for rows in groups.values():
+        rows = np.array(rows)
+        columns = np.flatnonzero(candidates[rows[0]])
+        profile_weights = None if weights is None else (weights[0][rows], weights[1][rows])
+        scores[np.ix_(rows, columns)] = method.func(excess[columns], std[columns], profile_weights)
+    return scores
+
+
+def rank_profiles(etf_df, time_horizon, risk_free_df, candidates, count, risk_prefs=None,
+                  method='Utility_Score', avg_risk_free=None):
+    """
+    Finds the top ETFs of many user profiles at once.
+
+    Args:
+        etf_df (pd.DataFrame): A DataFrame containing ETF metrics, see `score_etfs`.
+        time_horizon (int): The time period in years of the metrics.
+        risk_free_df (pd.DataFrame): The daily risk-free rates.
+        candidates (np.ndarray): Boolean candidate masks, see `score_profiles`.
+        count (int): The number of ETFs to pick per profile.
+        risk_prefs (array-like, optional): One (risk_weight, return_weight)
+                                           pair per profile.
+        method (str, optional): The score column of the method to rank by.
+                                Defaults to 'Utility_Score'.
+        avg_risk_free (float, optional): The average risk-free rate of the
+                                         horizon, in percent, see `score_profiles`.
+
+    Returns:
+        np.ndarray: Row positions into `etf_df`, shaped (profiles, count), best
+                    first and padded with -1. Each row picks the same ETFs, in
+                    the same order, as `rank_etfs` on the profile's candidates.
+
+    Raises:
+        ValueError: If the method is unknown, or needs risk preferences that
+                    were not given.
+    """
+    return top_k_rows(score_profiles(etf_df, time_horizon, risk_free_df, candidates, risk_prefs, method,
+                                     avg_risk_free), count)
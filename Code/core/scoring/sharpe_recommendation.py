@@ -1,4 +1,4 @@
-import pandas as pd
+from core.scoring.scoring_engine import score_etfs
 
 def sharpe_score(etf_df, time_horizon, risk_free_df):
     """
@@ -23,17 +23,5 @@ def sharpe_score(etf_df, time_horizon, risk_free_df):
                       and 'Sharpe', sorted in descending order by the 'Sharpe'
                       ratio.
     """
-    growth_col = f'Annual_Growth_{time_horizon}Y'
-    std_col = f'Standard_Deviation_{time_horizon}Y'
-
-    df = etf_df.dropna(subset=[growth_col, std_col]).copy()
-
-    end = risk_free_df.index.max()
-    start = end - pd.DateOffset(years=time_horizon)
-    rf_period = risk_free_df.loc[start:end]
-    avg_rf = rf_period['yield_pct'].mean()
-
-    df['ExcessReturn'] = df[growth_col] - avg_rf
-    df['Sharpe'] = df['ExcessReturn'] / df[std_col]
-
+    df = score_etfs(etf_df, time_horizon, risk_free_df, methods=['Sharpe'])
     return df.sort_values('Sharpe', ascending=False)
@@ -1,4 +1,4 @@
-import pandas as pd
+from core.scoring.scoring_engine import score_etfs, zscore
 
 def utility_score(etf_df, time_horizon, risk_free_df, risk_pref):
     """
@@ -27,27 +27,11 @@ def utility_score(etf_df, time_horizon, risk_free_df, risk_pref):
                       'z_std', and 'Utility_Score' columns, sorted in
                       descending order by the score.
     """
-    
-    growth_col = f'Annual_Growth_{time_horizon}Y'
     std_col = f'Standard_Deviation_{time_horizon}Y'
-    risk_w, return_w = risk_pref
-    W_return = return_w / (return_w + risk_w)
-    W_risk = risk_w / (return_w + risk_w)
+    df = score_etfs(etf_df, time_horizon, risk_free_df, risk_pref, methods=['Utility_Score'])
 
-    # compute avg risk-free
-    end = risk_free_df.index.max()
-    start = end - pd.DateOffset(years=time_horizon)
-    rf_period = risk_free_df.loc[start:end]
-    avg_rf = rf_period['yield_pct'].mean()
-
-    df = etf_df.dropna(subset=[growth_col, std_col]).copy()
-    df['ExcessReturn'] = df[growth_col] - avg_rf  # in percent
-
-    # z-score normalize
-    df['z_excess'] = (df['ExcessReturn'] - df['ExcessReturn'].mean()) / df['ExcessReturn'].std(ddof=1)
-    df['z_std'] = (df[std_col] - df[std_col].mean()) / df[std_col].std(ddof=1)
-
-    # utility: want high excess return, low std
-    df['Utility_Score'] = W_return * df['z_excess'] - W_risk * df['z_std']
+    # The z-scores behind the utility, for display
+    df.insert(len(df.columns) - 1, 'z_excess', zscore(df['ExcessReturn'].to_numpy()))
+    df.insert(len(df.columns) - 1, 'z_std', zscore(df[std_col].to_numpy(dtype='float64')))
 
     return df.sort_values('Utility_Score', ascending=False)
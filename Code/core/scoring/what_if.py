@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+from config.constants import WHAT_IF_HORIZONS, RECOMMENDATION_COUNT
+from core.cache import snapshot_cache
+from core.data_processing.price_panel import as_price_panel
+from core.data_processing.Etf_Data import get_etf_metrics_batch
+from core.analysis.max_drawdown import compute_drawdown_table
+from core.analysis.rate_index import rate_index
+from core.scoring.scoring_engine import score_profiles, top_k_rows
+
+
+class WhatIfExplorer:
+    """
+    Re-ranks ETFs for any questionnaire answers from metrics held in memory.
+
+    The growth and standard deviation of every ETF over every horizon, the
+    drawdown table and the risk-free index are computed once, so a change of
+    answers only costs the candidate mask, one scoring pass and a partial
+    sort, a few milliseconds even for thousands of ETFs. For the questionnaire
+    options, the picks are the same as the recommendation table's.
+
+    Attributes:
+        tickers (np.ndarray): The ticker symbols, in `valid_tickers` order.
+        horizons (list): The horizons, in years, metrics are kept for.
+        risk_free_data (pd.DataFrame): The daily risk-free rates.
+        end_date (pd.Timestamp): The as-of date of the metrics and drawdowns.
+    """
+
+    def __init__(self, valid_tickers, data, risk_free_data, end_date, horizons=WHAT_IF_HORIZONS):
+        panel = as_price_panel(data)
+        self.tickers = np.array(valid_tickers, dtype=object)
+        self.horizons = list(horizons)
+        self.risk_free_data = risk_free_data
+        self.end_date = pd.Timestamp(end_date)
+
+        metrics = get_etf_metrics_batch(valid_tickers, self.horizons, panel, end_date)
+        # One frame per horizon, in the layout the scoring engine reads
+        self._frames = {
+            h: metrics[['Ticker', f'Annual_Growth_{h}Y', f'Standard_Deviation_{h}Y']]
+            for h in self.horizons}
+        drawdowns = compute_drawdown_table(panel, end_date).reindex(valid_tickers)
+        self._max_drawdown = drawdowns['Max_Drawdown'].to_numpy(dtype='float64')
+        self._inception = drawdowns['Inception_Date'].to_numpy(dtype='datetime64[ns]')
+        rate_index(risk_free_data)
+
+    def candidates(self, max_drawdown, min_etf_age):
+        """
+        Selects the ETFs that fit a drawdown and age tolerance.
+
+        Args:
+            max_drawdown (float): The maximum percentage drawdown tolerated.
+            min_etf_age (float): The minimum ETF age, in years.
+
+        Returns:
+            np.ndarray: A boolean mask over `tickers`, the same selection as
+                        `filter_drawdown_table`, with the ETF ages counted
+                        at `end_date`.
+        """
+        youngest = self.end_date - pd.DateOffset(years=min_etf_age)
+        return (self._max_drawdown >= -max_drawdown) & (self._inception < np.datetime64(youngest, 'ns'))
+
+    def recommend(self, time_horizon, max_drawdown, min_etf_age, risk_preference, count=RECOMMENDATION_COUNT):
+        """
+        Ranks the ETFs for one set of answers.
+
+        Args:
+            time_horizon (int): The investment horizon, one of `horizons`.
+            max_drawdown (float): The maximum percentage drawdown tolerated.
+            min_etf_age (float): The minimum ETF age, in years.
+            risk_preference (tuple): A (risk_weight, return_weight) pair; the
+                                     weights need not be integers.
+            count (int, optional): The number of ETFs recommended per method.
+
+        Returns:
+            dict: The following DataFrames, each with the columns 'Ticker',
+                  'Annual_Growth_{h}Y' and 'Standard_Deviation_{h}Y':
+                - 'candidates': every ETF that passed the filters,
+                - 'sharpe': the top ETFs by Sharpe ratio, with a 'Sharpe' column,
+                - 'utility': the top ETFs by utility score, with a
+                  'Utility_Score' column.
+
+        Raises:
+            ValueError: If no metrics are kept for `time_horizon`.
+        """
+        ranked = self.rank_batch([(time_horizon, max_drawdown, min_etf_age, risk_preference)], count)[0]
+        frame = self.metrics(time_horizon)
+        result = {'candidates': frame[self.candidates(max_drawdown, min_etf_age)].reset_index(drop=True)}
+        for key, method in [('sharpe', 'Sharpe'), ('utility', 'Utility_Score')]:
+            rows, scores = ranked[key]
+            result[key] = frame.iloc[rows].assign(**{method: scores}).reset_index(drop=True)
+        return result
+
+    def metrics(self, time_horizon):
+        """
+        Returns the metrics of every ETF over one horizon.
+
+        Args:
+            time_horizon (int): The investment horizon, one of `horizons`.
+
+        Returns:
+            pd.DataFrame: The 'Ticker', 'Annual_Growth_{h}Y' and
+                          'Standard_Deviation_{h}Y' columns, one row per ticker.
+        """
+        return self._frames[time_horizon]
+
+    def rank_batch(self, answers, count=RECOMMENDATION_COUNT, utility_method='Utility_Score'):
+        """
+        Ranks the ETFs for many sets of answers at once.
+
+        The answers are grouped by horizon, and each group is scored and
+        ranked as one (answers x ETFs) matrix by the scoring engine, so a batch
+        costs little more than its largest group. No DataFrame is built per
+        answer, each ranking is a pair of arrays.
+
+        Args:
+            answers (list): (time_horizon, max_drawdown, min_etf_age,
+                            risk_preference) tuples, see `recommend`.
+            count (int, optional): The number of ETFs recommended per method.
+            utility_method (str, optional): The score column of the utility
+                                            method, 'Utility_Score' (z-scores)
+                                            or 'Custom_Utility_Score'.
+
+        Returns:
+            list: One dict per set of answers, in order, with 'sharpe' and
+                  'utility' (rows, scores) pairs: the rows of `metrics` of the
+                  top ETFs, best first, and their scores. They pick the same
+                  ETFs as `recommend`.
+
+        Raises:
+            ValueError: If no metrics are kept for one of the horizons.
+        """
+        groups = {}
+        for number, (time_horizon, *_) in enumerate(answers):
+            if time_horizon not in self._frames:
+                raise ValueError(f"No metrics for a {time_horizon}-year horizon, expected one of {self.horizons}.")
+            groups.setdefault(int(time_horizon), []).append(number)
+
+        results = [{} for _ in answers]
+        for time_horizon, numbers in groups.items():
+            frame = self._frames[time_horizon]
+            masks = np.array([self.candidates(answers[n][1], answers[n][2]) for n in numbers])
+            preferences = np.array([answers[n][3] for n in numbers], dtype='float64')
+            for key, method, risk_prefs in [('sharpe', 'Sharpe', None),
+                                            ('utility', utility_method, preferences)]:
+                scores = score_profiles(frame, time_horizon, self.risk_free_data, masks, risk_prefs, method)
+                top = top_k_rows(scores, count)
+                for row, n in enumerate(numbers):
+                    rows = top[row][top[row] >= 0]
+                    results[n][key] = (rows, scores[row, rows])
+        return results
+
+
+@snapshot_cache(data_args=('data', 'risk_free_data'), date_args=('end_date',), maxsize=4)
+def what_if_explorer(valid_tickers, data, risk_free_data, end_date):
+    """
+    Returns the what-if explorer of a data snapshot and trading day.
+
+    Explorers are cached per snapshot and trading day (see `snapshot_cache`),
+    so every session and every slider move shares one.
+
+    Args:
+        valid_tickers (list): A list of all available ETF tickers.
+        data (PricePanel or pd.DataFrame): The historical price data for all ETFs.
+        risk_free_data (pd.DataFrame): The daily risk-free rates.
+        end_date (pd.Timestamp): The as-of date of the recommendations.
+
+    Returns:
+        WhatIfExplorer: The explorer.
+    """
+    return WhatIfExplorer(valid_tickers, data, risk_free_data, end_date)
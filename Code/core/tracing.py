@@ -0,0 +1,262 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+class Span:
+    """
+    One timed stage of a pipeline run.
+
+    Attributes:
+        name (str): The stage name.
+        start (float): Wall-clock start, in seconds since the trace started.
+        wall (float): Wall time, in seconds.
+        cpu (float): CPU time of the thread, in seconds.
+        rows (int or None): Rows processed, set by the stage.
+        peak_bytes (int or None): Peak memory allocated during the stage above
+                                  what was allocated when it started, when the
+                                  trace records memory.
+        depth (int): Nesting level, 0 for top-level stages.
+        thread (int): The thread the stage ran on.
+        attrs (dict): Extra attributes given to `span`.
+    """
+
+    __slots__ = ('name', 'start', 'wall', 'cpu', 'rows', 'peak_bytes', 'depth', 'thread', 'attrs',
+                 '_trace', '_wall0', '_cpu0', '_mem0', '_peak')
+
+    def __init__(self, trace, name, rows, attrs):
+        self._trace = trace
+        self.name = name
+        self.rows = rows
+        self.attrs = attrs
+        self.wall = self.cpu = 0.0
+        self.peak_bytes = None
+
+    def __enter__(self):
+        stack = self._trace._stack()
+        self.depth = len(stack)
+        self.thread = threading.get_ident()
+        if self._trace.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # Keep the enclosing stage's peak before the counter is reset for this one
+                stack[-1]._peak = max(stack[-1]._peak, peak)
+            tracemalloc.reset_peak()
+            self._mem0 = self._peak = current
+        stack.append(self)
+        self._cpu0 = time.thread_time()
+        self._wall0 = time.perf_counter()
+        self.start = self._wall0 - self._trace.origin
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wall = time.perf_counter() - self._wall0
+        self.cpu = time.thread_time() - self._cpu0
+        stack = self._trace._stack()
+        stack.pop()
+        if self._trace.memory:
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            self.peak_bytes = self._peak - self._mem0
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, self._peak)
+        self._trace._record(self)
+        return False
+
+    def to_dict(self):
+        """
+        Returns the span as a JSON-serializable dict.
+        """
+        return {'name': self.name, 'start': self.start, 'wall': self.wall, 'cpu': self.cpu,
+                'rows': self.rows, 'peak_bytes': self.peak_bytes, 'depth': self.depth,
+                'thread': self.thread, 'attrs': self.attrs}
+
+
+class Trace:
+    """
+    The spans recorded between `start_trace` and `stop_trace`.
+
+    Attributes:
+        spans (list): The finished spans, in the order they finished.
+        memory (bool): Whether peak allocations are recorded.
+        origin (float): `time.perf_counter()` when the trace started.
+    """
+
+    def __init__(self, memory=False):
+        self.spans = []
+        self.memory = memory
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _record(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        """
+        Aggregates the spans by stage name.
+
+        Returns:
+            list: One dict per stage, slowest first, with 'name', 'calls',
+                  'wall', 'cpu', 'rows' and 'peak_bytes' (the largest peak).
+        """
+        stages = {}
+        for span in self.spans:
+            stage = stages.setdefault(span.name, {'name': span.name, 'calls': 0, 'wall': 0.0, 'cpu': 0.0,
+                                                  'rows': None, 'peak_bytes': None})
+            stage['calls'] += 1
+            stage['wall'] += span.wall
+            stage['cpu'] += span.cpu
+            if span.rows is not None:
+                stage['rows'] = (stage['rows'] or 0) + span.rows
+            if span.peak_bytes is not None:
+                stage['peak_bytes'] = max(stage['peak_bytes'] or 0, span.peak_bytes)
+        return sorted(stages.values(), key=lambda stage: stage['wall'], reverse=True)
+
+    def to_json(self, path):
+        """
+        Writes the spans and the per-stage summary as JSON.
+
+        Args:
+            path (str): The file to write.
+        """
+        with open(path, 'w') as f:
+            json.dump({'spans': [span.to_dict() for span in self.spans], 'summary': self.summary()},
+                      f, indent=1, default=str)
+
+    def to_chrome_trace(self, path):
+        """
+        Writes the spans in Chrome's trace-event format.
+
+        The file opens in chrome://tracing or https://ui.perfetto.dev, with
+        one complete ('X') event per span.
+
+        Args:
+            path (str): The file to write.
+        """
+        events = [{
+            'name': span.name, 'ph': 'X', 'pid': os.getpid(), 'tid': span.thread,
+            'ts': span.start * 1e6, 'dur': span.wall * 1e6,
+            'args': dict(span.attrs, cpu_ms=span.cpu * 1e3, rows=span.rows, peak_bytes=span.peak_bytes),
+        } for span in self.spans]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+
+
+class _NoSpan:
+    """
+    Stands in for a span while tracing is off.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+# The trace of the current context, so concurrent runs (e.g. app sessions) keep their own
+_active = contextvars.ContextVar('active_trace', default=None)
+# Running traces that record memory, tracemalloc is stopped when the last one stops
+_memory_traces = [0]
+_memory_lock = threading.Lock()
+
+
+def start_trace(memory=False):
+    """
+    Starts recording spans in the current context.
+
+    The trace is seen by the calling thread and by the code it runs in a copy
+    of its context (`contextvars.copy_context`); other threads, such as other
+    sessions of the web app, keep their own trace or none.
+
+    Args:
+        memory (bool, optional): Also record the peak allocation of every span
+                                 with `tracemalloc`, which slows Python
+                                 allocations down while the trace runs.
+
+    Returns:
+        Trace: The new trace.
+    """
+    stop_trace()
+    trace = Trace(memory)
+    if memory:
+        with _memory_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            _memory_traces[0] += 1
+    _active.set(trace)
+    return trace
+
+
+def stop_trace():
+    """
+    Stops recording spans in the current context.
+
+    Returns:
+        Trace or None: The finished trace, or None if none was running in
+                       this context.
+    """
+    trace = _active.get()
+    _active.set(None)
+    if trace is not None and trace.memory:
+        with _memory_lock:
+            _memory_traces[0] -= 1
+            if not _memory_traces[0] and tracemalloc.is_tracing():
+                tracemalloc.stop()
+    return trace
+
+
+def span(name, rows=None, **attrs):
+    """
+    Times a pipeline stage.
+
+    Use as a context manager; the stage may set `rows` on the returned span
+    once it knows how many rows it processed. While no trace is running this
+    returns a shared no-op object, so instrumented code costs one function
+    call per stage.
+
+    Args:
+        name (str): The stage name.
+        rows (int, optional): Rows processed, if known up front.
+        **attrs: Extra attributes recorded with the span.
+
+    Returns:
+        Span: The span, or a no-op stand-in while tracing is off.
+    """
+    trace = _active.get()
+    if trace is None:
+        return _NO_SPAN
+    return Span(trace, name, rows, attrs)
+
+
+def export_trace(trace, path):
+    """
+    Writes a trace, as Chrome trace events if `path` ends in '.trace.json'
+    and as plain JSON otherwise.
+
+    Args:
+        trace (Trace or None): The trace to write. Nothing is written for None,
+                               e.g. when `stop_trace` found no running trace.
+        path (str): The file to write.
+    """
+    if trace is None:
+        return
+    if path.endswith('.trace.json'):
+        trace.to_chrome_trace(path)
+    else:
+        trace.to_json(path)
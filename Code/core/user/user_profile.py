@@ -1,6 +1,11 @@
 '''
 Asks user to build financial goal profile
 '''
+from config.constants import USER_TIME_HORIZON, USER_MINIMUM_ETF_AGE, USER_RISK_PREFERENCE, WHAT_IF_HORIZONS
+
+# The names of the answers, in USER_* order, used by the JSON interfaces
+PROFILE_FIELDS = ['time_horizon', 'desired_growth', 'fluctuation', 'worst_case',
+                  'min_etf_age', 'risk_preference']
 
 def get_choice(prompt, options):
     """
@@ -83,3 +88,43 @@ def getUserProfile():
         risk_preference)
 
     return [user_time_horizon, user_desired_growth, user_fluctuation, user_worst_case, user_minimum_efs_age, user_risk_preference]
+
+
+def parse_profile(record):
+    """
+    Reads a profile from a JSON record, e.g. a batch input line or a service request.
+
+    Args:
+        record (list or dict): The six answers in USER_* order, or an object
+                               with the PROFILE_FIELDS keys.
+
+    Returns:
+        list: The profile, indexed by the USER_* constants.
+
+    Raises:
+        ValueError: If an answer is missing or malformed, the time horizon
+                    or minimum ETF age is not an integer, or the time
+                    horizon is not one of WHAT_IF_HORIZONS.
+    """
+    if isinstance(record, dict):
+        missing = [field for field in PROFILE_FIELDS if field not in record]
+        if missing:
+            raise ValueError(f"Missing profile fields: {missing}")
+        record = [record[field] for field in PROFILE_FIELDS]
+    if not isinstance(record, list) or len(record) != len(PROFILE_FIELDS):
+        raise ValueError(f"Expected {len(PROFILE_FIELDS)} answers, got {record!r}")
+    risk_preference = record[USER_RISK_PREFERENCE]
+    if not isinstance(risk_preference, list) or len(risk_preference) != 2:
+        raise ValueError(f"Expected a [risk, return] preference, got {risk_preference!r}")
+    for answer in record[:USER_RISK_PREFERENCE] + risk_preference:
+        if isinstance(answer, bool) or not isinstance(answer, (int, float)):
+            raise ValueError(f"Expected a number, got {answer!r}")
+    # Horizons and ages are whole years; they key the metric columns and caches
+    for field in (USER_TIME_HORIZON, USER_MINIMUM_ETF_AGE):
+        if isinstance(record[field], bool) or not isinstance(record[field], int):
+            raise ValueError(f"Expected a whole number of years for {PROFILE_FIELDS[field]}, got {record[field]!r}")
+    # The service ranks from the what-if explorer, which holds these horizons only
+    if record[USER_TIME_HORIZON] not in WHAT_IF_HORIZONS:
+        raise ValueError(f"Expected a time horizon of {min(WHAT_IF_HORIZONS)} to {max(WHAT_IF_HORIZONS)} "
+                         f"years, got {record[USER_TIME_HORIZON]!r}")
+    return list(record)
@@ -12,80 +12,328 @@ also includes a quantitative back-testing feature to compare the performance
 of the recommended ETF baskets over a specific period. Additionally there are 
 options for graphing: user and ETFs risk reward profiles, and the post-training
 performance comparison of each recommendation engine.
+
+Run without arguments for the interactive questionnaire. With --batch, the
+profiles are read as JSON lines from a file (or stdin) and the
+recommendations are written to stdout as JSON lines, one per profile, as
+each one completes:
+
+    python main.py --batch profiles.jsonl [--backtest] [--plot] [--count N]
+
+Add --trace FILE to write the time, CPU time, rows and (with --trace-memory)
+peak allocation of every pipeline stage.
+
+Each input line is either a list of the six answers, in USER_* order, or an
+object with the keys of PROFILE_FIELDS and an optional "id".
 """
+import sys
+import json
+import contextlib
+import argparse
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 from datetime import datetime
 from config.constants import (
     USER_TIME_HORIZON, USER_DESIRED_GROWTH, USER_FLUCTUATION,
-    USER_WORST_CASE, USER_MINIMUM_ETF_AGE, USER_RISK_PREFERENCE, TESTING_PERIOD, RECOMMENDATION_COUNT
+    USER_WORST_CASE, USER_MINIMUM_ETF_AGE, USER_RISK_PREFERENCE, TESTING_PERIOD, RECOMMENDATION_COUNT,
+    SERVICE_URL, SERVICE_BATCH_SIZE, SERVICE_CLIENT_WORKERS
 )
-from core.data_processing.ishares_ETF_list import download_valid_data
-from core.user.user_profile import getUserProfile
+from core.data_processing.ishares_ETF_list import download_price_panel
+from core.user.user_profile import getUserProfile, parse_profile, PROFILE_FIELDS
 from core.analysis.max_drawdown import calculate_max_drawdown
 from core.data_processing.Etf_Data import get_etf_data
-from visualization.visualizing_etf_metrics import plot_risk_return_user
 from core.data_processing.risk_free_rates import fetch_risk_free_boc
-from core.scoring.etf_recommendation_evaluation import top_recommend
-from core.scoring.custom_score import utility_score
+from core.scoring.scoring_engine import rank_etfs
 from testing.recommendation_test import recommendation_test
-from visualization.graph_performance import graph_annual_growth_rate
-from testing.compare_custom_Sharpe_test_results import quantitative_etf_basket_comparison
-from core.scoring.sharpe_recommendation import sharpe_score
+from testing.compare_custom_Sharpe_test_results import backtest_profile
+from core.data_processing.snapshot import current_snapshot
+from core.tracing import span, start_trace, stop_trace, export_trace
+from service.protocol import recommendation_payload, backtest_payload
+from service.client import RecommendationClient
+
+
+def recommend(user, valid_tickers, data, risk_free_data, end_date, count=RECOMMENDATION_COUNT):
+    """
+    Runs the full-history recommendation pipeline for one profile.
+
+    Args:
+        user (list): The user's answers, indexed by the USER_* constants.
+        valid_tickers (list): A list of all available ETF tickers.
+        data (PricePanel or pd.DataFrame): The historical price data for all ETFs.
+        risk_free_data (pd.DataFrame): The daily risk-free rates.
+        end_date (pd.Timestamp): The as-of date of the recommendations.
+        count (int, optional): The number of ETFs recommended per method.
+
+    Returns:
+        tuple: A tuple containing:
+            - etf_metrics (pd.DataFrame): The metrics of the ETFs that passed
+              the drawdown and age filters.
+            - etf_utility_recommend (pd.DataFrame): The top ETFs by utility score.
+            - etf_sharpe_recommend (pd.DataFrame): The top ETFs by Sharpe ratio.
+    """
+    with span('drawdown_filter', rows=len(valid_tickers)):
+        md_tolerable_list = calculate_max_drawdown(user[USER_WORST_CASE], user[USER_MINIMUM_ETF_AGE], valid_tickers, data, end_date)
+    with span('metrics', rows=len(md_tolerable_list)):
+        etf_metrics = get_etf_data(md_tolerable_list, user[USER_TIME_HORIZON], data, end_date)
+    with span('scoring', rows=len(etf_metrics)):
+        ranked = rank_etfs(etf_metrics, user[USER_TIME_HORIZON], risk_free_data, count,
+                           user[USER_RISK_PREFERENCE], methods=['Custom_Utility_Score', 'Sharpe'])
+    etf_utility_recommend = ranked['Custom_Utility_Score'].rename(columns={'Custom_Utility_Score': 'Utility_Score'})
+    return etf_metrics, etf_utility_recommend, ranked['Sharpe']
+
 
 def main():
-    valid_tickers, data = download_valid_data()
+    # Plotting libraries are only imported by the runs that plot
+    from visualization.visualizing_etf_metrics import plot_risk_return_user
+    from visualization.graph_performance import graph_annual_growth_rate
+
+    with span('download') as stage:
+        valid_tickers, data = download_price_panel()
+        stage.rows = len(data)
     user = getUserProfile()
     end_date = pd.Timestamp(datetime.now())
-    md_tolerable_list = calculate_max_drawdown(user[USER_WORST_CASE], user[USER_MINIMUM_ETF_AGE], valid_tickers, data, end_date)
-    etf_metrics = get_etf_data(md_tolerable_list, user[USER_TIME_HORIZON], data, end_date)
-    risk_free_data = fetch_risk_free_boc("1995-01-01")
-    etf_utility_calculation = utility_score(etf_metrics, user[USER_TIME_HORIZON], risk_free_data, user[USER_RISK_PREFERENCE])
-    etf_utility_recommend = top_recommend(etf_utility_calculation, 'Utility_Score', RECOMMENDATION_COUNT)
-    etf_sharpe_recommend = top_recommend(sharpe_score(etf_metrics, user[USER_TIME_HORIZON], risk_free_data), 'Sharpe', RECOMMENDATION_COUNT)
+    with span('risk_free_fetch') as stage:
+        risk_free_data = fetch_risk_free_boc("1995-01-01")
+        stage.rows = len(risk_free_data)
+    etf_metrics, etf_utility_recommend, etf_sharpe_recommend = recommend(
+        user, valid_tickers, data, risk_free_data, end_date)
     print("Full time recommendations:")
     print("Custom Recommendations:")
     print(etf_utility_recommend)
     print("Sharpe Recommendations:")
     print(etf_sharpe_recommend)
-    plot_risk_return_user(
-        etf_metrics,
-        user[USER_DESIRED_GROWTH],
-        user[USER_FLUCTUATION],
-        user[USER_TIME_HORIZON],
-        f'ETF Risk-Return Space with User Profile (Time Horizon = {user[USER_TIME_HORIZON]}Y)',
-        set(etf_sharpe_recommend['Ticker']),
-        set(etf_utility_recommend['Ticker']),
-        user[USER_RISK_PREFERENCE], user[USER_MINIMUM_ETF_AGE], user[USER_RISK_PREFERENCE]
-    )
-    custom_recommended_list, sharpe_recommended_list = recommendation_test(
-        user[USER_TIME_HORIZON], user[USER_DESIRED_GROWTH], user[USER_FLUCTUATION],
-        user[USER_WORST_CASE], user[USER_MINIMUM_ETF_AGE], user[USER_RISK_PREFERENCE],
-        valid_tickers, data, TESTING_PERIOD
-    )
+    with span('charting', rows=len(etf_metrics)):
+        plot_risk_return_user(
+            etf_metrics,
+            user[USER_DESIRED_GROWTH],
+            user[USER_FLUCTUATION],
+            user[USER_TIME_HORIZON],
+            f'ETF Risk-Return Space with User Profile (Time Horizon = {user[USER_TIME_HORIZON]}Y)',
+            set(etf_sharpe_recommend['Ticker']),
+            set(etf_utility_recommend['Ticker']),
+            user[USER_RISK_PREFERENCE], user[USER_MINIMUM_ETF_AGE], user[USER_RISK_PREFERENCE]
+        )
+    custom_recommended_list, sharpe_recommended_list, results = backtest_profile(
+        user, valid_tickers, data, risk_free_data, end_date)
     print("Test period recommendations:")
     print("Custom Recommendations:")
     print(custom_recommended_list)
     print("Sharpe Recommendations:")
     print(sharpe_recommended_list)
-    test_start = end_date - pd.DateOffset(years=TESTING_PERIOD)
-    results = quantitative_etf_basket_comparison(
-        data, custom_recommended_list, sharpe_recommended_list, user[USER_DESIRED_GROWTH], 
-        user[USER_FLUCTUATION], test_start, end_date, risk_free_data['yield_pct'].mean())
     print(results) 
-    graph_annual_growth_rate(
-        data,
-        custom_recommended_list,
-        sharpe_recommended_list,
-        TESTING_PERIOD,
-        user[USER_TIME_HORIZON],
-        user[USER_DESIRED_GROWTH],
-        user[USER_FLUCTUATION],
-        user[USER_WORST_CASE],      # max drawdown
-        user[USER_MINIMUM_ETF_AGE],
-        user[USER_RISK_PREFERENCE]
-    )
+    with span('charting'):
+        graph_annual_growth_rate(
+            data,
+            custom_recommended_list,
+            sharpe_recommended_list,
+            TESTING_PERIOD,
+            user[USER_TIME_HORIZON],
+            user[USER_DESIRED_GROWTH],
+            user[USER_FLUCTUATION],
+            user[USER_WORST_CASE],      # max drawdown
+            user[USER_MINIMUM_ETF_AGE],
+            user[USER_RISK_PREFERENCE]
+        )
     print(f'Time_Horizon: {user[USER_TIME_HORIZON]}\nGrowth: {user[USER_DESIRED_GROWTH]}\nSTD: {user[USER_FLUCTUATION]}\nMax_Drawdown:'
           + f'{user[USER_WORST_CASE]}\nMin_ETF_Age: {user[USER_MINIMUM_ETF_AGE]}\nRisk_Return_Ratio: {user[USER_RISK_PREFERENCE]}\n')
 
+
+def run_batch(lines, out, count=RECOMMENDATION_COUNT, backtest=False, plot=False, service_url=None):
+    """
+    Writes the recommendations of many profiles as JSON lines.
+
+    The prices and rates are loaded once for the whole batch, from the
+    published snapshot if there is one. With `service_url`, nothing is loaded
+    and the profiles are sent to the recommendation service instead, in
+    chunks of SERVICE_BATCH_SIZE, unless the charts are requested. Each
+    profile's result (or, with the service, each chunk's) is written and
+    flushed as soon as it is ready, in input order. A profile that cannot be processed yields an object
+    with an 'error' message instead, and the batch continues.
+
+    Args:
+        lines (iterable): The input lines, one JSON profile each. Blank lines
+                          are skipped.
+        out (file): Where to write the output lines.
+        count (int, optional): The number of ETFs recommended per method.
+        backtest (bool, optional): Also re-run the recommendations at the
+                                   start of the testing period and compare both
+                                   baskets over it. Off by default.
+        plot (bool, optional): Also render the charts of the interactive mode.
+                               Off by default.
+        service_url (str, optional): The URL of the recommendation service to
+                                     use, see `service/server.py`. Defaults to
+                                     running the pipeline in this process.
+
+    Returns:
+        int: The number of profiles that failed.
+    """
+    if service_url and not plot:
+        return _run_service_batch(lines, out, RecommendationClient(service_url), count, backtest)
+
+    with span('download'):
+        snapshot = current_snapshot()
+        if snapshot is not None:
+            valid_tickers, data, risk_free_data = snapshot.valid_tickers, snapshot.panel, snapshot.risk_free
+        else:
+            valid_tickers, data = download_price_panel()
+            risk_free_data = fetch_risk_free_boc("1995-01-01")
+    end_date = pd.Timestamp(datetime.now())
+
+    failures = 0
+    # The pipeline reports skipped tickers with print, keep them out of the JSON stream
+    with contextlib.redirect_stdout(sys.stderr):
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            result, user = _read_profile(number, line)
+            if user is not None:
+                try:
+                    result.update(_local_result(user, valid_tickers, data, risk_free_data, end_date,
+                                                count, backtest, plot))
+                except Exception as e:
+                    result = _error_result(result, e)
+            failures += _write_result(out, result)
+    return failures
+
+
+def _run_service_batch(lines, out, client, count, backtest):
+    """
+    Writes the batch results computed by the recommendation service.
+
+    The profiles are sent in chunks of SERVICE_BATCH_SIZE, one request per
+    chunk, and the back-tests of a chunk run concurrently. The results are
+    written in input order once their chunk is done.
+    """
+    failures = 0
+    numbered = ((number, line) for number, line in enumerate(lines, start=1) if line.strip())
+    with ThreadPoolExecutor(max_workers=SERVICE_CLIENT_WORKERS) as executor:
+        while True:
+            chunk = [_read_profile(number, line) for number, line in itertools.islice(numbered, SERVICE_BATCH_SIZE)]
+            if not chunk:
+                return failures
+            users = [user for _, user in chunk if user is not None]
+            try:
+                payloads = client.recommend_many(users, count, 'Custom_Utility_Score') if users else []
+                request_error = None
+            except Exception as e:
+                payloads, request_error = [None] * len(users), e
+            payloads = iter(payloads)
+            pending = []
+            for result, user in chunk:
+                backtest_future = None
+                if user is not None:
+                    payload = next(payloads)
+                    if request_error is not None:
+                        result = _error_result(result, request_error)
+                    elif 'error' in payload:
+                        result = _error_result(result, ValueError(payload['error']))
+                    else:
+                        result.update(payload)
+                        if backtest:
+                            backtest_future = executor.submit(client.backtest, user)
+                pending.append((result, backtest_future))
+            for result, backtest_future in pending:
+                if backtest_future is not None:
+                    try:
+                        result['backtest'] = backtest_future.result()
+                    except Exception as e:
+                        result = _error_result(result, e)
+                failures += _write_result(out, result)
+
+
+def _read_profile(number, line):
+    """
+    Parses a batch input line, returning its result so far and the profile,
+    or an error result and None if the line is malformed.
+    """
+    result = {'id': number}
+    try:
+        record = json.loads(line)
+        if isinstance(record, dict):
+            result['id'] = record.get('id', number)
+        user = parse_profile(record)
+    except Exception as e:
+        return _error_result(result, e), None
+    result['profile'] = dict(zip(PROFILE_FIELDS, user))
+    return result, user
+
+
+def _error_result(result, error):
+    return {'id': result['id'], 'error': f"{type(error).__name__}: {error}"}
+
+
+def _write_result(out, result):
+    """
+    Writes the JSON line of one batch result, returning 1 if it failed.
+    """
+    out.write(json.dumps(result) + '\n')
+    out.flush()
+    return 1 if 'error' in result else 0
+
+
+def _local_result(user, valid_tickers, data, risk_free_data, end_date, count, backtest, plot):
+    """
+    Computes a profile's batch result in this process.
+    """
+    etf_metrics, etf_utility_recommend, etf_sharpe_recommend = recommend(
+        user, valid_tickers, data, risk_free_data, end_date, count)
+    result = recommendation_payload(user, etf_utility_recommend, etf_sharpe_recommend)
+
+    if backtest:
+        custom_recommended_list, sharpe_recommended_list, comparison = backtest_profile(
+            user, valid_tickers, data, risk_free_data, end_date)
+        result['backtest'] = backtest_payload(custom_recommended_list, sharpe_recommended_list, comparison)
+    elif plot:
+        with span('recommendation_test'):
+            custom_recommended_list, sharpe_recommended_list = recommendation_test(
+                user[USER_TIME_HORIZON], user[USER_DESIRED_GROWTH], user[USER_FLUCTUATION],
+                user[USER_WORST_CASE], user[USER_MINIMUM_ETF_AGE], user[USER_RISK_PREFERENCE],
+                valid_tickers, data, TESTING_PERIOD)
+    if plot:
+        from visualization.visualizing_etf_metrics import plot_risk_return_user
+        from visualization.graph_performance import graph_annual_growth_rate
+        with span('charting'):
+            plot_risk_return_user(
+                etf_metrics, user[USER_DESIRED_GROWTH], user[USER_FLUCTUATION], user[USER_TIME_HORIZON],
+                f'ETF Risk-Return Space with User Profile (Time Horizon = {user[USER_TIME_HORIZON]}Y)',
+                set(etf_sharpe_recommend['Ticker']), set(etf_utility_recommend['Ticker']),
+                user[USER_RISK_PREFERENCE], user[USER_MINIMUM_ETF_AGE], user[USER_RISK_PREFERENCE])
+            graph_annual_growth_rate(
+                data, custom_recommended_list, sharpe_recommended_list, TESTING_PERIOD,
+                user[USER_TIME_HORIZON], user[USER_DESIRED_GROWTH], user[USER_FLUCTUATION],
+                user[USER_WORST_CASE], user[USER_MINIMUM_ETF_AGE], user[USER_RISK_PREFERENCE])
+    return result
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="ETF recommendation engine.")
+    parser.add_argument('--batch', nargs='?', const='-', metavar='FILE',
+                        help="read JSON-lines profiles from FILE (or stdin with '-') instead of asking")
+    parser.add_argument('--count', type=int, default=RECOMMENDATION_COUNT,
+                        help="number of ETFs recommended per method in batch mode")
+    parser.add_argument('--backtest', action='store_true', help="add the test-period comparison in batch mode")
+    parser.add_argument('--plot', action='store_true', help="render the charts in batch mode")
+    parser.add_argument('--service', metavar='URL', default=SERVICE_URL,
+                        help="send the batch profiles to the recommendation service at URL "
+                             "(default: $ETF_SERVICE_URL, or run in-process)")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="write the stage timings to FILE (Chrome trace events if it ends in .trace.json)")
+    parser.add_argument('--trace-memory', action='store_true', help="also record peak allocations per stage")
+    args = parser.parse_args()
+
+    if args.trace:
+        start_trace(memory=args.trace_memory)
+    failures = 0
+    try:
+        if args.batch is None:
+            main()
+        elif args.batch == '-':
+            failures = run_batch(sys.stdin, sys.stdout, args.count, args.backtest, args.plot, args.service)
+        else:
+            with open(args.batch) as f:
+                failures = run_batch(f, sys.stdout, args.count, args.backtest, args.plot, args.service)
+    finally:
+        if args.trace:
+            export_trace(stop_trace(), args.trace)
+    sys.exit(1 if failures else 0)
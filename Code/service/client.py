@@ -0,0 +1,117 @@
+import json
+import urllib.error
+import urllib.request
+import numpy as np
+import pandas as pd
+from config.constants import SERVICE_URL, SERVICE_TIMEOUT, RECOMMENDATION_COUNT
+from service.protocol import recommendation_frames
+
+
+class RecommendationClient:
+    """
+    Client of the local recommendation service (see `service/server.py`).
+
+    The front-ends use it instead of loading the data and running the
+    pipeline in their own process.
+    """
+
+    def __init__(self, url=SERVICE_URL, timeout=SERVICE_TIMEOUT):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _call(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode()
+        request = urllib.request.Request(self.url + path, data=data,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.load(e).get('error', e.reason)
+            except ValueError:
+                message = e.reason
+            if e.code == 400:
+                raise ValueError(message) from None
+            raise RuntimeError(f"Recommendation service error: {message}") from None
+
+    def health(self):
+        """
+        Describes the data the service is serving.
+
+        Returns:
+            dict: The data 'version', the 'as_of' trading day and the number of 'tickers'.
+        """
+        return self._call('/health')
+
+    def recommend_many(self, profiles, count=RECOMMENDATION_COUNT, utility_method='Utility_Score'):
+        """
+        Recommends ETFs for many profiles in one request.
+
+        Args:
+            profiles (list): The profiles, as lists of the six answers in
+                             USER_* order or objects with the PROFILE_FIELDS keys.
+            count (int, optional): The number of ETFs recommended per method.
+            utility_method (str, optional): The utility score to rank by,
+                                            'Utility_Score' or 'Custom_Utility_Score'.
+
+        Returns:
+            list: One result per profile, see `recommendation_payload`, or a
+                  dict with an 'error' message if the profile failed.
+
+        Raises:
+            ValueError: If the request is malformed.
+        """
+        return self._call('/recommend', {'profiles': profiles, 'count': count,
+                                         'utility': utility_method})['results']
+
+    def recommend(self, user, count=RECOMMENDATION_COUNT, utility_method='Utility_Score'):
+        """
+        Recommends ETFs for one profile.
+
+        Args:
+            user (list): The user's answers, indexed by the USER_* constants.
+            count (int, optional): The number of ETFs recommended per method.
+            utility_method (str, optional): The utility score to rank by,
+                                            'Utility_Score' or 'Custom_Utility_Score'.
+
+        Returns:
+            tuple: The (etf_sharpe_recommend, etf_utility_recommend) DataFrames,
+                   with the 'Ticker', growth, standard deviation and score of
+                   the picks, best first.
+
+        Raises:
+            ValueError: If the profile is malformed.
+        """
+        payload = self.recommend_many([user], count, utility_method)[0]
+        if 'error' in payload:
+            raise ValueError(payload['error'])
+        return recommendation_frames(payload)
+
+    def backtest(self, user):
+        """
+        Back-tests a profile's recommendations over the testing period.
+
+        Args:
+            user (list): The user's answers, indexed by the USER_* constants.
+
+        Returns:
+            dict: The result, see `backtest_payload`.
+        """
+        return self._call('/backtest', {'profile': user})
+
+    def prices(self, tickers, start):
+        """
+        Fetches the prices of a few ETFs.
+
+        Args:
+            tickers (list): The ticker symbols.
+            start (pd.Timestamp): The first date.
+
+        Returns:
+            pd.DataFrame: The prices, one column per known ticker, indexed by date.
+        """
+        result = self._call('/prices', {'tickers': list(tickers),
+                                        'start': pd.Timestamp(start).strftime('%Y-%m-%d')})
+        values = np.array(result['prices'], dtype='float64').reshape(len(result['dates']), len(result['tickers']))
+        return pd.DataFrame(values, index=pd.to_datetime(result['dates']), columns=result['tickers'])
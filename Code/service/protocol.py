@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from config.constants import USER_TIME_HORIZON
+
+# The comparison metrics of a back-test result
+BACKTEST_METRICS = ['Annual Return (%)', 'Volatility (%)', 'Sharpe', 'Sortino',
+                    'Max Drawdown (%)', 'Reward to Shortfall']
+
+
+def records(df, columns):
+    """
+    Converts the given columns of a DataFrame to JSON records.
+
+    Args:
+        df (pd.DataFrame): The rows to convert.
+        columns (list): The columns to keep, in order; missing ones are skipped.
+
+    Returns:
+        list: One dict per row. JSON has no NaN, missing values are None.
+    """
+    df = df[[column for column in columns if column in df.columns]]
+    return [{key: (None if isinstance(value, float) and np.isnan(value) else value)
+             for key, value in row.items()} for row in df.to_dict(orient='records')]
+
+
+def recommendation_payload(user, etf_utility_recommend, etf_sharpe_recommend):
+    """
+    Builds the JSON result of a profile's recommendations.
+
+    The same result is written by `main.py --batch` and returned by the
+    recommendation service.
+
+    Args:
+        user (list): The user's answers, indexed by the USER_* constants.
+        etf_utility_recommend (pd.DataFrame): The top ETFs by utility score,
+                                              with a 'Utility_Score' column.
+        etf_sharpe_recommend (pd.DataFrame): The top ETFs by Sharpe ratio,
+                                             with a 'Sharpe' column.
+
+    Returns:
+        dict: The 'utility' and 'sharpe' records, each with the 'Ticker',
+              growth, standard deviation and score of the picks, best first.
+    """
+    growth_col = f'Annual_Growth_{user[USER_TIME_HORIZON]}Y'
+    std_col = f'Standard_Deviation_{user[USER_TIME_HORIZON]}Y'
+    return {
+        'utility': records(etf_utility_recommend, ['Ticker', growth_col, std_col, 'Utility_Score']),
+        'sharpe': records(etf_sharpe_recommend, ['Ticker', growth_col, std_col, 'Sharpe']),
+    }
+
+
+def backtest_payload(custom_tickers, sharpe_tickers, comparison):
+    """
+    Builds the JSON result of a profile's back-test.
+
+    Args:
+        custom_tickers (list): The custom-recommended tickers.
+        sharpe_tickers (list): The Sharpe-recommended tickers.
+        comparison (pd.DataFrame): Their performance, see `backtest_profile`.
+
+    Returns:
+        dict: The 'custom' and 'sharpe' tickers and the BACKTEST_METRICS of
+              each basket under 'metrics'.
+    """
+    return {
+        'custom': custom_tickers,
+        'sharpe': sharpe_tickers,
+        'metrics': dict(zip(comparison.index, records(comparison, BACKTEST_METRICS))),
+    }
+
+
+def recommendation_frames(payload):
+    """
+    Reads the DataFrames back from a recommendation result.
+
+    Args:
+        payload (dict): A result of `recommendation_payload`.
+
+    Returns:
+        tuple: The (etf_sharpe_recommend, etf_utility_recommend) DataFrames.
+    """
+    return pd.DataFrame(payload['sharpe']), pd.DataFrame(payload['utility'])
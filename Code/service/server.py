@@ -0,0 +1,387 @@
+"""
+Local recommendation service.
+
+A long-running process that loads the data once and serves the
+recommendations and back-tests of any number of front-ends (Streamlit
+sessions, `main.py --batch` runs, scripts) over a local JSON HTTP API:
+
+    GET  /health     -> {"version", "as_of", "tickers"}
+    POST /recommend  {"profiles": [...], "count": 5, "utility": "Utility_Score"}
+                     -> {"results": [{"utility": [...], "sharpe": [...]} or {"error": ...}]}
+    POST /backtest   {"profile": ...} -> {"custom", "sharpe", "metrics"}
+    POST /prices     {"tickers": [...], "start": "YYYY-MM-DD"} -> {"dates", "tickers", "prices"}
+
+Profiles are in the format of `main.py --batch`. Recommendation requests that
+arrive together, from one or many clients, are ranked in one batch.
+
+    python service/server.py [--host HOST] [--port PORT]
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from config.constants import (
+    USER_TIME_HORIZON, USER_WORST_CASE, USER_MINIMUM_ETF_AGE, USER_RISK_PREFERENCE,
+    RECOMMENDATION_COUNT, SERVICE_HOST, SERVICE_PORT, SERVICE_BATCH_WINDOW, SERVICE_BATCH_SIZE
+)
+from core.cache import normalize_as_of
+from core.data_processing.ishares_ETF_list import download_price_panel
+from core.data_processing.risk_free_rates import fetch_risk_free_boc
+from core.data_processing.snapshot import current_snapshot
+from core.data_processing.price_panel import as_price_panel
+from core.scoring.scoring_engine import SCORING_METHODS
+from core.scoring.what_if import what_if_explorer
+from core.user.user_profile import parse_profile
+from core.tracing import span
+from testing.compare_custom_Sharpe_test_results import backtest_profile
+from service.protocol import backtest_payload
+
+
+class RequestBatcher:
+    """
+    Groups concurrent requests into batches handled by one worker thread.
+
+    The requests that queue up while a batch is handled form the next batch,
+    so a lone request is handled at once while a burst is handled in a few
+    calls. With a positive `window`, each batch also waits that many seconds
+    for more requests to join it. If a batch fails, its requests are retried
+    one by one so that only the failing ones fail.
+    """
+
+    def __init__(self, handle, window=SERVICE_BATCH_WINDOW, max_size=SERVICE_BATCH_SIZE):
+        self._handle = handle
+        self._window = window
+        self._max_size = max_size
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name='batcher', daemon=True).start()
+
+    def submit(self, request):
+        """
+        Queues a request for the next batch.
+
+        Args:
+            request: The request, passed to `handle` in a list.
+
+        Returns:
+            Future: Resolves to the request's result, or its exception.
+        """
+        future = Future()
+        self._queue.put((request, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._window
+            while len(batch) < self._max_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            self._complete(batch)
+
+    def _complete(self, batch):
+        try:
+            results = self._handle([request for request, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+            else:
+                for item in batch:
+                    self._complete([item])
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+class RecommendationService:
+    """
+    Keeps the data and the ranking state hot for every front-end.
+
+    The prices, the risk-free rates and the what-if explorer (the metrics of
+    every horizon, the drawdown table and the risk-free index) are loaded once
+    and shared by all requests. The service follows the published snapshot:
+    when the refresh job swaps in a new one, the next request uses it. Without
+    a snapshot, the data is loaded through the usual loaders and reloaded on
+    the first request of every trading day.
+    """
+
+    def __init__(self, window=SERVICE_BATCH_WINDOW, max_size=SERVICE_BATCH_SIZE):
+        self._loaded = None
+        self._load_lock = threading.Lock()
+        self._batcher = RequestBatcher(self._recommend_batch, window, max_size)
+
+    def data(self):
+        """
+        Returns the data the requests are served from.
+
+        Returns:
+            tuple: The (valid_tickers, data, risk_free_data) of the current
+                   snapshot, or of the loaders if no snapshot is published.
+        """
+        snapshot = current_snapshot()
+        if snapshot is not None:
+            return snapshot.valid_tickers, snapshot.panel, snapshot.risk_free
+        as_of = normalize_as_of(pd.Timestamp(datetime.now()))
+        with self._load_lock:
+            if self._loaded is None or self._loaded[0] != as_of:
+                if self._loaded is not None:
+                    # The loaders' own caches may still hold the previous day's data
+                    download_price_panel.clear()
+                    fetch_risk_free_boc.clear()
+                with span('download'):
+                    valid_tickers, data = download_price_panel()
+                with span('risk_free_fetch'):
+                    risk_free_data = fetch_risk_free_boc("1995-01-01")
+                self._loaded = as_of, (valid_tickers, data, risk_free_data)
+        return self._loaded[1]
+
+    def explorer(self):
+        """
+        Returns the what-if explorer of the current data and trading day,
+        building it on the first call of the day.
+        """
+        valid_tickers, data, risk_free_data = self.data()
+        return what_if_explorer(valid_tickers, data, risk_free_data, pd.Timestamp(datetime.now()))
+
+    def health(self):
+        """
+        Describes the data the service is serving.
+
+        Returns:
+            dict: The data 'version', the 'as_of' trading day and the number of 'tickers'.
+        """
+        valid_tickers, data, _ = self.data()
+        return {
+            'version': as_price_panel(data).version,
+            'as_of': normalize_as_of(pd.Timestamp(datetime.now())).strftime('%Y-%m-%d'),
+            'tickers': len(valid_tickers),
+        }
+
+    def recommend(self, profiles, count=RECOMMENDATION_COUNT, utility_method='Utility_Score'):
+        """
+        Recommends ETFs for many profiles.
+
+        The profiles join the next batch, which may also hold other clients'
+        profiles, and every profile of a batch is ranked together.
+
+        Args:
+            profiles (list): The profiles, as accepted by `parse_profile`.
+            count (int, optional): The number of ETFs recommended per method.
+            utility_method (str, optional): The utility score to rank by,
+                                            'Utility_Score' (the web app's) or
+                                            'Custom_Utility_Score' (main.py's).
+
+        Returns:
+            list: One result per profile, see `recommendation_payload`, or a
+                  dict with an 'error' message if the profile failed.
+
+        Raises:
+            ValueError: If `count` or `utility_method` is invalid.
+        """
+        if isinstance(count, bool) or not isinstance(count, int) or count < 1:
+            raise ValueError(f"Expected a positive count, got {count!r}")
+        method = SCORING_METHODS.get(utility_method)
+        if method is None or not method.uses_risk_preference:
+            raise ValueError(f"Unknown utility method {utility_method!r}")
+
+        futures = []
+        for record in profiles:
+            future = Future()
+            try:
+                user = parse_profile(record)
+                future = self._batcher.submit((user, count, utility_method))
+            except ValueError as e:
+                future.set_exception(e)
+            futures.append(future)
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({'error': f"{type(e).__name__}: {e}"})
+        return results
+
+    def _recommend_batch(self, requests):
+        explorer = self.explorer()
+        groups = {}
+        for number, (_, count, utility_method) in enumerate(requests):
+            groups.setdefault((count, utility_method), []).append(number)
+
+        results = [None] * len(requests)
+        columns = {}
+        for (count, utility_method), numbers in groups.items():
+            answers = [(user[USER_TIME_HORIZON], user[USER_WORST_CASE], user[USER_MINIMUM_ETF_AGE],
+                        user[USER_RISK_PREFERENCE]) for user, _, _ in (requests[n] for n in numbers)]
+            for number, ranked in zip(numbers, explorer.rank_batch(answers, count, utility_method)):
+                time_horizon = int(requests[number][0][USER_TIME_HORIZON])
+                if time_horizon not in columns:
+                    frame = explorer.metrics(time_horizon)
+                    columns[time_horizon] = [(name, frame[name].tolist()) for name in frame.columns]
+                # The wire format names the utility score 'Utility_Score' whatever the method
+                results[number] = {
+                    key: _records(columns[time_horizon], score_column, *ranked[key])
+                    for key, score_column in [('utility', 'Utility_Score'), ('sharpe', 'Sharpe')]}
+        return results
+
+    def backtest(self, profile):
+        """
+        Back-tests a profile's recommendations over the testing period.
+
+        Args:
+            profile (list or dict): The profile, as accepted by `parse_profile`.
+
+        Returns:
+            dict: The result, see `backtest_payload`.
+
+        Raises:
+            ValueError: If the profile is malformed.
+        """
+        user = parse_profile(profile)
+        valid_tickers, data, risk_free_data = self.data()
+        return backtest_payload(*backtest_profile(
+            user, valid_tickers, data, risk_free_data, pd.Timestamp(datetime.now())))
+
+    def prices(self, tickers, start):
+        """
+        Returns the prices of a few ETFs, e.g. for charting.
+
+        Args:
+            tickers (list): The ticker symbols; unknown ones are skipped.
+            start (str): The first date, 'YYYY-MM-DD'.
+
+        Returns:
+            dict: The 'dates', the known 'tickers' and the 'prices' matrix,
+                  one row per date and None where an ETF has no price.
+        """
+        panel = as_price_panel(self.data()[1])
+        known = [ticker for ticker in tickers if ticker in panel]
+        first_row, stop_row = panel.row_range(pd.Timestamp(start), None)
+        values = panel.values[first_row:stop_row, [panel.columns[ticker] for ticker in known]]
+        return {
+            'dates': panel.dates[first_row:stop_row].strftime('%Y-%m-%d').tolist(),
+            'tickers': known,
+            'prices': np.where(np.isnan(values), None, values).tolist(),
+        }
+
+
+def _records(columns, score_column, rows, scores):
+    # Built from the arrays directly, a DataFrame per profile would cost more than the ranking
+    records = []
+    for row, score in zip(rows, scores):
+        record = {name: values[row] for name, values in columns}
+        record[score_column] = float(score)
+        records.append(record)
+    return records
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._respond(lambda: self.server.service.health())
+        else:
+            self._reply(404, {'error': f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        routes = {
+            '/recommend': lambda request: {'results': self.server.service.recommend(
+                _field(request, 'profiles', list), request.get('count', RECOMMENDATION_COUNT),
+                request.get('utility', 'Utility_Score'))},
+            '/backtest': lambda request: self.server.service.backtest(_field(request, 'profile', (list, dict))),
+            '/prices': lambda request: self.server.service.prices(
+                _field(request, 'tickers', list), _field(request, 'start', str)),
+        }
+        if self.path not in routes:
+            self._reply(404, {'error': f"Unknown path {self.path}"})
+            return
+        self._respond(lambda: routes[self.path](self._request()))
+
+    def _request(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        request = json.loads(body or b'{}')
+        if not isinstance(request, dict):
+            raise ValueError("Expected a JSON object")
+        return request
+
+    def _respond(self, handle):
+        try:
+            result = handle()
+        except ValueError as e:
+            self._reply(400, {'error': f"{type(e).__name__}: {e}"})
+        except Exception as e:
+            self._reply(500, {'error': f"{type(e).__name__}: {e}"})
+        else:
+            self._reply(200, result)
+
+    def _reply(self, status, result):
+        body = json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _field(request, name, types):
+    if not isinstance(request.get(name), types):
+        raise ValueError(f"Missing or malformed {name!r}")
+    return request[name]
+
+
+class _Server(ThreadingHTTPServer):
+    # Bursts of front-end connections wait to be accepted instead of being refused
+    request_queue_size = 128
+
+
+def make_server(service, host=SERVICE_HOST, port=SERVICE_PORT):
+    """
+    Creates the HTTP server of a recommendation service.
+
+    Each connection is handled on its own thread, and the recommendation
+    requests of all threads meet in the service's batches.
+
+    Args:
+        service (RecommendationService): The service to expose.
+        host (str, optional): The address to listen on. Defaults to SERVICE_HOST,
+                              the loopback interface.
+        port (int, optional): The port to listen on, 0 for any free port.
+                              Defaults to SERVICE_PORT.
+
+    Returns:
+        ThreadingHTTPServer: The server, not yet serving.
+    """
+    server = _Server((host, port), _Handler)
+    server.service = service
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local ETF recommendation service.")
+    parser.add_argument('--host', default=SERVICE_HOST, help="address to listen on")
+    parser.add_argument('--port', type=int, default=SERVICE_PORT, help="port to listen on")
+    parser.add_argument('--batch-window', type=float, default=SERVICE_BATCH_WINDOW,
+                        help="seconds a recommendation request waits for others to batch with")
+    args = parser.parse_args()
+
+    service = RecommendationService(window=args.batch_window)
+    # Load the data and build the explorer before accepting requests
+    service.explorer()
+    server = make_server(service, args.host, args.port)
+    print(f"Serving recommendations on http://{args.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
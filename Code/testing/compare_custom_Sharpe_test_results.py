@@ -5,6 +5,14 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(
 
 import pandas as pd
 import numpy as np
+from core.data_processing.price_panel import as_price_panel
+from core.analysis.portfolio_simulator import basket_weights, simulate_portfolios, portfolio_metrics
+from core.tracing import span
+from config.constants import (
+    USER_TIME_HORIZON, USER_DESIRED_GROWTH, USER_FLUCTUATION,
+    USER_WORST_CASE, USER_MINIMUM_ETF_AGE, USER_RISK_PREFERENCE, TESTING_PERIOD
+)
+from testing.recommendation_test import recommendation_test
 
 def quantitative_etf_basket_comparison(
     df,
@@ -25,7 +33,7 @@ def quantitative_etf_basket_comparison(
     risk-adjusted returns, volatility, and downside risk.
 
     Args:
-        df (pd.DataFrame): DataFrame containing historical ETF price data.
+        df (PricePanel or pd.DataFrame): Historical ETF price data.
         custom_tickers (list): A list of tickers for the custom-recommended ETF basket.
         sharpe_tickers (list): A list of tickers for the Sharpe-recommended ETF basket.
         user_growth (float): The user's desired annual growth rate, used to
@@ -48,7 +56,7 @@ def quantitative_etf_basket_comparison(
     if test_end is None:
         test_end = pd.Timestamp.today()
 
-    df = df.loc[test_start:test_end, :]  # slice the testing period
+    panel = as_price_panel(df).window(test_start, test_end)  # slice the testing period
 
     # Track unique and overlap
     unique_custom = sorted(set(custom_tickers) - set(sharpe_tickers))
@@ -56,24 +64,24 @@ def quantitative_etf_basket_comparison(
     overlap = sorted(set(custom_tickers) & set(sharpe_tickers))
     overlap_count = len(overlap)
 
-    results = []
-
+    baskets = {}
     for label, tickers in [('Custom', custom_tickers), ('Sharpe', sharpe_tickers)]:
-        combined_returns = []
-
+        baskets[label] = []
         for ticker in tickers:
-            if (ticker, 'Adj Close') not in df.columns:
+            if ticker not in panel:
                 print(f"{ticker} not found in test data.")
                 continue
-
-            prices = df[(ticker, 'Adj Close')].dropna()
-            if len(prices) < 2:
+            if np.count_nonzero(~np.isnan(panel.column(ticker))) < 2:
                 continue
+            baskets[label].append(ticker)
 
-            returns = prices.pct_change().dropna()
-            combined_returns.append(returns)
+    # Both baskets are averaged daily over the ETFs that traded, in one pass
+    test_returns = simulate_portfolios(panel, basket_weights(panel, baskets), rebalance='daily')
+    metrics = portfolio_metrics(test_returns, risk_free_rate, user_growth, user_std)
 
-        if not combined_returns:
+    results = []
+    for label, tickers in baskets.items():
+        if not tickers:
             print(f"No valid returns for {label}")
             results.append([
                 label, None, None, None, None, None, None,
@@ -81,38 +89,15 @@ def quantitative_etf_basket_comparison(
             ])
             continue
 
-        test_returns = pd.concat(combined_returns, axis=1).mean(axis=1)
-
-        # Calculate metrics
-        ann_return = (1 + test_returns.mean()) ** 252 - 1
-        ann_std = test_returns.std() * np.sqrt(252)
-        sharpe = (ann_return - risk_free_rate) / ann_std if ann_std else np.nan
-
-        downside = test_returns[test_returns < 0]
-        sortino = (ann_return - risk_free_rate) / (downside.std() * np.sqrt(252)) if not downside.empty else np.nan
-
-        cum_returns = (1 + test_returns).cumprod()
-        peak = cum_returns.cummax()
-        drawdown = (cum_returns - peak) / peak
-        max_dd = drawdown.min()
-
-        if user_growth is not None and user_std is not None:
-            threshold = (user_growth - user_std) / 100 / 252
-            shortfalls = np.where(test_returns < threshold, threshold - test_returns, 0)
-            mean_shortfall = np.mean(shortfalls)
-            reward_to_shortfall = ann_return * 100 - mean_shortfall * 100
-        else:
-            mean_shortfall = np.nan
-            reward_to_shortfall = np.nan
-
+        row = metrics.loc[label]
         results.append([
             label,
-            round(ann_return * 100, 2),
-            round(ann_std * 100, 2),
-            round(sharpe, 2),
-            round(sortino, 2) if not np.isnan(sortino) else None,
-            round(max_dd * 100, 2),
-            round(reward_to_shortfall, 2),
+            round(row['Annual Return (%)'], 2),
+            round(row['Volatility (%)'], 2),
+            round(row['Sharpe'], 2),
+            round(row['Sortino'], 2) if not np.isnan(row['Sortino']) else None,
+            round(row['Max Drawdown (%)'], 2),
+            round(row['Reward to Shortfall'], 2),
             unique_custom, unique_sharpe, overlap, overlap_count
         ])
 
@@ -121,3 +106,38 @@ def quantitative_etf_basket_comparison(
         'Max Drawdown (%)', 'Reward to Shortfall',
         'Unique Custom ETFs', 'Unique Sharpe ETFs', 'Overlapping ETFs', 'Overlap Count'
     ]).set_index('method')
+
+
+def backtest_profile(user, valid_tickers, data, risk_free_data, end_date, test_period=TESTING_PERIOD):
+    """
+    Back-tests a user profile's recommendations over the testing period.
+
+    The recommendations are re-run on the data before the testing period, and
+    the custom and Sharpe baskets are then compared over it.
+
+    Args:
+        user (list): The user's answers, indexed by the USER_* constants.
+        valid_tickers (list): A list of all available ETF tickers.
+        data (PricePanel or pd.DataFrame): The historical price data for all ETFs.
+        risk_free_data (pd.DataFrame): The daily risk-free rates.
+        end_date (pd.Timestamp): The end of the testing period.
+        test_period (int, optional): The length of the testing period, in years.
+
+    Returns:
+        tuple: A tuple containing:
+            - custom_tickers (list): The custom-recommended tickers.
+            - sharpe_tickers (list): The Sharpe-recommended tickers.
+            - comparison (pd.DataFrame): Their performance, see
+              `quantitative_etf_basket_comparison`.
+    """
+    with span('recommendation_test'):
+        custom_tickers, sharpe_tickers = recommendation_test(
+            user[USER_TIME_HORIZON], user[USER_DESIRED_GROWTH], user[USER_FLUCTUATION],
+            user[USER_WORST_CASE], user[USER_MINIMUM_ETF_AGE], user[USER_RISK_PREFERENCE],
+            valid_tickers, data, test_period)
+    with span('backtest'):
+        comparison = quantitative_etf_basket_comparison(
+            data, custom_tickers, sharpe_tickers, user[USER_DESIRED_GROWTH],
+            user[USER_FLUCTUATION], end_date - pd.DateOffset(years=test_period), end_date,
+            risk_free_data['yield_pct'].mean() / 100)
+    return custom_tickers, sharpe_tickers, comparison
@@ -0,0 +1,223 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.constants import (
+    TESTING_PERIOD, RECOMMENDATION_COUNT, TOP_RANGE_RECOMMENDATIONS
+)
+import itertools
+from concurrent.futures import Future, ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from core.cache import normalize_as_of
+from core.data_processing.price_panel import as_price_panel
+from core.data_processing.shared_panel import SharedPricePanel, attach_price_panel
+from core.data_processing.Etf_Data import get_etf_metrics_batch
+from core.analysis.max_drawdown import compute_drawdown_table, filter_drawdown_table
+from core.scoring.scoring_engine import rank_profiles
+
+
+def plan_profile_sweep(time_horizons, max_drawdowns, min_etf_ages, risk_preferences, end_date,
+                       test_period=TESTING_PERIOD):
+    """
+    Finds the distinct computations behind a sweep of user profiles.
+
+    The desired growth and fluctuation answers do not change the
+    recommendations, and every profile sharing a (horizon, drawdown, age)
+    prefix shares its drawdown filter, metrics and Sharpe ranking, so the sweep
+    only has to compute:
+        - one drawdown table per as-of date,
+        - one metrics table per (as-of date, horizon),
+        - one scoring task per horizon, which ranks every (drawdown, age,
+          risk preference) profile of the horizon in one batch.
+
+    Args:
+        time_horizons (list): The time horizons of the sweep, in years.
+        max_drawdowns (list): The maximum drawdowns of the sweep.
+        min_etf_ages (list): The minimum ETF ages of the sweep, in years.
+        risk_preferences (list): The risk preferences of the sweep.
+        end_date (pd.Timestamp): The as-of date of the full-time recommendations.
+        test_period (int, optional): The length of the back-testing period, in years.
+
+    Returns:
+        dict: The plan, with the following entries:
+            - 'full_end', 'train_end' (pd.Timestamp): The normalized as-of dates.
+            - 'test_period' (int): The length of the back-testing period.
+            - 'metrics' (list): (as_of, horizon) pairs to compute metrics for.
+            - 'scores' (list): (horizon, max_drawdown, min_etf_age) scoring tasks.
+            - 'risk_preferences' (list): The risk preferences every task ranks.
+    """
+    full_end = normalize_as_of(end_date)
+    train_end = normalize_as_of(end_date - pd.DateOffset(years=test_period))
+    metrics = ([(full_end, h + test_period) for h in time_horizons]
+               + [(train_end, h) for h in time_horizons])
+    return {
+        'full_end': full_end,
+        'train_end': train_end,
+        'test_period': test_period,
+        'metrics': list(dict.fromkeys(metrics)),
+        'scores': list(itertools.product(time_horizons, max_drawdowns, min_etf_ages)),
+        'risk_preferences': [list(r) for r in risk_preferences],
+    }
+
+
+def _rank_profiles(full_metrics, full_horizon, full_masks, train_metrics, train_horizon, train_masks,
+                   risk_free_data, risk_preferences):
+    """
+    Ranks the full-time and test-period recommendations of every (drawdown,
+    age) mask of one horizon for every risk preference, matching
+    `generate_all_user_tests` and `recommendation_test` one profile at a time.
+    Each ranking is one `rank_profiles` call over all the profiles.
+    """
+    depth = max(RECOMMENDATION_COUNT, TOP_RANGE_RECOMMENDATIONS)
+    n_preferences = len(risk_preferences)
+    preferences = np.tile(np.array(risk_preferences, dtype='float64').reshape(-1, 2), (len(full_masks), 1))
+    full_tickers = full_metrics['Ticker'].to_numpy()
+    train_tickers = train_metrics['Ticker'].to_numpy()
+
+    def tickers(names, ranking, amount):
+        ranking = ranking[:amount]
+        return names[ranking[ranking >= 0]].tolist()
+
+    full_sharpe = rank_profiles(full_metrics, full_horizon, risk_free_data, full_masks, depth, method='Sharpe')
+    test_sharpe = rank_profiles(train_metrics, train_horizon, risk_free_data, train_masks,
+                                RECOMMENDATION_COUNT, method='Sharpe')
+    full_custom = rank_profiles(full_metrics, full_horizon, risk_free_data,
+                                np.repeat(full_masks, n_preferences, axis=0), depth, preferences,
+                                method='Custom_Utility_Score')
+    test_custom = rank_profiles(train_metrics, train_horizon, risk_free_data,
+                                np.repeat(train_masks, n_preferences, axis=0), RECOMMENDATION_COUNT,
+                                preferences, method='Custom_Utility_Score')
+
+    results = []
+    for m in range(len(full_masks)):
+        full_sharpe_list = tickers(full_tickers, full_sharpe[m], RECOMMENDATION_COUNT)
+        full_sharpe_top_range = tickers(full_tickers, full_sharpe[m], TOP_RANGE_RECOMMENDATIONS)
+        test_sharpe_list = tickers(train_tickers, test_sharpe[m], RECOMMENDATION_COUNT)
+        mask_results = []
+        for r in range(m * n_preferences, (m + 1) * n_preferences):
+            mask_results.append({
+                'full_custom': tickers(full_tickers, full_custom[r], RECOMMENDATION_COUNT),
+                'full_sharpe': full_sharpe_list,
+                'full_custom_top_range': tickers(full_tickers, full_custom[r], TOP_RANGE_RECOMMENDATIONS),
+                'full_sharpe_top_range': full_sharpe_top_range,
+                'test_custom': tickers(train_tickers, test_custom[r], RECOMMENDATION_COUNT),
+                'test_sharpe': test_sharpe_list,
+            })
+        results.append(mask_results)
+    return results
+
+
+# State of a sweep worker process, set once by `_init_worker`
+_worker = {}
+
+
+def _init_worker(panel, valid_tickers, risk_free_data):
+    _worker['panel'] = attach_price_panel(panel) if isinstance(panel, dict) else panel
+    _worker['valid_tickers'] = valid_tickers
+    _worker['risk_free_data'] = risk_free_data
+
+
+def _metrics_task(as_of, horizon):
+    return get_etf_metrics_batch(_worker['valid_tickers'], [horizon], _worker['panel'], as_of)
+
+
+def _drawdown_task(as_of):
+    return compute_drawdown_table(_worker['panel'], as_of)
+
+
+def _score_task(full_metrics, full_horizon, full_masks, train_metrics, train_horizon, train_masks,
+                risk_preferences):
+    try:
+        return _rank_profiles(full_metrics, full_horizon, full_masks, train_metrics, train_horizon,
+                              train_masks, _worker['risk_free_data'], risk_preferences)
+    except Exception as e:
+        return e
+
+
+class _InlineExecutor:
+    """Runs sweep tasks in the calling process, for single-worker sweeps."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def run_profile_sweep(plan, valid_tickers, data, risk_free_data, workers=None):
+    """
+    Computes the recommendations of every distinct profile in a sweep plan.
+
+    The price matrix is published once in shared memory and a process pool
+    attached to it computes the metrics and drawdown tables, then scores the
+    profiles of each horizon in one batch. Work scales with the number of distinct
+    inputs in the plan rather than with the size of the profile product.
+
+    Args:
+        plan (dict): The plan returned by `plan_profile_sweep`.
+        valid_tickers (list): A list of all available ETF tickers.
+        data (PricePanel or pd.DataFrame): The historical price data for all ETFs.
+        risk_free_data (pd.DataFrame): The daily risk-free rates.
+        workers (int, optional): Number of worker processes. Defaults to the
+                                 number of CPUs; 1 runs the sweep in-process.
+
+    Returns:
+        dict: Mapping from (horizon, max_drawdown, min_etf_age, tuple(risk_preference))
+              to a dict of ticker lists ('full_custom', 'full_sharpe',
+              'full_custom_top_range', 'full_sharpe_top_range', 'test_custom',
+              'test_sharpe'), or to the exception raised while scoring it.
+    """
+    panel = as_price_panel(data)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        _init_worker(panel, valid_tickers, risk_free_data)
+        return _run_plan(plan, _InlineExecutor())
+
+    with SharedPricePanel(panel) as shared, ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=(shared.handle, valid_tickers, risk_free_data)) as executor:
+        return _run_plan(plan, executor)
+
+
+def _run_plan(plan, executor):
+    full_end, train_end, test_period = plan['full_end'], plan['train_end'], plan['test_period']
+
+    metrics_futures = {key: executor.submit(_metrics_task, *key) for key in plan['metrics']}
+    drawdown_futures = {as_of: executor.submit(_drawdown_task, as_of) for as_of in (full_end, train_end)}
+    metrics = {key: future.result() for key, future in metrics_futures.items()}
+    drawdowns = {as_of: future.result() for as_of, future in drawdown_futures.items()}
+
+    filters = {}
+
+    def candidates(as_of, max_drawdown, min_etf_age):
+        key = (as_of, max_drawdown, min_etf_age)
+        if key not in filters:
+            filters[key] = filter_drawdown_table(drawdowns[as_of], max_drawdown, min_etf_age)
+        return filters[key]
+
+    prefixes = {}
+    for horizon, max_drawdown, min_etf_age in plan['scores']:
+        prefixes.setdefault(horizon, []).append((max_drawdown, min_etf_age))
+
+    score_futures = {}
+    for horizon, filters_of_horizon in prefixes.items():
+        full_metrics = metrics[(full_end, horizon + test_period)]
+        train_metrics = metrics[(train_end, horizon)]
+        full_masks = np.array([
+            full_metrics['Ticker'].isin(candidates(full_end, max_drawdown, min_etf_age + test_period)).to_numpy()
+            for max_drawdown, min_etf_age in filters_of_horizon]).reshape(len(filters_of_horizon), -1)
+        train_masks = np.array([
+            train_metrics['Ticker'].isin(candidates(train_end, max_drawdown, min_etf_age)).to_numpy()
+            for max_drawdown, min_etf_age in filters_of_horizon]).reshape(len(filters_of_horizon), -1)
+        score_futures[horizon] = executor.submit(
+            _score_task, full_metrics, horizon + test_period, full_masks, train_metrics, horizon,
+            train_masks, plan['risk_preferences'])
+
+    results = {}
+    for horizon, future in score_futures.items():
+        ranked = future.result()
+        for m, (max_drawdown, min_etf_age) in enumerate(prefixes[horizon]):
+            for i, risk_preference in enumerate(plan['risk_preferences']):
+                key = (horizon, max_drawdown, min_etf_age, tuple(risk_preference))
+                results[key] = ranked if isinstance(ranked, Exception) else ranked[m][i]
+    return results
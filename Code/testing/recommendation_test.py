@@ -4,20 +4,20 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.constants import (
     RECOMMENDATION_COUNT
 )
-from core.scoring.sharpe_recommendation import sharpe_score
-from core.scoring.custom_score import utility_score
-from core.scoring.etf_recommendation_evaluation import top_recommend
+from core.scoring.scoring_engine import rank_etfs
 from core.data_processing.risk_free_rates import fetch_risk_free_boc
-from visualization.visualizing_etf_metrics import plot_risk_return_user
 from core.data_processing.Etf_Data import get_etf_data, filter_etf_data
 from core.analysis.max_drawdown import calculate_max_drawdown
+from core.data_processing.price_panel import as_price_panel
+from core.tracing import span
 from datetime import datetime
 import pandas as pd
 
 
 def recommendation_test(
     time_horizon, desired_growth, std_deviation, max_drawdown,
-    minimum_etf_age, risk_preference, valid_tickers, data, test_period
+    minimum_etf_age, risk_preference, valid_tickers, data, test_period,
+    train_metrics=None
 ):
     """
     Generates ETF recommendations based on a training period and returns
@@ -37,8 +37,12 @@ def recommendation_test(
         risk_preference (list): A list containing the risk and return
                                 preference weights, e.g., [risk_weight, return_weight].
         valid_tickers (list): A list of all available ETF tickers.
-        data (pd.DataFrame): A DataFrame containing the historical price data for all ETFs.
+        data (PricePanel or pd.DataFrame): The historical price data for all ETFs.
         test_period (int): The length of the back-testing period, in years.
+        train_metrics (pd.DataFrame, optional): The output of `get_etf_metrics_batch`
+                                for all tickers at the training cut-off, covering
+                                `time_horizon`. Avoids recomputing the metrics
+                                when the test runs for many profiles.
 
     Returns:
         tuple: A tuple containing two lists of strings:
@@ -49,29 +53,23 @@ def recommendation_test(
     """
     today = pd.Timestamp(datetime.now())
     train_end = today - pd.DateOffset(years=test_period)
+    data = as_price_panel(data)
 
-    md_tolerable_list = calculate_max_drawdown(max_drawdown, minimum_etf_age, valid_tickers, data, train_end)
-    etf_metrics = get_etf_data(md_tolerable_list, time_horizon, data, train_end)
-    risk_free_data = fetch_risk_free_boc("1995-01-01")
+    with span('drawdown_filter', rows=len(valid_tickers)):
+        md_tolerable_list = calculate_max_drawdown(max_drawdown, minimum_etf_age, valid_tickers, data, train_end)
+    with span('metrics', rows=len(md_tolerable_list)):
+        if train_metrics is None:
+            etf_metrics = get_etf_data(md_tolerable_list, time_horizon, data, train_end)
+        else:
+            etf_metrics = train_metrics[train_metrics['Ticker'].isin(md_tolerable_list)].reset_index(drop=True)
+    with span('risk_free_fetch') as stage:
+        risk_free_data = fetch_risk_free_boc("1995-01-01")
+        stage.rows = len(risk_free_data)
 
-    etf_utility_calculation = utility_score(
-        etf_metrics, time_horizon, risk_free_data, risk_preference)
-
-    if 'Utility_Score' in etf_utility_calculation.columns:
-        custom_clean = etf_utility_calculation.dropna(subset=['Utility_Score'])
-        custom_recommended_list = top_recommend(custom_clean, 'Utility_Score', RECOMMENDATION_COUNT)[
-            'Ticker'].tolist() if not custom_clean.empty else []
-    else:
-        custom_recommended_list = []
-
-    sharpe_scoring_calculation = sharpe_score(
-        etf_metrics, time_horizon, risk_free_data)
-
-    if 'Sharpe' in sharpe_scoring_calculation.columns:
-        sharpe_clean = sharpe_scoring_calculation.dropna(subset=['Sharpe'])
-        sharpe_recommended_list = top_recommend(sharpe_clean, 'Sharpe', RECOMMENDATION_COUNT)[
-            'Ticker'].tolist() if not sharpe_clean.empty else []
-    else:
-        sharpe_recommended_list = []
+    with span('scoring', rows=len(etf_metrics)):
+        ranked = rank_etfs(etf_metrics, time_horizon, risk_free_data, RECOMMENDATION_COUNT,
+                           risk_preference, methods=['Custom_Utility_Score', 'Sharpe'])
+        custom_recommended_list = ranked['Custom_Utility_Score']['Ticker'].tolist()
+        sharpe_recommended_list = ranked['Sharpe']['Ticker'].tolist()
 
     return custom_recommended_list, sharpe_recommended_list
@@ -7,14 +7,9 @@ from config.constants import (
 import itertools
 import pandas as pd
 from datetime import datetime
-from core.data_processing.ishares_ETF_list import download_valid_data
-from core.analysis.max_drawdown import calculate_max_drawdown
-from core.data_processing.Etf_Data import get_etf_data
+from core.data_processing.ishares_ETF_list import download_price_panel
 from core.data_processing.risk_free_rates import fetch_risk_free_boc
-from core.scoring.etf_recommendation_evaluation import top_recommend
-from core.scoring.custom_score import utility_score
-from testing.recommendation_test import recommendation_test
-from core.scoring.sharpe_recommendation import sharpe_score
+from testing.profile_sweep import plan_profile_sweep, run_profile_sweep
 
 # Constants for index access
 USER_TIME_HORIZON = 0
@@ -51,7 +46,7 @@ def generate_all_user_tests():
     """
 
 
-    valid_tickers, data = download_valid_data()
+    valid_tickers, data = download_price_panel()
     end_date = pd.Timestamp(datetime.now())
 
     time_horizons = [1, 8, 25]
@@ -61,6 +56,11 @@ def generate_all_user_tests():
     min_etf_ages = [0, 3, 10]
     risk_preferences = [[3, 1], [1, 1], [1, 3]]
 
+    # Plan the distinct drawdown, metrics and scoring work once, then compute it in parallel
+    plan = plan_profile_sweep(time_horizons, max_drawdowns, min_etf_ages, risk_preferences, end_date)
+    risk_free_data = fetch_risk_free_boc("1995-01-01")
+    results = run_profile_sweep(plan, valid_tickers, data, risk_free_data)
+
     rows = []
 
     for combo in itertools.product(time_horizons, growths, stds, max_drawdowns, min_etf_ages, risk_preferences):
@@ -68,38 +68,24 @@ def generate_all_user_tests():
         print(f"Processing combo: {combo}")
 
         try:
-            # Full-time recommendations - direct calc method
-            md_tolerable_list = calculate_max_drawdown(
-                user[USER_WORST_CASE], user[USER_MINIMUM_ETF_AGE] + TESTING_PERIOD, valid_tickers, data, end_date
-            )
-            etf_metrics_full_time = get_etf_data(md_tolerable_list, user[USER_TIME_HORIZON] + TESTING_PERIOD, data, end_date)
-            risk_free_data = fetch_risk_free_boc("1995-01-01")
-
-            utility_scores = utility_score(etf_metrics_full_time, user[USER_TIME_HORIZON] + TESTING_PERIOD, risk_free_data, user[USER_RISK_PREFERENCE])
-            sharpe_scores = sharpe_score(etf_metrics_full_time, user[USER_TIME_HORIZON] + TESTING_PERIOD, risk_free_data)
-
-            # Get top RECOMMENDATION_COUNT (e.g., 5) recommendations for full-time
-            full_time_custom_df = top_recommend(utility_scores, 'Utility_Score', RECOMMENDATION_COUNT)
-            full_time_sharpe_df = top_recommend(sharpe_scores, 'Sharpe', RECOMMENDATION_COUNT)
-            full_time_custom_list = full_time_custom_df['Ticker'].tolist()
-            full_time_sharpe_list = full_time_sharpe_df['Ticker'].tolist()
-
-            # Get TOP_RANGE_RECOMMENDATIONS (e.g., 15) recommendations for full-time for comparison
-            full_time_custom_top_range_df = top_recommend(utility_scores, 'Utility_Score', TOP_RANGE_RECOMMENDATIONS)
-            full_time_sharpe_top_range_df = top_recommend(sharpe_scores, 'Sharpe', TOP_RANGE_RECOMMENDATIONS)
-            full_time_custom_top_range_list = full_time_custom_top_range_df['Ticker'].tolist()
-            full_time_sharpe_top_range_list = full_time_sharpe_top_range_df['Ticker'].tolist()
+            result = results[(user[USER_TIME_HORIZON], user[USER_WORST_CASE],
+                              user[USER_MINIMUM_ETF_AGE], tuple(user[USER_RISK_PREFERENCE]))]
+            if isinstance(result, Exception):
+                raise result
+
+            # Full-time top RECOMMENDATION_COUNT (e.g., 5) and TOP_RANGE_RECOMMENDATIONS (e.g., 15) recommendations
+            full_time_custom_list = result['full_custom']
+            full_time_sharpe_list = result['full_sharpe']
+            full_time_custom_top_range_list = result['full_custom_top_range']
+            full_time_sharpe_top_range_list = result['full_sharpe_top_range']
 
             if not full_time_custom_list or not full_time_sharpe_list:
                 print(f"Skipping combo {combo} due to empty full-time recommendations.")
                 continue
 
-            # Test period recommendations via recommendation_test
-            custom_list, sharpe_list = recommendation_test(
-                user[USER_TIME_HORIZON], user[USER_DESIRED_GROWTH], user[USER_FLUCTUATION],
-                user[USER_WORST_CASE], user[USER_MINIMUM_ETF_AGE], user[USER_RISK_PREFERENCE],
-                valid_tickers, data, TESTING_PERIOD
-            )
+            # Test period recommendations, as returned by recommendation_test
+            custom_list = result['test_custom']
+            sharpe_list = result['test_sharpe']
 
             if not custom_list or not sharpe_list:
                 print(f"Skipping combo {combo} due to empty test period recommendations.")
@@ -0,0 +1,262 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from config.constants import (
+    TESTING_PERIOD, RECOMMENDATION_COUNT,
+    USER_TIME_HORIZON, USER_WORST_CASE, USER_MINIMUM_ETF_AGE, USER_RISK_PREFERENCE
+)
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from core.cache import normalize_as_of
+from core.data_processing.price_panel import as_price_panel
+from core.data_processing.shared_panel import SharedPricePanel, attach_price_panel
+from core.analysis.window_stats import window_stats
+from core.analysis.rate_index import rate_index
+from core.analysis.portfolio_simulator import basket_weights, simulate_portfolios, portfolio_metrics
+from core.analysis.max_drawdown import build_drawdown_table
+from core.scoring.scoring_engine import rank_profiles
+
+TEST_METRICS = ['test_return', 'test_volatility', 'test_sharpe', 'test_sortino', 'test_max_drawdown']
+SIMULATOR_METRICS = ['Annual Return (%)', 'Volatility (%)', 'Sharpe', 'Sortino', 'Max Drawdown (%)']
+
+
+def walk_forward_cutoffs(data, start=None, end=None, freq='QS', test_period=TESTING_PERIOD):
+    """
+    Lists the training cut-off dates of a walk-forward backtest.
+
+    Args:
+        data (PricePanel or pd.DataFrame): The historical price data for all ETFs.
+        start (pd.Timestamp, optional): The first cut-off. Defaults to one year
+                                        after the first price.
+        end (pd.Timestamp, optional): The last date with prices to test on.
+                                      Defaults to the last price. The last
+                                      cut-off leaves a full `test_period` before it.
+        freq (str, optional): Pandas frequency of the cut-offs, e.g. 'MS' for
+                              monthly or 'QS' for quarterly. Defaults to 'QS'.
+        test_period (int, optional): The length of each test period, in years.
+
+    Returns:
+        list: The cut-off dates, normalized to trading days.
+    """
+    panel = as_price_panel(data)
+    if start is None:
+        start = panel.dates[0] + pd.DateOffset(years=1)
+    if end is None:
+        end = panel.dates[-1]
+    last_cutoff = pd.Timestamp(end) - pd.DateOffset(years=test_period)
+    return list(dict.fromkeys(normalize_as_of(date) for date in pd.date_range(start, last_cutoff, freq=freq)))
+
+
+def walk_forward(valid_tickers, data, risk_free_data, profiles, cutoffs, test_period=TESTING_PERIOD,
+                 count=RECOMMENDATION_COUNT, rebalance='daily', transaction_cost=0.0, workers=None):
+    """
+    Evaluates the utility and Sharpe recommendations over many training cut-offs.
+
+    At every cut-off, both scorers pick their baskets with the same filters
+    and scores as `recommendation_test`, but using only information available
+    then: prices up to the cut-off, the risk-free rates up to the cut-off, and
+    ETF ages measured from the cut-off. `recommendation_test` does not bound
+    its training metrics or its average rate at the start of the testing
+    period, so it also sees test-period data and its picks are not directly
+    comparable with these. Each basket is then held equally weighted over
+    the following `test_period` years, and all baskets of a cut-off are
+    simulated together with `simulate_portfolios`.
+
+    Training metrics come from the snapshot's `window_stats` prefix-sum index,
+    so every (cut-off, horizon) costs a few array lookups. Profiles sharing a
+    (horizon, drawdown, age) prefix share their filter and Sharpe ranking, and
+    all profiles of a horizon are ranked in one batch by `rank_profiles`.
+    Cut-offs are independent, so they are split across a process pool that
+    attaches to the price matrix in shared memory.
+
+    Args:
+        valid_tickers (list): A list of all available ETF tickers.
+        data (PricePanel or pd.DataFrame): The historical price data for all ETFs.
+        risk_free_data (pd.DataFrame): The daily risk-free rates.
+        profiles (list): User profiles, indexed by the USER_* constants. Only
+                         the horizon, worst case, ETF age and risk preference
+                         answers affect the recommendations.
+        cutoffs (list): The training cut-off dates, see `walk_forward_cutoffs`.
+        test_period (int, optional): The length of each test period, in years.
+        count (int, optional): The number of ETFs in each basket.
+        rebalance (str, optional): The rebalancing schedule of the test
+                                   baskets, see `simulate_portfolios`. Defaults
+                                   to 'daily', like `quantitative_etf_basket_comparison`.
+        transaction_cost (float, optional): Cost per unit of traded value.
+        workers (int, optional): Number of worker processes. Defaults to the
+                                 number of CPUs; 1 runs in-process.
+
+    Returns:
+        pd.DataFrame: One row per (cut-off, profile, method) with the columns
+                      'cutoff', 'time_horizon', 'max_drawdown', 'min_etf_age',
+                      'risk_preference', 'method' ('Custom' or 'Sharpe'),
+                      'tickers' and the out-of-sample metrics 'test_return' (%),
+                      'test_volatility' (%), 'test_sharpe', 'test_sortino' and
+                      'test_max_drawdown' (%).
+    """
+    panel = as_price_panel(data)
+    keys = {}
+    for profile in profiles:
+        prefix = (profile[USER_TIME_HORIZON], profile[USER_WORST_CASE], profile[USER_MINIMUM_ETF_AGE])
+        keys.setdefault(prefix, {})[tuple(profile[USER_RISK_PREFERENCE])] = list(profile[USER_RISK_PREFERENCE])
+    settings = (valid_tickers, risk_free_data, keys, test_period, count, rebalance, transaction_cost)
+    workers = min(workers or os.cpu_count() or 1, max(len(cutoffs), 1))
+
+    if workers == 1:
+        _init_worker(panel, settings)
+        rows = _cutoff_task(cutoffs)
+    else:
+        chunks = [list(chunk) for chunk in np.array_split(np.array(cutoffs, dtype=object), workers * 4)]
+        with SharedPricePanel(panel) as shared, ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker,
+                initargs=(shared.handle, settings)) as executor:
+            rows = list(itertools.chain.from_iterable(executor.map(_cutoff_task, chunks)))
+
+    return pd.DataFrame(rows, columns=[
+        'cutoff', 'time_horizon', 'max_drawdown', 'min_etf_age', 'risk_preference',
+        'method', 'tickers'] + TEST_METRICS)
+
+
+# State of a walk-forward worker process, set once by `_init_worker`
+_worker = {}
+
+
+def _init_worker(panel, settings):
+    panel = attach_price_panel(panel) if isinstance(panel, dict) else panel
+    _worker['panel'] = panel
+    _worker['stats'] = window_stats(panel)
+    _worker['settings'] = settings
+
+
+def _cutoff_task(cutoffs):
+    """
+    Evaluates both scorers at a list of cut-offs, returning the rows of `walk_forward`.
+    """
+    panel, stats = _worker['panel'], _worker['stats']
+    valid_tickers, risk_free_data, keys, test_period, count, rebalance, transaction_cost = _worker['settings']
+    columns = np.array([panel.columns[ticker] for ticker in valid_tickers])
+    tickers = np.array(valid_tickers, dtype=object)
+    horizons = sorted({prefix[0] for prefix in keys})
+    rates = rate_index(risk_free_data)
+
+    rows = []
+    for cutoff in cutoffs:
+        cutoff = normalize_as_of(cutoff)
+        test_end = cutoff + pd.DateOffset(years=test_period)
+        test_rate = rates.average(cutoff, test_end) / 100
+        # The rates known at the cut-off end at its last observation
+        known = np.searchsorted(rates.dates, np.datetime64(cutoff), 'right')
+        if known == 0:
+            continue
+        rates_end = rates.dates[known - 1]
+
+        # One-off dates, kept out of the shared drawdown cache
+        drawdowns = build_drawdown_table(panel, cutoff).reindex(valid_tickers)
+        metrics = {}
+        for horizon in horizons:
+            growth, std = stats.window_metrics(cutoff - pd.DateOffset(years=horizon), cutoff)
+            metrics[horizon] = pd.DataFrame({
+                'Ticker': valid_tickers,
+                f'Annual_Growth_{horizon}Y': growth[columns],
+                f'Standard_Deviation_{horizon}Y': std[columns],
+            })
+
+        # Every profile of a horizon is ranked in one batch, Sharpe once per filter
+        rankings = {}
+        for horizon in horizons:
+            prefixes = [prefix for prefix in keys if prefix[0] == horizon]
+            masks = np.array([
+                ((drawdowns['Max_Drawdown'] >= -max_drawdown) &
+                 (drawdowns['Inception_Date'] < cutoff - pd.DateOffset(years=min_etf_age))).to_numpy()
+                for _, max_drawdown, min_etf_age in prefixes]).reshape(len(prefixes), -1)
+            preferences = [list(keys[prefix].values()) for prefix in prefixes]
+            avg_risk_free = rates.horizon_average(horizon, rates_end)
+            sharpe = rank_profiles(metrics[horizon], horizon, None, masks, count, method='Sharpe',
+                                   avg_risk_free=avg_risk_free)
+            custom = rank_profiles(
+                metrics[horizon], horizon, None,
+                np.repeat(masks, [len(p) for p in preferences], axis=0), count,
+                [risk_preference for p in preferences for risk_preference in p], method='Custom_Utility_Score',
+                avg_risk_free=avg_risk_free)
+            rows_of = np.cumsum([0] + [len(p) for p in preferences])
+            for m, prefix in enumerate(prefixes):
+                rankings[prefix] = (sharpe[m], custom[rows_of[m]:rows_of[m + 1]])
+
+        picks, baskets = [], {}
+        for (horizon, max_drawdown, min_etf_age), risk_preferences in keys.items():
+            sharpe, custom = rankings[(horizon, max_drawdown, min_etf_age)]
+            sharpe_basket = tuple(tickers[sharpe[sharpe >= 0]])
+            for ranking, risk_preference in zip(custom, risk_preferences.values()):
+                custom_basket = tuple(tickers[ranking[ranking >= 0]])
+                profile = [cutoff, horizon, max_drawdown, min_etf_age, risk_preference]
+                picks.append((profile + ['Custom'], custom_basket))
+                picks.append((profile + ['Sharpe'], sharpe_basket))
+                baskets.setdefault(custom_basket, len(baskets))
+                baskets.setdefault(sharpe_basket, len(baskets))
+
+        # Every distinct basket of the cut-off is simulated in one pass
+        test_returns = simulate_portfolios(
+            panel, basket_weights(panel, list(baskets)), cutoff, test_end, rebalance, transaction_cost)
+        test_metrics = portfolio_metrics(test_returns, test_rate)[SIMULATOR_METRICS].to_numpy()
+        for row, basket in picks:
+            rows.append(row + [', '.join(basket)] + test_metrics[baskets[basket]].tolist())
+
+    return rows
+
+
+def summarize_walk_forward(results):
+    """
+    Summarizes the out-of-sample distribution of a walk-forward backtest.
+
+    Args:
+        results (pd.DataFrame): The output of `walk_forward`.
+
+    Returns:
+        tuple: A tuple containing two DataFrames:
+               - the distribution (count, mean, std, quantiles) of every test
+                 metric per method,
+               - the share of (cut-off, profile) pairs where the custom basket
+                 beat the Sharpe basket on each metric (a higher max drawdown,
+                 being less negative, is better), overall and per horizon.
+    """
+    distribution = results.groupby('method')[TEST_METRICS].describe(
+        percentiles=[0.05, 0.25, 0.5, 0.75, 0.95]).T
+
+    keys = ['cutoff', 'time_horizon', 'max_drawdown', 'min_etf_age']
+    paired = results.assign(risk_preference=results['risk_preference'].map(tuple)).pivot_table(
+        index=keys + ['risk_preference'], columns='method', values=TEST_METRICS, aggfunc='first')
+    wins = {}
+    for metric in TEST_METRICS:
+        custom, sharpe = paired[(metric, 'Custom')], paired[(metric, 'Sharpe')]
+        # Lower volatility is better, every other metric is better higher
+        beat = custom < sharpe if metric == 'test_volatility' else custom > sharpe
+        wins[metric] = beat.where(custom.notna() & sharpe.notna())
+    wins = pd.DataFrame(wins)
+    win_rate = pd.concat([
+        wins.mean().to_frame('all').T,
+        wins.groupby(level='time_horizon').mean().rename(index=lambda h: f'{h}Y'),
+    ])
+    return distribution, win_rate
+
+
+if __name__ == "__main__":
+    import time
+    from core.data_processing.ishares_ETF_list import download_price_panel
+    from core.data_processing.risk_free_rates import fetch_risk_free_boc
+
+    valid_tickers, data = download_price_panel()
+    risk_free_data = fetch_risk_free_boc("1995-01-01")
+    profiles = [[h, None, None, d, a, r] for h, d, a, r in itertools.product(
+        [1, 8, 25], [15, 25, 35, 45, 100], [0, 3, 10], [[3, 1], [1, 1], [1, 3]])]
+    cutoffs = walk_forward_cutoffs(data, freq='QS')
+
+    started = time.time()
+    results = walk_forward(valid_tickers, data, risk_free_data, profiles, cutoffs)
+    print(f"Evaluated {len(cutoffs)} cut-offs x {len(profiles)} profiles in {time.time() - started:.1f}s")
+
+    distribution, win_rate = summarize_walk_forward(results)
+    print(distribution.round(2).to_string())
+    print(win_rate.round(3).to_string())
+    results.to_csv('walk_forward_results.csv', index=False)
@@ -1,5 +1,6 @@
 import matplotlib.pyplot as plt
 import pandas as pd
+from core.data_processing.price_panel import as_price_panel
 from datetime import datetime
 from matplotlib.lines import Line2D
 
@@ -19,10 +20,10 @@ def plot_etf_performance_with_user_preferences(
     custom legend are also included to provide a comprehensive overview.
 
     Args:
-        data (pd.DataFrame): A DataFrame containing the historical "Adjusted Close"
-            price data for all relevant ETFs. The DataFrame is expected to have a
-            MultiIndex column structure where the first level is the ticker and the
-            second is the price type (e.g., 'Adj Close').
+        data (PricePanel or pd.DataFrame): The historical "Adjusted Close" price
+            data for all relevant ETFs, either as a price panel or as a DataFrame
+            with a MultiIndex column structure where the first level is the ticker
+            and the second is the price type (e.g., 'Adj Close').
         custom_tickers (list): A list of ETF ticker symbols recommended by the
             custom utility scoring algorithm.
         sharpe_tickers (list): A list of ETF ticker symbols recommended by the
@@ -50,6 +51,7 @@ def plot_etf_performance_with_user_preferences(
     test_start = train_end
     test_end = today
 
+    panel = as_price_panel(data)
     plt.figure(figsize=(12, 8))
 
     # Colors assigned per your legend request with purple for overlap
@@ -78,14 +80,10 @@ def plot_etf_performance_with_user_preferences(
             color = color_sharpe
 
         # Get price series
-        try:
-            price_series = data[(ticker, 'Adj Close')].dropna()
-        except Exception:
-            try:
-                price_series = data[ticker].dropna()
-            except Exception:
-                print(f"[⚠] Missing price data for {ticker}, skipping.")
-                continue
+        if ticker not in panel:
+            print(f"[⚠] Missing price data for {ticker}, skipping.")
+            continue
+        price_series = panel.series(ticker)
 
         # Training normalization (start at 100)
         train_prices = price_series.loc[train_start:train_end]
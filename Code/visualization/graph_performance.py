@@ -1,6 +1,8 @@
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 import pandas as pd
+from core.data_processing.price_panel import as_price_panel
+from core.analysis.rolling_regression import rolling_growth_rate
 import numpy as np
 
 def graph_annual_growth_rate(
@@ -26,8 +28,9 @@ def graph_annual_growth_rate(
     A summary of the user's profile is included on the plot for context.
 
     Args:
-        data (pd.DataFrame): DataFrame containing historical ETF price data, typically
-            with a MultiIndex for tickers and price types (e.g., 'Adj Close').
+        data (PricePanel or pd.DataFrame): Historical ETF price data, either as a
+            price panel or as a DataFrame with a MultiIndex for tickers and price
+            types (e.g., 'Adj Close').
         custom_recommend_list (list): A list of ETF ticker symbols recommended by the
             custom utility scoring algorithm.
         sharpe_recommend_list (list): A list of ETF ticker symbols recommended by the
@@ -51,6 +54,7 @@ def graph_annual_growth_rate(
     # Generate business day dates for x axis
     dates = pd.date_range(start=start_date, end=today, freq='B')
     
+    panel = as_price_panel(data)
     plt.figure(figsize=(14, 7))
 
     # Plot shaded std deviation area
@@ -59,6 +63,21 @@ def graph_annual_growth_rate(
 
     # Combine and determine colors for ETFs
     all_etfs = set(custom_recommend_list) | set(sharpe_recommend_list)
+
+    # Price series of every ETF restricted to date range, reindexed to business days, forward filled
+    prices = {}
+    for etf in all_etfs:
+        if etf not in panel:
+            print(f"[⚠] Missing price data for {etf}, skipping.")
+            continue
+        prices[etf] = panel.series(etf).loc[start_date:today].reindex(dates).ffill()
+    prices = pd.DataFrame(prices, index=dates)
+
+    # Rolling annual growth rate (year-over-year slope of log prices) of all ETFs in one pass,
+    # using 252 trading days = 1 year approx
+    window = 252
+    annual_growth_rates = rolling_growth_rate(prices, window=window)
+
     used_labels = set()
     for etf in all_etfs:
         if etf in custom_recommend_list and etf in sharpe_recommend_list:
@@ -77,34 +96,14 @@ def graph_annual_growth_rate(
         else:
             used_labels.add(label)
 
-        # Get price series for ETF, adjust close
-        try:
-            price_series = data[(etf, 'Adj Close')].dropna()
-        except Exception:
-            try:
-                price_series = data[etf].dropna()
-            except Exception:
-                print(f"[⚠] Missing price data for {etf}, skipping.")
-                continue
-
-        # Restrict to date range and reindex to business days, forward fill missing
-        price_series = price_series.loc[start_date:today].reindex(dates).ffill()
+        if etf not in annual_growth_rates:
+            continue
 
-        if len(price_series) < 252:  # less than approx 1 year trading days
+        if len(dates) < window:  # less than approx 1 year trading days
             print(f"[!] Not enough data for {etf}, skipping.")
             continue
 
-        # Calculate rolling annual growth rate (year-over-year slope)
-        # Using 252 trading days = 1 year approx
-        window = 252
-        log_prices = np.log(price_series)
-        rolling_slope = (
-            log_prices.rolling(window=window)
-            .apply(lambda x: np.polyfit(range(len(x)), x, 1)[0] * 252, raw=True)
-        )
-
-        # Convert slope of log price to annual growth % (exp(slope) - 1)*100
-        annual_growth_rate = (np.exp(rolling_slope) - 1) * 100
+        annual_growth_rate = annual_growth_rates[etf]
         if not annual_growth_rate.empty:
             latest_growth = annual_growth_rate.iloc[-1]
             print(f"{etf}: {latest_growth:.2f}% annual growth")
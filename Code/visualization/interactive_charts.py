@@ -0,0 +1,154 @@
+import pandas as pd
+import plotly.graph_objects as go
+from datetime import datetime
+from core.data_processing.price_panel import as_price_panel
+
+# Colors of the recommendation groups, as in `plot_risk_return_user`
+SELECTION_COLORS = {
+    'Sharpe Only': 'blue',
+    'Utility Only': 'orange',
+    'Both': 'purple',
+    'Not Selected': 'grey',
+}
+
+
+def create_etf_performance_chart(etf_recommend_df, data, time_horizon, chart_title):
+    """
+    Create a simple interactive line chart showing ETF performance over time
+    """
+    # Get the recommended ETF tickers
+    etf_tickers = etf_recommend_df['Ticker'].tolist()
+
+    # Calculate start and end dates
+    end_date = pd.Timestamp(datetime.now())
+    start_date = end_date - pd.DateOffset(years=time_horizon)
+
+    # Create the plotly figure
+    fig = go.Figure()
+    panel = as_price_panel(data)
+    growth_col = f'Annual_Growth_{time_horizon}Y'
+    std_col = f'Standard_Deviation_{time_horizon}Y'
+
+    for ticker in etf_tickers:
+        try:
+            # Skip ETFs with missing price data
+            if ticker not in panel:
+                continue
+            price_series = panel.series(ticker)
+
+            # Filter to the time horizon
+            period_prices = price_series.loc[start_date:end_date]
+            if period_prices.empty:
+                continue
+
+            # Normalize to start at 100 for better comparison
+            normalized_prices = 100 * period_prices / period_prices.iloc[0]
+
+            # Get metrics for this ETF
+            etf_metrics = etf_recommend_df[etf_recommend_df['Ticker']
+                                           == ticker].iloc[0]
+
+            # Hover text with only requested metrics; the date is filled in by plotly
+            hover_template = (
+                f"<b>{ticker}</b><br>" +
+                "Date: %{x|%Y-%m-%d}<br>" +
+                f"Annual Growth: {etf_metrics[growth_col]:.2f}%<br>" +
+                f"Standard Deviation: {etf_metrics[std_col]:.2f}%" +
+                "<extra></extra>"
+            )
+
+            # Add trace for this ETF
+            fig.add_trace(go.Scatter(
+                x=normalized_prices.index,
+                y=normalized_prices.values,
+                mode='lines',
+                name=ticker,
+                line=dict(width=2),
+                hovertemplate=hover_template
+            ))
+
+        except Exception as e:
+            # Skip ETFs that can't be processed
+            continue
+
+    # Simple layout
+    fig.update_layout(
+        title=chart_title,
+        xaxis_title="Date",
+        yaxis_title="Normalized Price",
+        hovermode='closest',
+        height=400
+    )
+
+    return fig
+
+
+def create_risk_return_chart(etf_metrics_df, time_horizon, sharpe_list, utility_list,
+                             user_growth, user_std, chart_title):
+    """
+    Creates an interactive risk-return scatter of ETFs around the user's target.
+
+    The interactive counterpart of `plot_risk_return_user`: every ETF is
+    placed by its standard deviation and annual growth, colored by the
+    recommendation methods that picked it, next to a marker for the user's
+    desired growth and acceptable fluctuation.
+
+    Args:
+        etf_metrics_df (pd.DataFrame): The metrics of the candidate ETFs, with
+                                       'Ticker', 'Annual_Growth_{h}Y' and
+                                       'Standard_Deviation_{h}Y' columns.
+        time_horizon (int): The horizon of the metrics, in years.
+        sharpe_list (list): The tickers recommended by the Sharpe ratio.
+        utility_list (list): The tickers recommended by the utility score.
+        user_growth (float): The user's desired annual growth, in percent.
+        user_std (float): The user's acceptable annual standard deviation, in percent.
+        chart_title (str): The title of the chart.
+
+    Returns:
+        go.Figure: The chart.
+    """
+    std_col = f'Standard_Deviation_{time_horizon}Y'
+    growth_col = f'Annual_Growth_{time_horizon}Y'
+    df_clean = etf_metrics_df.dropna(subset=[std_col, growth_col])
+
+    in_sharpe = df_clean['Ticker'].isin(set(sharpe_list))
+    in_utility = df_clean['Ticker'].isin(set(utility_list))
+    groups = {
+        'Not Selected': ~in_sharpe & ~in_utility,
+        'Sharpe Only': in_sharpe & ~in_utility,
+        'Utility Only': in_utility & ~in_sharpe,
+        'Both': in_sharpe & in_utility,
+    }
+
+    fig = go.Figure()
+    for label, selected in groups.items():
+        group = df_clean[selected.to_numpy()]
+        # One trace per group keeps thousands of points cheap to draw
+        fig.add_trace(go.Scattergl(
+            x=group[std_col],
+            y=group[growth_col],
+            mode='markers',
+            name=label,
+            marker=dict(color=SELECTION_COLORS[label], size=6 if label == 'Not Selected' else 11,
+                        opacity=0.35 if label == 'Not Selected' else 0.9),
+            text=group['Ticker'],
+            hovertemplate="<b>%{text}</b><br>Standard Deviation: %{x:.2f}%<br>"
+                          "Annual Growth: %{y:.2f}%<extra></extra>"
+        ))
+    fig.add_trace(go.Scatter(
+        x=[user_std],
+        y=[user_growth],
+        mode='markers',
+        name='Your Target',
+        marker=dict(color='red', size=16, symbol='star'),
+        hovertemplate="<b>Your Target</b><br>Fluctuation: %{x:.0f}%<br>Growth: %{y:.0f}%<extra></extra>"
+    ))
+
+    fig.update_layout(
+        title=chart_title,
+        xaxis_title="Standard Deviation (Risk %)",
+        yaxis_title="Annual Growth (%)",
+        hovermode='closest',
+        height=450
+    )
+    return fig
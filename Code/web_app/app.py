@@ -1,104 +1,94 @@
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core.data_processing.ishares_ETF_list import download_valid_data
+from core.cache import set_cache_backend
+from web_app.streamlit_cache import streamlit_backend
+# Core loaders are framework-neutral, back them with Streamlit's caches in the app
+set_cache_backend(streamlit_backend)
 from core.data_processing.Etf_Data import get_etf_data
 from core.analysis.max_drawdown import calculate_max_drawdown
-from core.scoring.etf_recommendation_evaluation import top_recommend
-from core.scoring.utility_score import utility_score
-from core.scoring.sharpe_recommendation import sharpe_score
-from core.data_processing.risk_free_rates import fetch_risk_free_boc
+from core.scoring.scoring_engine import rank_etfs
+from core.scoring.recommendation_table import lookup_recommendations
+from core.scoring.recommendation_cache import RecommendationCache, profile_key
+from core.cache import normalize_as_of
+from core.tracing import span, start_trace, stop_trace, export_trace
 from testing.recommendation_test import recommendation_test
 from testing.compare_custom_Sharpe_test_results import quantitative_etf_basket_comparison
 from visualization.chart_training_test_performances import plot_etf_performance_with_user_preferences
+from visualization.interactive_charts import create_etf_performance_chart
+from web_app.warmup import SessionWarmup
+from service.client import RecommendationClient
 from config.constants import (
     USER_TIME_HORIZON, USER_DESIRED_GROWTH, USER_FLUCTUATION,
     USER_WORST_CASE, USER_MINIMUM_ETF_AGE, USER_RISK_PREFERENCE,
     TIME_HORIZON_OPTIONS, DESIRED_GROWTH_OPTIONS, FLUCTUATION_OPTIONS,
-    WORSE_CASE_OPTIONS, MINIMUM_ETF_AGE_OPTIONS, RISK_PREFERENCE_OPTIONS
+    WORSE_CASE_OPTIONS, MINIMUM_ETF_AGE_OPTIONS, RISK_PREFERENCE_OPTIONS, TRACE_FILE, SERVICE_URL
 )
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
 from datetime import datetime
 
 
-def create_etf_performance_chart(etf_recommend_df, data, time_horizon, chart_title):
+@st.cache_resource
+def shared_recommendation_cache():
     """
-    Create a simple interactive line chart showing ETF performance over time
+    Returns the recommendation cache shared by every session of this server.
     """
-    # Get the recommended ETF tickers
-    etf_tickers = etf_recommend_df['Ticker'].tolist()
+    return RecommendationCache(maxsize=1024)
 
-    # Calculate start and end dates
-    end_date = pd.Timestamp(datetime.now())
-    start_date = end_date - pd.DateOffset(years=time_horizon)
 
-    # Create the plotly figure
-    fig = go.Figure()
+def live_recommendations(user, valid_tickers, data, risk_free_data, end_date):
+    """
+    Runs the full recommendation pipeline for one profile.
 
-    for ticker in etf_tickers:
-        try:
-            # Get price data for this ETF - fix the column access issue
-            try:
-                price_series = data[(ticker, 'Adj Close')].dropna()
-            except (KeyError, TypeError):
-                try:
-                    price_series = data[ticker].dropna()
-                except (KeyError, TypeError):
-                    # Skip ETFs with missing price data
-                    continue
-
-            # Filter to the time horizon
-            period_prices = price_series.loc[start_date:end_date]
-            if period_prices.empty:
-                continue
-
-            # Normalize to start at 100 for better comparison
-            normalized_prices = 100 * period_prices / period_prices.iloc[0]
-
-            # Get metrics for this ETF
-            etf_metrics = etf_recommend_df[etf_recommend_df['Ticker']
-                                           == ticker].iloc[0]
-
-            # Create hover text with only requested metrics
-            growth_col = f'Annual_Growth_{time_horizon}Y'
-            std_col = f'Standard_Deviation_{time_horizon}Y'
-
-            hover_text = []
-            for date, price in zip(normalized_prices.index, normalized_prices.values):
-                hover_text.append(
-                    f"<b>{ticker}</b><br>" +
-                    f"Date: {date.strftime('%Y-%m-%d')}<br>" +
-                    f"Annual Growth: {etf_metrics[growth_col]:.2f}%<br>" +
-                    f"Standard Deviation: {etf_metrics[std_col]:.2f}%"
-                )
-
-            # Add trace for this ETF
-            fig.add_trace(go.Scatter(
-                x=normalized_prices.index,
-                y=normalized_prices.values,
-                mode='lines',
-                name=ticker,
-                line=dict(width=2),
-                hovertemplate='%{text}<extra></extra>',
-                text=hover_text
-            ))
+    Used when the precomputed table is missing or was built from another
+    snapshot or trading day.
+    """
+    with span('drawdown_filter', rows=len(valid_tickers)):
+        md_tolerable_list = calculate_max_drawdown(
+            user[USER_WORST_CASE],
+            user[USER_MINIMUM_ETF_AGE],
+            valid_tickers,
+            data,
+            end_date
+        )
+    with span('metrics', rows=len(md_tolerable_list)):
+        etf_metrics = get_etf_data(
+            md_tolerable_list, user[USER_TIME_HORIZON], data, end_date)
+
+    # Calculate both Sharpe and Utility recommendations
+    with span('scoring', rows=len(etf_metrics)):
+        ranked = rank_etfs(
+            etf_metrics, user[USER_TIME_HORIZON], risk_free_data, 5,
+            user[USER_RISK_PREFERENCE], methods=['Sharpe', 'Utility_Score'])
+    return ranked['Sharpe'], ranked['Utility_Score']
+
+
+def service_recommendations(user, end_date):
+    """
+    Gets one profile's recommendations from the recommendation service.
 
-        except Exception as e:
-            # Skip ETFs that can't be processed
-            continue
-
-    # Simple layout
-    fig.update_layout(
-        title=chart_title,
-        xaxis_title="Date",
-        yaxis_title="Normalized Price",
-        hovermode='closest',
-        height=400
-    )
+    Only the prices of the recommended ETFs over the horizon are fetched, for
+    the charts; this process loads no other data.
 
-    return fig
+    Returns:
+        tuple: The Sharpe and utility recommendations and their prices.
+    """
+    client = RecommendationClient()
+    with span('service_recommend'):
+        etf_sharpe_recommend, etf_utility_recommend = client.recommend(user, 5)
+    tickers = sorted(set(etf_sharpe_recommend.get('Ticker', [])) | set(etf_utility_recommend.get('Ticker', [])))
+    with span('service_prices', rows=len(tickers)):
+        data = client.prices(tickers, end_date - pd.DateOffset(years=user[USER_TIME_HORIZON]))
+    return etf_sharpe_recommend, etf_utility_recommend, data
+
+
+def warm_up():
+    """
+    Starts the background work the answers given so far allow.
+    """
+    if st.session_state.warmup is not None:
+        st.session_state.warmup.push(st.session_state.user_profile)
 
 
 # Initialize session state
@@ -106,6 +96,9 @@ if 'step' not in st.session_state:
     st.session_state.step = 1
 if 'user_profile' not in st.session_state:
     st.session_state.user_profile = [None] * 6
+# Start loading the data while the user answers the questions, the service has it loaded already
+if 'warmup' not in st.session_state:
+    st.session_state.warmup = None if SERVICE_URL else SessionWarmup()
 
 st.title("ETF Recommendations")
 st.write("Answer a few questions to get personalized ETF recommendations.*")
@@ -152,6 +145,7 @@ if st.session_state.step == 1:
                 st.warning("Please select a time horizon to proceed.")
             else:
                 st.session_state.user_profile[USER_TIME_HORIZON] = time_horizon_options[choice - 1]
+                warm_up()
                 st.session_state.step = 2
                 st.rerun()
 
@@ -257,6 +251,7 @@ elif st.session_state.step == 4:
                 st.warning("Please select a maximum loss tolerance to proceed.")
             else:
                 st.session_state.user_profile[USER_WORST_CASE] = worse_case_options[choice - 1]
+                warm_up()
                 st.session_state.step = 5
                 st.rerun()
 
@@ -292,6 +287,7 @@ elif st.session_state.step == 5:
                 st.warning("Please select an ETF age minimum to proceed.")
             else:
                 st.session_state.user_profile[USER_MINIMUM_ETF_AGE] = minimum_etf_age[choice - 1]
+                warm_up()
                 st.session_state.step = 6
                 st.rerun()
 
@@ -338,29 +334,23 @@ elif st.session_state.step == 7:
         try:
             user = st.session_state.user_profile
 
-            valid_tickers, data = download_valid_data()
+            if TRACE_FILE:
+                start_trace()
             end_date = pd.Timestamp(datetime.now())
-            md_tolerable_list = calculate_max_drawdown(
-                user[USER_WORST_CASE],
-                user[USER_MINIMUM_ETF_AGE],
-                valid_tickers,
-                data,
-                end_date
-            )
-            etf_metrics = get_etf_data(
-                md_tolerable_list, user[USER_TIME_HORIZON], data, end_date)
-            risk_free_data = fetch_risk_free_boc("1995-01-01")
-
-            # Calculate both Sharpe and Utility recommendations
-            etf_sharpe_calculation = sharpe_score(
-                etf_metrics, user[USER_TIME_HORIZON], risk_free_data)
-            etf_sharpe_recommend = top_recommend(
-                etf_sharpe_calculation, 'Sharpe', 5)
-
-            etf_utility_calculation = utility_score(
-                etf_metrics, user[USER_TIME_HORIZON], risk_free_data, user[USER_RISK_PREFERENCE])
-            etf_utility_recommend = top_recommend(
-                etf_utility_calculation, 'Utility_Score', 5)
+            if SERVICE_URL:
+                etf_sharpe_recommend, etf_utility_recommend, data = service_recommendations(user, end_date)
+            else:
+                with span('warmup_wait'):
+                    valid_tickers, data, risk_free_data, table = st.session_state.warmup.data()
+                as_of = normalize_as_of(end_date).strftime('%Y-%m-%d')
+                if table is not None and table['version'] == data.version and table['as_of'] == as_of:
+                    with span('table_lookup'):
+                        etf_sharpe_recommend, etf_utility_recommend = lookup_recommendations(table, user)
+                else:
+                    # Sessions with the same answers on the same snapshot share one computation
+                    etf_sharpe_recommend, etf_utility_recommend = shared_recommendation_cache().get_or_compute(
+                        (profile_key(user), data.version, as_of),
+                        lambda: live_recommendations(user, valid_tickers, data, risk_free_data, end_date))
 
             st.success("✅ Analysis complete!")
 
@@ -370,12 +360,13 @@ elif st.session_state.step == 7:
             with col1:
                 st.subheader("📈 Sharpe Ratio Based")
                 if not etf_sharpe_recommend.empty:
-                    sharpe_chart = create_etf_performance_chart(
-                        etf_sharpe_recommend,
-                        data,
-                        user[USER_TIME_HORIZON],
-                        f"Top 5 ETFs by Sharpe Ratio ({user[USER_TIME_HORIZON]} Years)"
-                    )
+                    with span('charting', rows=len(etf_sharpe_recommend)):
+                        sharpe_chart = create_etf_performance_chart(
+                            etf_sharpe_recommend,
+                            data,
+                            user[USER_TIME_HORIZON],
+                            f"Top 5 ETFs by Sharpe Ratio ({user[USER_TIME_HORIZON]} Years)"
+                        )
                     st.plotly_chart(sharpe_chart, use_container_width=True)
                 else:
                     st.warning("No Sharpe-based ETFs found.")
@@ -383,12 +374,13 @@ elif st.session_state.step == 7:
             with col2:
                 st.subheader("⚖️ Utility Score Based")
                 if not etf_utility_recommend.empty:
-                    utility_chart = create_etf_performance_chart(
-                        etf_utility_recommend,
-                        data,
-                        user[USER_TIME_HORIZON],
-                        f"Top 5 ETFs by Utility Score ({user[USER_TIME_HORIZON]} Years)"
-                    )
+                    with span('charting', rows=len(etf_utility_recommend)):
+                        utility_chart = create_etf_performance_chart(
+                            etf_utility_recommend,
+                            data,
+                            user[USER_TIME_HORIZON],
+                            f"Top 5 ETFs by Utility Score ({user[USER_TIME_HORIZON]} Years)"
+                        )
                     st.plotly_chart(utility_chart, use_container_width=True)
                 else:
                     st.warning("No Utility-based ETFs found.")
@@ -425,12 +417,20 @@ elif st.session_state.step == 7:
                 else:
                     st.write("No data available")
 
+            if TRACE_FILE:
+                export_trace(stop_trace(), TRACE_FILE)
+
+            st.page_link("pages/What_If_Explorer.py", label="Explore what-if scenarios with live sliders", icon="🎚️")
+
             if st.button("Start Over", key="restart"):
                 st.session_state.step = 1
                 st.session_state.user_profile = [None] * 6
                 st.rerun()
 
         except Exception as e:
+            if TRACE_FILE:
+                # Ends this session's trace only, other sessions keep theirs
+                stop_trace()
             st.error(f"❌ An error occurred: {str(e)}")
             if st.button("Try Again", key="retry"):
                 st.session_state.step = 1
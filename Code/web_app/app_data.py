@@ -0,0 +1,38 @@
+import streamlit as st
+from core.data_processing.ishares_ETF_list import download_price_panel
+from core.data_processing.risk_free_rates import fetch_risk_free_boc
+from core.data_processing.snapshot import current_snapshot
+from core.scoring.recommendation_table import load_recommendation_table
+from core.tracing import span
+
+
+@st.cache_resource(ttl=3600)
+def load_cached_recommendation_table():
+    """
+    Loads the precomputed recommendation table, if one has been built.
+    """
+    return load_recommendation_table()
+
+
+def load_app_data():
+    """
+    Loads the data every page of the app works from.
+
+    The refresh job's snapshot is complete and warm; without one, the prices
+    and rates are loaded through the cached loaders.
+
+    Returns:
+        tuple: A tuple containing:
+            - valid_tickers (list): The tickers with price data.
+            - data (PricePanel): Their prices.
+            - risk_free_data (pd.DataFrame): The daily risk-free rates.
+            - table (dict or None): The precomputed recommendation table.
+    """
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        return snapshot.valid_tickers, snapshot.panel, snapshot.risk_free, snapshot.recommendations
+    with span('download'):
+        valid_tickers, data = download_price_panel()
+    with span('risk_free_fetch'):
+        risk_free_data = fetch_risk_free_boc("1995-01-01")
+    return valid_tickers, data, risk_free_data, load_cached_recommendation_table()
@@ -0,0 +1,100 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.cache import set_cache_backend
+from web_app.streamlit_cache import streamlit_backend
+# Core loaders are framework-neutral, back them with Streamlit's caches in the app
+set_cache_backend(streamlit_backend)
+import time
+from core.scoring.what_if import what_if_explorer
+from visualization.interactive_charts import create_etf_performance_chart, create_risk_return_chart
+from web_app.app_data import load_app_data
+from config.constants import (
+    USER_TIME_HORIZON, USER_DESIRED_GROWTH, USER_FLUCTUATION,
+    USER_WORST_CASE, USER_MINIMUM_ETF_AGE, USER_RISK_PREFERENCE, WHAT_IF_HORIZONS
+)
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+
+st.title("What-If Explorer")
+st.write("Move the sliders to see how your recommendations change with your answers.*")
+
+# Start from the questionnaire's answers when the user has given them
+profile = st.session_state.get('user_profile') or [None] * 6
+
+
+def answer(index, default):
+    return profile[index] if profile[index] is not None else default
+
+
+risk_weight, return_weight = answer(USER_RISK_PREFERENCE, [1, 1])
+
+st.sidebar.header("Your Answers")
+time_horizon = st.sidebar.slider(
+    "Time horizon (years)", min(WHAT_IF_HORIZONS), max(WHAT_IF_HORIZONS),
+    answer(USER_TIME_HORIZON, 8), key="whatif_horizon")
+desired_growth = st.sidebar.slider(
+    "Annual growth goal (%)", 0, 30, answer(USER_DESIRED_GROWTH, 10), key="whatif_growth")
+fluctuation = st.sidebar.slider(
+    "Acceptable annual fluctuation (%)", 0, 60, answer(USER_FLUCTUATION, 15), key="whatif_fluctuation")
+max_drawdown = st.sidebar.slider(
+    "Greatest tolerable loss (%)", 5, 100, answer(USER_WORST_CASE, 35), key="whatif_drawdown")
+min_etf_age = st.sidebar.slider(
+    "Minimum ETF age (years)", 0, 20, answer(USER_MINIMUM_ETF_AGE, 3), key="whatif_age")
+return_share = st.sidebar.slider(
+    "Risk averse ← → Return focused", 0.0, 1.0,
+    round(return_weight / (risk_weight + return_weight), 2), 0.05, key="whatif_preference",
+    help="The weight of return against risk in the utility score; 0.25 is 3:1 risk averse, "
+         "0.75 is 1:3 return focused.")
+
+try:
+    with st.spinner("Loading ETF data..."):
+        valid_tickers, data, risk_free_data, _ = load_app_data()
+        explorer = what_if_explorer(valid_tickers, data, risk_free_data, pd.Timestamp(datetime.now()))
+
+    started = time.perf_counter()
+    result = explorer.recommend(time_horizon, max_drawdown, min_etf_age, (1 - return_share, return_share))
+    elapsed = (time.perf_counter() - started) * 1000
+    candidates, etf_sharpe_recommend, etf_utility_recommend = result['candidates'], result['sharpe'], result['utility']
+    st.caption(f"Re-ranked {len(candidates)} of {len(valid_tickers)} ETFs in {elapsed:.1f} ms")
+
+    if candidates.empty:
+        st.warning("No ETFs pass these drawdown and age limits. Try a higher loss tolerance or a lower minimum age.")
+    else:
+        st.plotly_chart(create_risk_return_chart(
+            candidates, time_horizon,
+            etf_sharpe_recommend['Ticker'].tolist(), etf_utility_recommend['Ticker'].tolist(),
+            desired_growth, fluctuation,
+            f"ETF Risk-Return Space ({time_horizon} Years)"
+        ), use_container_width=True)
+
+        growth_col = f'Annual_Growth_{time_horizon}Y'
+        std_col = f'Standard_Deviation_{time_horizon}Y'
+        col1, col2 = st.columns(2)
+        for column, title, recommend, score_col in [
+                (col1, "📈 Sharpe Ratio Based", etf_sharpe_recommend, 'Sharpe'),
+                (col2, "⚖️ Utility Score Based", etf_utility_recommend, 'Utility_Score')]:
+            with column:
+                st.subheader(title)
+                if recommend.empty:
+                    st.warning("No ETFs found.")
+                    continue
+                st.plotly_chart(create_etf_performance_chart(
+                    recommend, data, time_horizon,
+                    f"Top {len(recommend)} ETFs ({time_horizon} Years)"
+                ), use_container_width=True)
+                simple = recommend[['Ticker', growth_col, std_col, score_col]].copy()
+                simple.columns = ['Ticker', 'Annual Growth (%)', 'Standard Deviation (%)', 'Score']
+                st.dataframe(simple.round(2), use_container_width=True, hide_index=True)
+
+except Exception as e:
+    st.error(f"❌ An error occurred: {str(e)}")
+
+st.markdown(
+"<small style='color:gray; margin-top: 2rem; display: block;'>"
+"*This tool provides educational information only and is not financial advice. "
+"Please consult a professional before making any investment decisions."
+"</small>",
+unsafe_allow_html=True
+)
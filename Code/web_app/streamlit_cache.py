@@ -0,0 +1,20 @@
+import streamlit as st
+
+
+def streamlit_backend(func, ttl, resource):
+    """
+    Backs a core `memoize` cache with Streamlit's caches.
+
+    Data loaders use `st.cache_data`, shared objects `st.cache_resource`, so
+    the results are shared between the sessions of the app like before.
+
+    Args:
+        func (function): The function to cache.
+        ttl (float or None): Seconds a result stays valid, None for no expiry.
+        resource (bool): Whether the results are shared objects.
+
+    Returns:
+        function: The cached function, with Streamlit's `clear()` method.
+    """
+    decorator = st.cache_resource if resource else st.cache_data
+    return decorator(ttl=ttl, show_spinner=False)(func)
@@ -0,0 +1,91 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import pandas as pd
+from datetime import datetime
+from core.cache import normalize_as_of
+from core.analysis.window_stats import window_stats
+from core.analysis.max_drawdown import compute_drawdown_table, calculate_max_drawdown
+from core.data_processing.Etf_Data import get_etf_data
+from core.data_processing.snapshot import current_snapshot
+from web_app.app_data import load_app_data
+from config.constants import USER_TIME_HORIZON, USER_WORST_CASE, USER_MINIMUM_ETF_AGE
+
+# Background threads shared by every session of the server
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='warmup')
+
+
+class SessionWarmup:
+    """
+    Prepares a session's recommendations in the background while the user answers.
+
+    The data starts loading as soon as the session opens. Each answer then
+    pushes the work it makes possible through the caches, so the last step
+    finds everything but the scoring already computed:
+        - the time horizon builds the snapshot's `window_stats` index,
+        - the worst-case loss computes the drawdown table,
+        - the minimum ETF age filters the candidates and computes their
+          metrics over the horizon with `get_etf_data`.
+    Nothing is computed when the precomputed recommendation table is current,
+    since the answers are then a lookup.
+
+    The background work only fills the caches the foreground reads, so a
+    failed or unfinished step is simply computed again when it is needed.
+    """
+
+    def __init__(self, load=load_app_data):
+        self._load = load
+        self._data = _executor.submit(load)
+
+    def data(self):
+        """
+        Returns the session's data, waiting for the background load if needed.
+
+        The current snapshot is checked on every call, so a session that
+        loaded its data before the refresh job published a new snapshot
+        switches to it on its next request. A failed background load is
+        retried in the calling thread, so its error surfaces where the data
+        is used.
+
+        Returns:
+            tuple: (valid_tickers, data, risk_free_data, table), see `load_app_data`.
+        """
+        try:
+            loaded = self._data.result()
+        except Exception:
+            loaded = None
+        snapshot = current_snapshot()
+        if loaded is None or (snapshot is not None and loaded[1] is not snapshot.panel):
+            reloaded = Future()
+            reloaded.set_result(self._load())
+            self._data = reloaded
+            loaded = reloaded.result()
+        return loaded
+
+    def push(self, user_profile, end_date=None):
+        """
+        Starts the background work the answers given so far allow.
+
+        Args:
+            user_profile (list): The answers so far, indexed by the USER_*
+                                 constants, None for unanswered questions.
+            end_date (pd.Timestamp, optional): The as-of date of the
+                                               recommendations. Defaults to now.
+        """
+        end_date = pd.Timestamp(datetime.now()) if end_date is None else end_date
+        _executor.submit(self._prepare, list(user_profile), end_date)
+
+    def _prepare(self, user, end_date):
+        valid_tickers, data, _, table = self._data.result()
+        if (table is not None and table['version'] == data.version
+                and table['as_of'] == normalize_as_of(end_date).strftime('%Y-%m-%d')):
+            return
+        time_horizon, max_drawdown, min_etf_age = (
+            user[USER_TIME_HORIZON], user[USER_WORST_CASE], user[USER_MINIMUM_ETF_AGE])
+
+        if time_horizon is not None:
+            window_stats(data)
+        if max_drawdown is not None:
+            compute_drawdown_table(data, end_date)
+            if min_etf_age is not None:
+                candidates = calculate_max_drawdown(max_drawdown, min_etf_age, valid_tickers, data, end_date)
+                if time_horizon is not None:
+                    get_etf_data(candidates, time_horizon, data, end_date)